@@ -0,0 +1,69 @@
+import random
+
+from pathlib import Path
+
+from utils import file_processor
+
+ETC_DIR = Path(__file__).resolve().parent.parent / 'etc'
+S14_TRAITS = ETC_DIR / 'traits_units_activations_s14.json'
+S14_COSTS = ETC_DIR / 'units_cost_s14.json'
+
+# Set 14 origins, used as the "target regions" when searching s14 data
+S14_ORIGINS = [
+    'Anima Squad', 'BoomBots', 'Cyberboss', 'Cypher', 'Divinicorp',
+    'Exotech', 'God of the Net', 'Golden Ox', 'Nitro', 'Overlord',
+    'Soul Killer', 'Street Demon', 'Syndicate', 'Virus'
+]
+
+def load_s14():
+    """Bundled set 14 data: (traits_data, units_costs)"""
+    return file_processor.read_json(S14_TRAITS), file_processor.read_json(S14_COSTS)
+
+def synthetic_dataset(scale, seed=0):
+    """Scale the s14 pool up to `scale` times as many units.
+
+    Every extra copy of a unit keeps its trait count but swaps one trait for
+    another trait of the same kind (origin or class) and jitters the cost by
+    at most one, so trait thresholds are reached in more ways than in the
+    real data. Deterministic for a given (scale, seed).
+    """
+    traits_data, units_costs = load_s14()
+    rng = random.Random(seed)
+    origins = [t for t in traits_data if t in S14_ORIGINS]
+    classes = [t for t in traits_data if t not in S14_ORIGINS]
+
+    unit_traits = {}
+    for trait, info in traits_data.items():
+        for unit in info['units']:
+            unit_traits.setdefault(unit, []).append(trait)
+
+    scaled_traits = {trait: {'units': list(info['units']), 'activations': dict(info['activations'])}
+                     for trait, info in traits_data.items()}
+    scaled_costs = dict(units_costs)
+    for copy in range(1, scale):
+        for unit in sorted(unit_traits):
+            variant = f"{unit} #{copy}"
+            traits = list(unit_traits[unit])
+            swap = rng.randrange(len(traits))
+            pool = origins if traits[swap] in S14_ORIGINS else classes
+            replacement = rng.choice([t for t in pool if t not in traits] or [traits[swap]])
+            traits[swap] = replacement
+            for trait in traits:
+                scaled_traits[trait]['units'].append(variant)
+            scaled_costs[variant] = min(5, max(1, units_costs.get(unit, 1) + rng.choice([-1, 0, 0, 1])))
+    return scaled_traits, scaled_costs
+
+def write_dataset(directory, name, traits_data, units_costs):
+    """Write a dataset as traits/costs JSON files, returning both paths"""
+    traits_path = Path(directory) / f'{name}_traits_units_activations.json'
+    costs_path = Path(directory) / f'{name}_units_cost.json'
+    file_processor.write_json(str(traits_path), traits_data)
+    file_processor.write_json(str(costs_path), units_costs)
+    return traits_path, costs_path
+
+def costs_by_tier(units_costs):
+    """Convert {unit: cost} into the {cost: [units]} layout used by traits_tracker"""
+    tiers = {}
+    for unit, cost in units_costs.items():
+        tiers.setdefault(str(cost), []).append(unit)
+    return tiers
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""Benchmark suite for the combo search engines.
+
+Runs a parameter matrix over fixed season fixtures (the bundled s14 data and
+synthetic scaled-up copies of it) and records, per case, the search counters
+(nodes, pruned, leaves, results), wall time and peak RSS. Results are stored
+as JSON so runs from different commits can be compared:
+
+    python -m bench.run_bench                        # full matrix
+    python -m bench.run_bench --quick                # small subset
+    python -m bench.run_bench --compare var/bench/<commit>.json
+    python -m bench.run_bench --crosscheck           # engines must agree
+"""
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import itertools
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+from bench import fixtures
+from preprocessor import traits_processor
+from preprocessor.combo_calculator import TraitComboCalculatorOptimized
+from preprocessor.search_stats import SearchInstrumentation
+from utils import file_processor
+from utils.memory_usage import peak_memory_mb
+
+RESULTS_DIR = Path('var/bench')
+
+# Relative wall time increase reported as a regression by --compare
+TIME_TOLERANCE = 0.25
+
+# Parameter matrices per engine; every combination becomes one case per dataset
+CALCULATOR_MATRIX = {
+    'team_size': [6, 7],
+    'max_cost': [25, 35],
+    'required_units': [['Poppy', 'Jax'], ['Poppy', 'Jax', 'Veigar']],
+    'min_regions': [3, 4],
+    'strategy': ['dfs', 'mitm', 'symmetry', 'vector', 'kernel'],
+}
+TRACKER_MATRIX = {
+    'combo_size': [8, 9, 10],
+    'max_combinations': [10, 50],
+    'symmetry': [False, True],
+}
+# Dataset name -> (scale, matrix overrides); the scaled pool is restricted
+# to team sizes and required units whose full search stays in seconds
+DATASETS = {
+    's14': (1, {}),
+    's14x2': (2, {'team_size': [6], 'required_units': [['Poppy', 'Jax', 'Veigar']]}),
+}
+QUICK_DATASETS = ['s14']
+
+def build_cases(quick=False):
+    """Expand the parameter matrices into named benchmark cases"""
+    cases = []
+    datasets = QUICK_DATASETS if quick else list(DATASETS)
+    for dataset in datasets:
+        matrix = {**CALCULATOR_MATRIX, **DATASETS[dataset][1]}
+        keys = list(matrix)
+        for values in itertools.product(*matrix.values()):
+            params = dict(zip(keys, values))
+            if quick and (params['team_size'] != 7 or params['min_regions'] != 4):
+                continue
+            name = (f"calculator/{dataset}/size{params['team_size']}-cost{params['max_cost']}"
+                    f"-req{len(params['required_units'])}-regions{params['min_regions']}")
+            if params['strategy'] != 'dfs':
+                name += f"-{params['strategy']}"
+            cases.append({'name': name, 'engine': 'calculator', 'dataset': dataset, 'params': params})
+        keys = list(TRACKER_MATRIX)
+        for values in itertools.product(*TRACKER_MATRIX.values()):
+            params = dict(zip(keys, values))
+            if quick and params['max_combinations'] != 10:
+                continue
+            name = f"traits_tracker/{dataset}/size{params['combo_size']}-max{params['max_combinations']}"
+            if params['symmetry']:
+                name += '-symmetry'
+            cases.append({'name': name, 'engine': 'traits_tracker', 'dataset': dataset, 'params': params})
+    return cases
+
+def prepare_datasets(directory, names):
+    """Write every dataset used by the cases to directory; returns name -> (traits, costs) paths"""
+    paths = {}
+    for name in names:
+        scale = DATASETS[name][0]
+        if scale == 1:
+            paths[name] = (fixtures.S14_TRAITS, fixtures.S14_COSTS)
+        else:
+            traits_data, units_costs = fixtures.synthetic_dataset(scale)
+            paths[name] = fixtures.write_dataset(directory, name, traits_data, units_costs)
+    return paths
+
+def run_case(case, traits_path, costs_path):
+    """Run one case (in a fresh worker process) and return its measurements"""
+    params = case['params']
+    instr = SearchInstrumentation()
+    with contextlib.redirect_stdout(io.StringIO()):
+        if case['engine'] == 'calculator':
+            calc = TraitComboCalculatorOptimized(traits_path, costs_path, fixtures.S14_ORIGINS)
+            start = time.perf_counter()
+            results = calc.find_all_valid_combos(
+                max_units=params['team_size'], max_cost=params['max_cost'], start_units=params['team_size'],
+                required_units=params['required_units'], min_regions=params['min_regions'],
+                strategy=params['strategy'])
+            wall_time = time.perf_counter() - start
+            instr = calc.instrumentation
+        else:
+            traits_data = file_processor.read_json(str(traits_path))
+            cost_data = fixtures.costs_by_tier(file_processor.read_json(str(costs_path)))
+            start = time.perf_counter()
+            results = traits_processor.traits_tracker(
+                traits_data, cost_data, max_combinations=params['max_combinations'],
+                combo_size=params['combo_size'], instrumentation=instr, symmetry=params['symmetry'])
+            wall_time = time.perf_counter() - start
+    summary = instr.summary()
+    return {
+        'name': case['name'],
+        'engine': case['engine'],
+        'dataset': case['dataset'],
+        'params': params,
+        'nodes': summary['nodes'],
+        'pruned': summary['pruned'],
+        'pruned_by_reason': summary['pruned_by_reason'],
+        'leaves': summary['leaves'],
+        'depth_nodes': summary['depth_nodes'],
+        'results': len(results),
+        # order-sensitive digest of the full result list, compared across engines by --crosscheck
+        'digest': hashlib.sha1(json.dumps(results, ensure_ascii=False).encode('utf-8')).hexdigest(),
+        'wall_time': round(wall_time, 4),
+        'peak_rss_mb': round(peak_memory_mb(), 1),
+    }
+
+def current_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+def run_suite(cases):
+    records = []
+    with tempfile.TemporaryDirectory() as directory:
+        dataset_paths = prepare_datasets(directory, sorted({case['dataset'] for case in cases}))
+        for case in cases:
+            # one process per case so peak RSS is not inherited from earlier cases
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                record = pool.submit(run_case, case, *dataset_paths[case['dataset']]).result()
+            print(f"{record['name']:<55} results {record['results']:>7}  nodes {record['nodes']:>9}  "
+                  f"pruned {record['pruned']:>8}  leaves {record['leaves']:>8}  "
+                  f"{record['wall_time']:>8.3f}s  {record['peak_rss_mb']:>7.1f} MB")
+            records.append(record)
+    return records
+
+def compare(baseline, records, tolerance=TIME_TOLERANCE):
+    """Print per-case differences against a baseline run; returns False on regressions"""
+    baseline_cases = {record['name']: record for record in baseline['cases']}
+    ok = True
+    print(f"\nComparison against {baseline.get('commit', 'unknown')}:")
+    for record in records:
+        old = baseline_cases.get(record['name'])
+        if old is None:
+            print(f"  {record['name']}: new case")
+            continue
+        notes = []
+        if old['results'] != record['results']:
+            notes.append(f"RESULTS CHANGED {old['results']} -> {record['results']}")
+            ok = False
+        for counter in ['nodes', 'pruned', 'leaves']:
+            if old[counter] != record[counter]:
+                notes.append(f"{counter} {old[counter]} -> {record[counter]}")
+        ratio = record['wall_time'] / old['wall_time'] if old['wall_time'] else 1.0
+        if ratio > 1 + tolerance:
+            notes.append(f"SLOWER x{ratio:.2f}")
+            ok = False
+        else:
+            notes.append(f"time x{ratio:.2f}")
+        print(f"  {record['name']}: {', '.join(notes)}")
+    return ok
+
+def crosscheck(records):
+    """Check that alternative engines return exactly the DFS results; returns False on mismatches"""
+    by_name = {record['name']: record for record in records}
+    ok = True
+    print("\nCross-check against the dfs engine:")
+    for record in records:
+        strategy = record['params'].get('strategy', 'dfs')
+        if record['engine'] != 'calculator' or strategy == 'dfs':
+            continue
+        reference = by_name.get(record['name'][:-len(f"-{strategy}")])
+        if reference is None:
+            print(f"  {record['name']}: no dfs case to compare with")
+            continue
+        if reference['digest'] == record['digest']:
+            print(f"  {record['name']}: identical ({record['results']} results)")
+        else:
+            print(f"  {record['name']}: MISMATCH {reference['results']} dfs results vs {record['results']}")
+            ok = False
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--quick', action='store_true', help='run a small subset of the matrix')
+    parser.add_argument('--filter', default='', help='only run cases whose name contains this text')
+    parser.add_argument('--output', help='results file (default var/bench/<commit>.json)')
+    parser.add_argument('--compare', help='baseline results file to compare against')
+    parser.add_argument('--crosscheck', action='store_true',
+                        help='fail unless every alternative engine returns exactly the dfs results')
+    parser.add_argument('--tolerance', type=float, default=TIME_TOLERANCE,
+                        help='relative wall time increase reported as a regression')
+    args = parser.parse_args()
+
+    cases = [case for case in build_cases(args.quick) if args.filter in case['name']]
+    records = run_suite(cases)
+
+    commit = current_commit()
+    output = Path(args.output) if args.output else RESULTS_DIR / f'{commit}.json'
+    output.parent.mkdir(parents=True, exist_ok=True)
+    file_processor.write_json(str(output), {
+        'commit': commit,
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'cases': records,
+    })
+    print(f"\nSaved {len(records)} results to {output}")
+
+    ok = True
+    if args.crosscheck:
+        ok = crosscheck(records) and ok
+    if args.compare:
+        ok = compare(file_processor.read_json(args.compare), records, args.tolerance) and ok
+    if not ok:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,210 @@
 #!/usr/bin/env python3
+import heapq
 import json
+import os
+import sys
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
 from pathlib import Path
 from collections import Counter, defaultdict
 
+import numpy as np
+
+# Add parent directory to path to access utils modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from checker.combo_diff import DIFF_RANK_MAX_SIZE, diff_combo_files
+from utils.combo_index import build_combo_index, load_combo_index, read_combo_at, read_combo_header, write_combo_index
+from utils.combo_rank import ComboRankCodec
+from utils.combo_stream import ComboFileReader
+from utils.memory_usage import peak_memory_mb
+
+# Number of combos turned into one incidence matrix at a time by the batch validator,
+# and fed at once to the statistics and best-N heaps; small batches keep the matrices in cache
+BATCH_CHUNK_SIZE = 2048
+
+# Maximum number of error messages kept in memory for the report
+MAX_REPORTED_ERRORS = 10
+
+# Fields every combination must hold; statistics and best-N read all but activated_details
+REQUIRED_FIELDS = ['units', 'trait_count', 'activated_traits', 'total_cost', 'activated_details']
+
+def combo_structure_errors(combo):
+    """Messages for a record that is not a combination object with every required field, or an empty list"""
+    if not isinstance(combo, dict):
+        return [f"Combination is a {type(combo).__name__}, not an object"]
+    errors = [f"Missing field '{field}'" for field in REQUIRED_FIELDS if field not in combo]
+    if errors:
+        return errors
+    for field, kind in [('units', list), ('activated_traits', list), ('activated_details', dict)]:
+        if not isinstance(combo[field], kind):
+            errors.append(f"Field '{field}' is a {type(combo[field]).__name__}, not a {kind.__name__}")
+    for field in ['total_cost', 'trait_count']:
+        if type(combo[field]) not in (int, float):
+            errors.append(f"Field '{field}' is a {type(combo[field]).__name__}, not a number")
+    return errors
+
+# Column fields of combo_columns: name, accepted types, placeholder for records where it is missing or malformed
+COLUMN_FIELDS = [
+    ('units', {list}, []),
+    ('activated_traits', {list}, []),
+    ('activated_details', {dict}, {}),
+    ('total_cost', {int, float}, 0),
+    ('trait_count', {int, float}, 0),
+]
+
+def restrict(values, good, empty):
+    """values with the entries where good is False replaced by empty"""
+    return [value if keep else empty for value, keep in zip(values, good.tolist())]
+
+def combo_columns(combos):
+    """Fields of a batch of combinations as parallel lists, built in bulk.
+    
+    'wellformed' marks the records combo_structure_errors accepts; in the
+    others, a missing or malformed field holds an empty placeholder so every
+    column can be flattened and converted without checking records one by
+    one. The per-record checks only run for a column holding a bad value.
+    """
+    n = len(combos)
+    wellformed = np.ones(n, dtype=bool)
+    if not set(map(type, combos)) <= {dict}:
+        is_dict = np.fromiter((type(combo) is dict for combo in combos), dtype=bool, count=n)
+        wellformed &= is_dict
+        combos = restrict(combos, is_dict, {})
+    columns = {}
+    for field, kinds, empty in COLUMN_FIELDS:
+        values = [combo.get(field) for combo in combos]
+        if not set(map(type, values)) <= kinds:
+            good = np.fromiter((type(value) in kinds for value in values), dtype=bool, count=n)
+            wellformed &= good
+            values = restrict(values, good, empty)
+        columns[field] = values
+    columns['emblems'] = [combo.get('emblems') for combo in combos]
+    columns['wellformed'] = wellformed
+    return columns
+
+class IndexLookup(dict):
+    """name -> index mapping that gives -1 for unknown names, so lookups can run through map()"""
+    def __missing__(self, key):
+        return -1
+
+class ComboStatistics:
+    """Running summary statistics, fed a batch of combinations at a time"""
+    def __init__(self, target_regions):
+        self.target_regions = target_regions
+        self.count = 0
+        self.cost_min = None
+        self.cost_max = None
+        self.cost_sum = 0
+        self.trait_count_min = None
+        self.trait_count_max = None
+        self.trait_count_sum = 0
+        self.size_distribution = Counter()
+        self.trait_frequency = Counter()
+        self.region_counts = Counter()
+        
+    def add_many(self, costs, trait_counts, sizes, activated_traits):
+        """Fold in a batch of combinations, given as parallel lists of their fields"""
+        if not costs:
+            return
+        cost_min, cost_max = min(costs), max(costs)
+        trait_count_min, trait_count_max = min(trait_counts), max(trait_counts)
+        if self.count == 0:
+            self.cost_min, self.cost_max = cost_min, cost_max
+            self.trait_count_min, self.trait_count_max = trait_count_min, trait_count_max
+        else:
+            self.cost_min = min(self.cost_min, cost_min)
+            self.cost_max = max(self.cost_max, cost_max)
+            self.trait_count_min = min(self.trait_count_min, trait_count_min)
+            self.trait_count_max = max(self.trait_count_max, trait_count_max)
+        self.count += len(costs)
+        self.cost_sum += sum(costs)
+        self.trait_count_sum += sum(trait_counts)
+        self.size_distribution.update(sizes)
+        frequency = Counter(chain.from_iterable(activated_traits))
+        self.trait_frequency.update(frequency)
+        for region in self.target_regions:
+            if frequency[region]:
+                self.region_counts[region] += frequency[region]
+                
+    def merge(self, other):
+        """Fold in the statistics of a later shard"""
+        if other.count == 0:
+            return
+        if self.count == 0:
+            self.cost_min, self.cost_max = other.cost_min, other.cost_max
+            self.trait_count_min, self.trait_count_max = other.trait_count_min, other.trait_count_max
+        else:
+            self.cost_min = min(self.cost_min, other.cost_min)
+            self.cost_max = max(self.cost_max, other.cost_max)
+            self.trait_count_min = min(self.trait_count_min, other.trait_count_min)
+            self.trait_count_max = max(self.trait_count_max, other.trait_count_max)
+        self.count += other.count
+        self.cost_sum += other.cost_sum
+        self.trait_count_sum += other.trait_count_sum
+        self.size_distribution.update(other.size_distribution)
+        self.trait_frequency.update(other.trait_frequency)
+        self.region_counts.update(other.region_counts)
+                
+class BestCombos:
+    """Bounded heaps keeping the top N combinations for each ranking"""
+    def __init__(self, target_regions, top_n=5):
+        self.target_regions = target_regions
+        self.top_n = top_n
+        self.heaps = {'cost': [], 'traits': [], 'regions': []}
+        
+    def add(self, combo, ordinal):
+        cost = combo['total_cost']
+        trait_count = combo['trait_count']
+        regions = sum(1 for t in combo['activated_traits'] if t in self.target_regions)
+        # keys are negated so each heap root is the worst combination kept;
+        # the ordinal keeps ties in file order like a stable sort
+        keys = {
+            'cost': (-cost, trait_count, -ordinal),
+            'traits': (trait_count, -cost, -ordinal),
+            'regions': (regions, -cost, -ordinal),
+        }
+        for name, key in keys.items():
+            self._push(name, key, combo)
+            
+    def add_many(self, combos, ordinals, costs, trait_counts, activated_traits):
+        """Add a batch of combinations; only the batch's own top N of each ranking can enter the heaps"""
+        if len(combos) <= self.top_n:
+            for combo, ordinal in zip(combos, ordinals):
+                self.add(combo, ordinal)
+            return
+        cost = np.array(costs, dtype=np.float64)
+        trait_count = np.array(trait_counts, dtype=np.float64)
+        ordinal = np.array(ordinals, dtype=np.float64)
+        is_region = set(self.target_regions)
+        sizes = np.fromiter(map(len, activated_traits), dtype=np.int64, count=len(combos))
+        flags = np.fromiter(map(is_region.__contains__, chain.from_iterable(activated_traits)), dtype=np.float64,
+                            count=int(sizes.sum()))
+        regions = np.bincount(np.repeat(np.arange(len(combos)), sizes), weights=flags, minlength=len(combos))
+        picks = set()
+        for primary, secondary in [(-cost, trait_count), (trait_count, -cost), (regions, -cost)]:
+            picks.update(np.lexsort((-ordinal, secondary, primary))[-self.top_n:].tolist())
+        for i in sorted(picks):
+            self.add(combos[i], ordinals[i])
+            
+    def _push(self, name, key, combo):
+        heap = self.heaps[name]
+        if len(heap) < self.top_n:
+            heapq.heappush(heap, (key, combo))
+        elif key > heap[0][0]:
+            heapq.heapreplace(heap, (key, combo))
+            
+    def merge(self, other, ordinal_base):
+        """Fold in the heaps of a later shard whose first combination has ordinal_base"""
+        for name, heap in other.heaps.items():
+            for key, combo in heap:
+                self._push(name, key[:2] + (key[2] - ordinal_base,), combo)
+                
+    def ranked(self, name):
+        """Combinations of one ranking, best first"""
+        return [combo for _key, combo in sorted(self.heaps[name], reverse=True)]
+
 class ComboChecker:
     def __init__(self):
         # Load reference data
@@ -16,7 +218,7 @@ class ComboChecker:
         with self.units_costs_path.open('r', encoding='utf-8') as f:
             self.units_costs = json.load(f)
             
-        # Target regions for validation
+        # Target regions for files that do not record the ones their search targeted
         self.target_regions = [
             'Bilgewater', 'Demacia', 'Freljord', 'Ionia', 'Ixtal', 
             'Noxus', 'Piltover', 'Shadow Isles', 'Shurima', 'Targon', 
@@ -46,54 +248,263 @@ class ComboChecker:
         print(f"Loaded {len(self.traits_data)} traits and {len(self.units_costs)} unit costs")
         print(f"Target regions: {len(self.target_regions)}")
         
-    def validate_combo_file(self, combo_file_path=None):
-        """Validate the entire combo file"""
+        # Matrices for batch validation are built on first use
+        self._batch_tables = None
+        
+    def regions_for(self, search_params):
+        """Target regions of a search: the ones its file records, else the default ones"""
+        target_regions = search_params.get('target_regions')
+        return self.target_regions if target_regions is None else target_regions
+        
+    def _build_batch_tables(self):
+        """Build the unit/trait index, cost vector, unit x trait matrix and tier lookup table"""
+        if self._batch_tables is not None:
+            return self._batch_tables
+            
+        units = sorted(set(self.units_costs.keys()) | set(self.unit_traits.keys()))
+        traits = list(self.traits_data.keys())
+        unit_index = {unit: i for i, unit in enumerate(units)}
+        trait_index = {trait: i for i, trait in enumerate(traits)}
+        
+        cost_vector = np.zeros(len(units), dtype=np.float32)
+        missing_cost = np.ones(len(units), dtype=np.float32)
+        for unit, cost in self.units_costs.items():
+            cost_vector[unit_index[unit]] = cost
+            missing_cost[unit_index[unit]] = 0
+            
+        unit_trait_matrix = np.zeros((len(units), len(traits)), dtype=np.float32)
+        for unit, unit_traits in self.unit_traits.items():
+            for trait in unit_traits:
+                unit_trait_matrix[unit_index[unit], trait_index[trait]] += 1
+                
+        # tier_table[t, count] is the highest threshold of trait t reached with count units (0 = inactive)
+        max_count = int(unit_trait_matrix.sum(axis=0).max()) if traits else 0
+        tier_table = np.zeros((len(traits), max_count + 1), dtype=np.int64)
+        for trait, thresholds in self.trait_thresholds.items():
+            row = tier_table[trait_index[trait]]
+            for th in thresholds:
+                if th <= max_count:
+                    row[th:] = th
+                    
+        self._batch_tables = {
+            'unit_index': unit_index,
+            'trait_index': trait_index,
+            'unit_lookup': IndexLookup(unit_index),
+            'trait_lookup': IndexLookup(trait_index),
+            'cost_vector': cost_vector,
+            'missing_cost': missing_cost,
+            'unit_trait_matrix': unit_trait_matrix,
+            'tier_table': tier_table,
+        }
+        return self._batch_tables
+        
+    def scan_combo_file(self, combo_file_path=None, validate=True, statistics=True, best=True, top_n=5):
+        """Read the combo file once and feed validation, statistics and best-N heaps.
+        
+        The offset index used by inspect_combo is refreshed from the same pass.
+        Returns a result dict consumed by the report_* methods, or None when the
+        file is missing or is not valid JSON.
+        """
         if combo_file_path is None:
             combo_file_path = self.combos_path
+        combo_file_path = Path(combo_file_path)
             
         if not combo_file_path.exists():
             print(f"ERROR: Combo file {combo_file_path} does not exist")
-            return False
+            return None
             
+        reader = ComboFileReader(combo_file_path)
+        offsets = array('Q')
+        lengths = array('Q')
+        
+        def combos():
+            for offset, length, combo in reader.iter_records():
+                offsets.append(offset)
+                lengths.append(length)
+                yield combo
+                
         try:
-            with combo_file_path.open('r', encoding='utf-8') as f:
-                data = json.load(f)
+            result = self._scan_combos(combos(), reader.header, validate, statistics, best, top_n)
         except json.JSONDecodeError as e:
             print(f"ERROR: Invalid JSON in {combo_file_path}: {e}")
+            return None
+        write_combo_index(combo_file_path, offsets, lengths)
+            
+        result['path'] = combo_file_path
+        result['missing_keys'] = [key for key in ['search_parameters', 'total_combinations_found'] if key not in reader.header]
+        if not reader.has_combinations:
+            result['missing_keys'].append('combinations')
+        elif validate and not result['validated'] and result['count'] and 'search_parameters' not in result['missing_keys']:
+            # search_parameters only appeared after the combinations array
+            result['missing_keys'].append('search_parameters')
+        return result
+        
+    def _scan_combos(self, combos, header, validate, statistics, best, top_n):
+        """Feed an iterable of combinations through the requested analyses.
+        
+        `header` may be filled while iterating; validation starts once it holds
+        search_parameters. Errors are kept as (index, message) pairs, indices
+        relative to the first combination of `combos`. Malformed records (see
+        combo_structure_errors) are counted in 'skipped' and left out of the
+        statistics and best-N heaps; validation reports them.
+        """
+        result = {
+            'header': header,
+            'count': 0,
+            'valid_count': 0,
+            'invalid_count': 0,
+            'error_count': 0,
+            'errors': [],
+            'skipped': 0,
+            'validated': False,
+            'statistics': ComboStatistics(self.target_regions) if statistics else None,
+            'best': BestCombos(self.target_regions, top_n) if best else None,
+        }
+        pending = []
+        validating = False
+        
+        def flush():
+            chunk_start = result['count'] - len(pending)
+            columns = combo_columns(pending)
+            if validating:
+                valid, invalid, errors = self._validate_chunk(pending, header['search_parameters'], columns)
+                result['valid_count'] += valid
+                result['invalid_count'] += invalid
+                result['error_count'] += len(errors)
+                for offset, msg in errors[:MAX_REPORTED_ERRORS - len(result['errors'])]:
+                    result['errors'].append((chunk_start + offset, msg))
+            if statistics or best:
+                wellformed = columns['wellformed']
+                fields = ['units', 'activated_traits', 'total_cost', 'trait_count']
+                chunk = pending
+                if not wellformed.all():
+                    result['skipped'] += int((~wellformed).sum())
+                    keep = np.flatnonzero(wellformed).tolist()
+                    columns = {field: [columns[field][i] for i in keep] for field in fields}
+                    chunk = [pending[i] for i in keep]
+                    ordinals = [chunk_start + i for i in keep]
+                else:
+                    ordinals = range(chunk_start, chunk_start + len(pending))
+                if statistics:
+                    result['statistics'].add_many(columns['total_cost'], columns['trait_count'],
+                                                  list(map(len, columns['units'])), columns['activated_traits'])
+                if best:
+                    result['best'].add_many(chunk, ordinals, columns['total_cost'], columns['trait_count'],
+                                            columns['activated_traits'])
+            pending.clear()
+            
+        for ordinal, combo in enumerate(combos):
+            if ordinal == 0:
+                # the header is read by now: count the regions the search targeted, and validate when it
+                # holds the search parameters
+                target_regions = self.regions_for(header.get('search_parameters', {}))
+                for aggregate in (result['statistics'], result['best']):
+                    if aggregate is not None:
+                        aggregate.target_regions = target_regions
+                validating = result['validated'] = validate and 'search_parameters' in header
+            result['count'] += 1
+            if validating or statistics or best:
+                pending.append(combo)
+                if len(pending) >= BATCH_CHUNK_SIZE:
+                    flush()
+        if pending:
+            flush()
+        return result
+        
+    def scan_combo_files(self, combo_file_paths, workers=None, validate=True, statistics=True, best=True, top_n=5):
+        """Scan combo files in a process pool and merge the per-shard aggregates.
+        
+        Several paths are treated as shards of one result, in the given order. A
+        single path is split into ordinal ranges on record boundaries using its
+        offset index. The merged result has the same shape as scan_combo_file's.
+        """
+        paths = [Path(path) for path in combo_file_paths]
+        for path in paths:
+            if not path.exists():
+                print(f"ERROR: Combo file {path} does not exist")
+                return None
+        workers = workers or os.cpu_count() or 1
+        options = (validate, statistics, best, top_n)
+        
+        if len(paths) == 1:
+            index = load_combo_index(paths[0])
+            if index is None:
+                print(f"Building offset index for {paths[0]} ...")
+                try:
+                    build_combo_index(paths[0])
+                except json.JSONDecodeError as e:
+                    print(f"ERROR: Invalid JSON in {paths[0]}: {e}")
+                    return None
+                index = load_combo_index(paths[0])
+            step = max(1, -(-len(index) // workers))
+            tasks = [(paths[0], start, min(start + step, len(index)), options)
+                     for start in range(0, len(index), step)] or [(paths[0], 0, 0, options)]
+        else:
+            tasks = [(path, None, None, options) for path in paths]
+            
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_shard_worker, initargs=(self,)) as pool:
+            shard_results = list(pool.map(_scan_shard, tasks))
+        if any(shard_result is None for shard_result in shard_results):
+            return None
+        return self._merge_scan_results(shard_results, split=len(paths) == 1)
+        
+    def _merge_scan_results(self, shard_results, split=False):
+        """Combine shard results in order; a split file keeps its own header totals"""
+        merged = dict(shard_results[0])
+        merged['header'] = dict(shard_results[0]['header'])
+        merged['errors'] = []
+        merged['missing_keys'] = []
+        for key in ['count', 'valid_count', 'invalid_count', 'error_count', 'skipped']:
+            merged[key] = 0
+        claimed = 0
+        for shard_result in shard_results:
+            if shard_result is not shard_results[0]:
+                if merged['statistics'] is not None:
+                    merged['statistics'].merge(shard_result['statistics'])
+                if merged['best'] is not None:
+                    merged['best'].merge(shard_result['best'], merged['count'])
+            for offset, msg in shard_result['errors'][:MAX_REPORTED_ERRORS - len(merged['errors'])]:
+                merged['errors'].append((merged['count'] + offset, msg))
+            for key in ['count', 'valid_count', 'invalid_count', 'error_count', 'skipped']:
+                merged[key] += shard_result[key]
+            merged['validated'] = merged['validated'] or shard_result['validated']
+            for key in shard_result['missing_keys']:
+                if key not in merged['missing_keys']:
+                    merged['missing_keys'].append(key)
+            claimed += shard_result['header'].get('total_combinations_found', 0)
+        if not split and 'total_combinations_found' in merged['header']:
+            merged['header']['total_combinations_found'] = claimed
+        return merged
+        
+    def validate_combo_file(self, combo_file_path=None):
+        """Validate the entire combo file"""
+        result = self.scan_combo_file(combo_file_path, statistics=False, best=False)
+        return self.report_validation(result)
+        
+    def report_validation(self, result):
+        """Print the validation section of a scan result"""
+        if result is None:
             return False
             
         # Validate file structure
-        required_keys = ['search_parameters', 'total_combinations_found', 'combinations']
-        for key in required_keys:
-            if key not in data:
-                print(f"ERROR: Missing required key '{key}' in combo file")
-                return False
-                
-        search_params = data['search_parameters']
-        total_found = data['total_combinations_found']
-        combinations = data['combinations']
+        for key in result['missing_keys']:
+            print(f"ERROR: Missing required key '{key}' in combo file")
+            return False
+            
+        search_params = result['header']['search_parameters']
+        total_found = result['header']['total_combinations_found']
         
         print(f"Search Parameters:")
         for key, value in search_params.items():
             print(f"  {key}: {value}")
         print(f"Total combinations claimed: {total_found}")
-        print(f"Actual combinations in file: {len(combinations)}")
+        print(f"Actual combinations in file: {result['count']}")
         
-        if total_found != len(combinations):
-            print(f"WARNING: Claimed total ({total_found}) doesn't match actual count ({len(combinations)})")
+        if total_found != result['count']:
+            print(f"WARNING: Claimed total ({total_found}) doesn't match actual count ({result['count']})")
             
-        # Validate each combination
-        valid_count = 0
-        invalid_count = 0
-        errors = []
-        
-        for i, combo in enumerate(combinations):
-            is_valid, error_msgs = self.validate_single_combo(combo, search_params)
-            if is_valid:
-                valid_count += 1
-            else:
-                invalid_count += 1
-                errors.extend([f"Combo {i+1}: {msg}" for msg in error_msgs])
+        valid_count = result['valid_count']
+        invalid_count = result['invalid_count']
                 
         print(f"\nValidation Results:")
         print(f"  Valid combinations: {valid_count}")
@@ -102,23 +513,144 @@ class ComboChecker:
         
         if invalid_count > 0:
             print(f"\nFirst 10 errors:")
-            for error in errors[:10]:
-                print(f"  {error}")
-            if len(errors) > 10:
-                print(f"  ... and {len(errors)-10} more errors")
+            for index, msg in result['errors'][:10]:
+                print(f"  Combo {index+1}: {msg}")
+            if result['error_count'] > 10:
+                print(f"  ... and {result['error_count']-10} more errors")
                 
         return invalid_count == 0
         
-    def validate_single_combo(self, combo, search_params):
-        """Validate a single combination"""
+    def validate_combos_batch(self, combinations, search_params, start_index=0):
+        """Validate a list of combinations with matrix operations.
+        
+        Only combinations failing a check are re-run through validate_single_combo
+        to produce error messages. Returns (valid_count, invalid_count, errors).
+        """
+        valid_count = 0
+        invalid_count = 0
         errors = []
         
-        # Check required fields
-        required_fields = ['units', 'trait_count', 'activated_traits', 'total_cost', 'activated_details']
-        for field in required_fields:
-            if field not in combo:
-                errors.append(f"Missing field '{field}'")
+        for chunk_start in range(0, len(combinations), BATCH_CHUNK_SIZE):
+            chunk = combinations[chunk_start:chunk_start + BATCH_CHUNK_SIZE]
+            valid, invalid, chunk_errors = self._validate_chunk(chunk, search_params)
+            valid_count += valid
+            invalid_count += invalid
+            errors.extend([f"Combo {start_index + chunk_start + offset + 1}: {msg}" for offset, msg in chunk_errors])
+                    
+        return valid_count, invalid_count, errors
+        
+    def _validate_chunk(self, chunk, search_params, columns=None):
+        """Batch-validate one chunk; errors are (offset in chunk, message) pairs"""
+        valid_mask = self._batch_valid_mask(chunk, search_params, columns)
+        valid_count = int(valid_mask.sum())
+        invalid_count = 0
+        errors = []
+        for offset in np.flatnonzero(~valid_mask):
+            is_valid, error_msgs = self.validate_single_combo(chunk[offset], search_params)
+            if is_valid:
+                valid_count += 1
+            else:
+                invalid_count += 1
+                errors.extend([(int(offset), msg) for msg in error_msgs])
+        return valid_count, invalid_count, errors
+        
+    def _batch_valid_mask(self, combinations, search_params, columns=None):
+        """Return a boolean array marking the combinations that pass every check.
+        
+        Every field is flattened across the batch (see combo_columns) and turned
+        into index arrays in bulk; anything odd is left to the per-combo path.
+        `columns` may hold the combo_columns of the batch already.
+        """
+        tables = self._build_batch_tables()
+        unit_index = tables['unit_index']
+        trait_index = tables['trait_index']
+        n_combos = len(combinations)
+        n_units = len(unit_index)
+        n_traits = len(trait_index)
+        region_indices = [trait_index[r] for r in self.regions_for(search_params) if r in trait_index]
+        if columns is None:
+            columns = combo_columns(combinations)
+        rows_of = np.arange(n_combos)
+        
+        # Structural checks: well-formed records without emblems (emblem counts are checked per combo)
+        ok = columns['wellformed'] & ~np.fromiter(map(bool, columns['emblems']), dtype=bool, count=n_combos)
+        units = columns['units']
+        details = columns['activated_details']
+        activated_traits = columns['activated_traits']
+        if not set(map(type, chain.from_iterable(units))) <= {str}:
+            good = np.fromiter((all(type(unit) is str for unit in team) for team in units), dtype=bool, count=n_combos)
+            ok &= good
+            units = restrict(units, good, [])
+        if not set(map(type, chain.from_iterable(activated_traits))) <= {str}:
+            good = np.fromiter((all(type(trait) is str for trait in traits) for traits in activated_traits),
+                               dtype=bool, count=n_combos)
+            ok &= good
+            activated_traits = restrict(activated_traits, good, [])
+        if not set(map(type, chain.from_iterable(map(dict.values, details)))) <= {int}:
+            good = np.fromiter((all(type(th) is int for th in detail.values()) for detail in details),
+                               dtype=bool, count=n_combos)
+            ok &= good
+            details = restrict(details, good, {})
+            
+        def flatten(lists, lookup):
+            # (row of each entry, index of each entry by lookup), marking rows holding an unknown name as not ok
+            sizes = np.fromiter(map(len, lists), dtype=np.int64, count=n_combos)
+            rows = np.repeat(rows_of, sizes)
+            ids = np.fromiter(map(lookup.__getitem__, chain.from_iterable(lists)), dtype=np.intp, count=len(rows))
+            unknown = ids < 0
+            ok[rows[unknown]] = False
+            ids[unknown] = 0
+            return sizes, rows, ids
+            
+        team_sizes, unit_rows, unit_ids = flatten(units, tables['unit_lookup'])
+        incidence = np.zeros((n_combos, n_units), dtype=np.float32)
+        incidence[unit_rows, unit_ids] = 1
+        # a unit listed twice is set once
+        ok &= incidence.sum(axis=1) == team_sizes
+        
+        _sizes, tier_rows, tier_ids = flatten(details, tables['trait_lookup'])
+        tier_values = np.fromiter(chain.from_iterable(map(dict.values, details)), dtype=np.int64, count=len(tier_rows))
+        ok[tier_rows[tier_values <= 0]] = False
+        reported_tiers = np.zeros((n_combos, n_traits), dtype=np.int64)
+        reported_tiers[tier_rows, tier_ids] = tier_values
+        
+        # activated_traits lists the activated_details keys, in any order
+        _sizes, trait_rows, trait_ids = flatten(activated_traits, tables['trait_lookup'])
+        listed = np.zeros((n_combos, n_traits), dtype=bool)
+        listed[trait_rows, trait_ids] = True
+        ok &= (listed == (reported_tiers > 0)).all(axis=1)
+        
+        reported_cost = np.array(columns['total_cost'], dtype=np.float64)
+        reported_trait_count = np.array(columns['trait_count'], dtype=np.float64)
+        
+        # Costs and trait counts for every combo at once
+        calculated_cost = incidence @ tables['cost_vector']
+        trait_counts = (incidence @ tables['unit_trait_matrix']).astype(np.int64)
+        expected_tiers = tables['tier_table'][np.arange(n_traits), trait_counts]
+        
+        ok &= incidence @ tables['missing_cost'] == 0
+        ok &= calculated_cost == reported_cost
+        ok &= (expected_tiers == reported_tiers).all(axis=1)
+        ok &= reported_trait_count == (reported_tiers > 0).sum(axis=1)
+        ok &= (reported_tiers[:, region_indices] > 0).sum(axis=1) >= search_params.get('min_regions', 5)
+        
+        ok &= reported_cost <= search_params.get('max_cost', 50)
+        min_units = search_params.get('start_units', 7)
+        max_units = search_params.get('max_units', 8)
+        ok &= (team_sizes >= min_units) & (team_sizes <= max_units)
+        
+        for req_unit in search_params.get('required_units', None) or []:
+            if req_unit in unit_index:
+                ok &= incidence[:, unit_index[req_unit]] > 0
+            else:
+                ok[:] = False
                 
+        return ok
+        
+    def validate_single_combo(self, combo, search_params):
+        """Validate a single combination"""
+        # Check required fields
+        errors = combo_structure_errors(combo)
         if errors:
             return False, errors
             
@@ -164,6 +696,21 @@ class ComboChecker:
                 for trait in self.unit_traits[unit]:
                     trait_counts[trait] += 1
                     
+        # Emblems add one to a trait each, on units without it, within the search's emblem budget
+        emblems = combo.get('emblems') or {}
+        if not isinstance(emblems, dict) or not all(type(n) is int and n > 0 for n in emblems.values()):
+            errors.append(f"Invalid emblems {emblems}")
+            emblems = {}
+        max_emblems = search_params.get('emblems', 0)
+        if sum(emblems.values()) > max_emblems:
+            errors.append(f"{sum(emblems.values())} emblems exceed the budget of {max_emblems}")
+        for trait, count in emblems.items():
+            if trait not in self.trait_thresholds:
+                errors.append(f"Emblem for unknown trait '{trait}'")
+            elif trait_counts[trait] + count > len(units):
+                errors.append(f"{count} {trait} emblems but only {len(units) - trait_counts[trait]} units without the trait")
+            trait_counts[trait] += count
+                    
         # Check activated traits
         expected_activated = {}
         for trait, count in trait_counts.items():
@@ -194,10 +741,12 @@ class ComboChecker:
         if trait_count != len(activated_details):
             errors.append(f"trait_count {trait_count} doesn't match activated traits count {len(activated_details)}")
             
-        # Check target region requirement (at least 5)
-        activated_regions = [trait for trait in activated_details.keys() if trait in self.target_regions]
-        if len(activated_regions) < 5:
-            errors.append(f"Only {len(activated_regions)} target regions activated, need at least 5: {activated_regions}")
+        # Check target region requirement (at least min_regions, 5 for files predating the parameter)
+        min_regions = search_params.get('min_regions', 5)
+        target_regions = self.regions_for(search_params)
+        activated_regions = [trait for trait in activated_details.keys() if trait in target_regions]
+        if len(activated_regions) < min_regions:
+            errors.append(f"Only {len(activated_regions)} target regions activated, need at least {min_regions}: {activated_regions}")
             
         # Check for duplicate units
         if len(units) != len(set(units)):
@@ -211,16 +760,19 @@ class ComboChecker:
         if combo_file_path is None:
             combo_file_path = self.combos_path
             
-        with combo_file_path.open('r', encoding='utf-8') as f:
-            data = json.load(f)
-            
-        combinations = data['combinations']
+        # Seek through the offset index sidecar, building it on first use
+        index = load_combo_index(combo_file_path)
+        if index is None:
+            print(f"Building offset index for {combo_file_path} ...")
+            build_combo_index(combo_file_path)
+            index = load_combo_index(combo_file_path)
         
-        if combo_index < 0 or combo_index >= len(combinations):
-            print(f"ERROR: Invalid combo index {combo_index}. Valid range: 0-{len(combinations)-1}")
+        if combo_index < 0 or combo_index >= len(index):
+            print(f"ERROR: Invalid combo index {combo_index}. Valid range: 0-{len(index)-1}")
             return
             
-        combo = combinations[combo_index]
+        combo = read_combo_at(combo_file_path, index, combo_index)
+        search_params = read_combo_header(combo_file_path).get('search_parameters', {})
         
         print(f"\nDetailed Analysis of Combination #{combo_index + 1}:")
         print(f"Units: {combo['units']}")
@@ -242,19 +794,20 @@ class ComboChecker:
             print(f"  {unit}: {traits}")
             
         print(f"\nActivated Traits:")
+        target_regions = self.regions_for(search_params)
         target_region_count = 0
         for trait in sorted(combo['activated_traits']):
             threshold = combo['activated_details'].get(trait, 0)
-            is_target = trait in self.target_regions
+            is_target = trait in target_regions
             if is_target:
                 target_region_count += 1
             region_marker = " [TARGET REGION]" if is_target else ""
             print(f"  {trait}: threshold {threshold}{region_marker}")
             
-        print(f"\nTarget Regions Activated: {target_region_count}/13")
+        print(f"\nTarget Regions Activated: {target_region_count}/{len(target_regions)}")
         
         # Validate this specific combo
-        is_valid, errors = self.validate_single_combo(combo, data['search_parameters'])
+        is_valid, errors = self.validate_single_combo(combo, search_params)
         if is_valid:
             print(f"\n✅ This combination is VALID")
         else:
@@ -264,113 +817,229 @@ class ComboChecker:
     
     def summary_statistics(self, combo_file_path=None):
         """Generate summary statistics for the combo file"""
-        if combo_file_path is None:
-            combo_file_path = self.combos_path
-            
-        with combo_file_path.open('r', encoding='utf-8') as f:
-            data = json.load(f)
-            
-        combinations = data['combinations']
+        result = self.scan_combo_file(combo_file_path, validate=False, best=False)
+        self.report_statistics(result)
+        
+    def report_statistics(self, result):
+        """Print the summary statistics section of a scan result"""
+        if result is None:
+            return
+        stats = result['statistics']
         
         print(f"\nSummary Statistics:")
-        print(f"Total combinations: {len(combinations)}")
+        print(f"Total combinations: {stats.count}")
+        if result['skipped']:
+            print(f"Skipped {result['skipped']} malformed combinations")
+        if stats.count == 0:
+            return
         
         # Cost distribution
-        costs = [combo['total_cost'] for combo in combinations]
-        print(f"Cost range: {min(costs)} - {max(costs)}")
-        print(f"Average cost: {sum(costs)/len(costs):.1f}")
+        print(f"Cost range: {stats.cost_min} - {stats.cost_max}")
+        print(f"Average cost: {stats.cost_sum/stats.count:.1f}")
         
         # Trait count distribution
-        trait_counts = [combo['trait_count'] for combo in combinations]
-        print(f"Trait count range: {min(trait_counts)} - {max(trait_counts)}")
-        print(f"Average trait count: {sum(trait_counts)/len(trait_counts):.1f}")
+        print(f"Trait count range: {stats.trait_count_min} - {stats.trait_count_max}")
+        print(f"Average trait count: {stats.trait_count_sum/stats.count:.1f}")
         
         # Team size distribution
-        team_sizes = [len(combo['units']) for combo in combinations]
-        size_dist = Counter(team_sizes)
         print(f"Team size distribution:")
-        for size in sorted(size_dist.keys()):
-            print(f"  {size} units: {size_dist[size]} combinations")
+        for size in sorted(stats.size_distribution.keys()):
+            print(f"  {size} units: {stats.size_distribution[size]} combinations")
             
         # Most common activated traits
-        all_traits = []
-        for combo in combinations:
-            all_traits.extend(combo['activated_traits'])
-        trait_frequency = Counter(all_traits)
         print(f"Most common activated traits:")
-        for trait, count in trait_frequency.most_common(10):
-            print(f"  {trait}: {count} times ({count/len(combinations)*100:.1f}%)")
+        for trait, count in stats.trait_frequency.most_common(10):
+            print(f"  {trait}: {count} times ({count/stats.count*100:.1f}%)")
             
         # Region coverage
-        region_counts = Counter()
-        for combo in combinations:
-            for trait in combo['activated_traits']:
-                if trait in self.target_regions:
-                    region_counts[trait] += 1
         print(f"Target region activation rates:")
-        for region in self.target_regions:
-            count = region_counts.get(region, 0)
-            print(f"  {region}: {count} times ({count/len(combinations)*100:.1f}%)")
+        for region in stats.target_regions:
+            count = stats.region_counts.get(region, 0)
+            print(f"  {region}: {count} times ({count/stats.count*100:.1f}%)")
             
     def find_best_combos(self, combo_file_path=None, top_n=5):
         """Find the best combinations by various criteria"""
-        if combo_file_path is None:
-            combo_file_path = self.combos_path
-            
-        with combo_file_path.open('r', encoding='utf-8') as f:
-            data = json.load(f)
-            
-        combinations = data['combinations']
+        result = self.scan_combo_file(combo_file_path, validate=False, statistics=False, top_n=top_n)
+        self.report_best_combos(result)
+        
+    def report_best_combos(self, result):
+        """Print the best combinations section of a scan result"""
+        if result is None:
+            return
+        best = result['best']
+        top_n = best.top_n
         
         print(f"\nBest Combinations Analysis:")
+        if result['skipped']:
+            print(f"Skipped {result['skipped']} malformed combinations")
         
         # Lowest cost
-        by_cost = sorted(combinations, key=lambda x: (x['total_cost'], -x['trait_count']))
         print(f"\nLowest Cost (Top {top_n}):")
-        for i, combo in enumerate(by_cost[:top_n]):
-            regions = sum(1 for t in combo['activated_traits'] if t in self.target_regions)
+        for i, combo in enumerate(best.ranked('cost')):
+            regions = sum(1 for t in combo['activated_traits'] if t in best.target_regions)
             print(f"  {i+1}. Cost: {combo['total_cost']}, Traits: {combo['trait_count']}, Regions: {regions}")
             print(f"     Units: {combo['units']}")
             
         # Most traits
-        by_traits = sorted(combinations, key=lambda x: (-x['trait_count'], x['total_cost']))
         print(f"\nMost Traits (Top {top_n}):")
-        for i, combo in enumerate(by_traits[:top_n]):
-            regions = sum(1 for t in combo['activated_traits'] if t in self.target_regions)
+        for i, combo in enumerate(best.ranked('traits')):
+            regions = sum(1 for t in combo['activated_traits'] if t in best.target_regions)
             print(f"  {i+1}. Cost: {combo['total_cost']}, Traits: {combo['trait_count']}, Regions: {regions}")
             print(f"     Units: {combo['units']}")
             
         # Most regions
-        by_regions = sorted(combinations, key=lambda x: (-sum(1 for t in x['activated_traits'] if t in self.target_regions), x['total_cost']))
         print(f"\nMost Target Regions (Top {top_n}):")
-        for i, combo in enumerate(by_regions[:top_n]):
-            regions = sum(1 for t in combo['activated_traits'] if t in self.target_regions)
+        for i, combo in enumerate(best.ranked('regions')):
+            regions = sum(1 for t in combo['activated_traits'] if t in best.target_regions)
             print(f"  {i+1}. Cost: {combo['total_cost']}, Traits: {combo['trait_count']}, Regions: {regions}")
             print(f"     Units: {combo['units']}")
-            print(f"     Regions: {[t for t in combo['activated_traits'] if t in self.target_regions]}")
+            print(f"     Regions: {[t for t in combo['activated_traits'] if t in best.target_regions]}")
+
+    def diff_combo_files(self, path_a, path_b, max_examples=10):
+        """Compare the combinations of two combo files (e.g. two search engines' outputs).
+        
+        Combos are matched by unit set regardless of order, keyed by their exact
+        rank over the season's units where possible; returns True when both
+        files hold the same combinations with the same details.
+        """
+        for path in (path_a, path_b):
+            if not Path(path).exists():
+                print(f"ERROR: Combo file {path} does not exist")
+                return False
+        try:
+            codec = ComboRankCodec(set(self.units_costs) | set(self.unit_traits), DIFF_RANK_MAX_SIZE)
+        except ValueError:
+            # too many units for 64-bit ranks of full teams: hash every unit set
+            codec = None
+        try:
+            result = diff_combo_files(path_a, path_b, max_examples, codec=codec)
+        except json.JSONDecodeError as e:
+            print(f"ERROR: Invalid JSON: {e}")
+            return False
+            
+        print(f"A: {path_a} ({result['count_a']} combinations)")
+        print(f"B: {path_b} ({result['count_b']} combinations)")
+        for key in sorted(set(result['header_a'].get('search_parameters', {})) | set(result['header_b'].get('search_parameters', {}))):
+            value_a = result['header_a'].get('search_parameters', {}).get(key)
+            value_b = result['header_b'].get('search_parameters', {}).get(key)
+            if value_a != value_b:
+                print(f"WARNING: search parameter {key} differs: {value_a} vs {value_b}")
+                
+        print(f"\nDiff Results:")
+        print(f"  Common combinations: {result['common']}")
+        print(f"  Unchanged: {result['unchanged']}")
+        print(f"  Changed: {result['changed']}")
+        print(f"  Missing from B (only in A): {result['missing']}")
+        print(f"  Extra in B (only in B): {result['extra']}")
+        if result['duplicates_a'] or result['duplicates_b']:
+            print(f"  Duplicate combinations: {result['duplicates_a']} in A, {result['duplicates_b']} in B")
+            
+        sections = [
+            ('missing', "Missing from B", 0),
+            ('extra', "Extra in B", 2),
+        ]
+        for kind, title, side in sections:
+            if result[kind]:
+                print(f"\nFirst {len(result[f'{kind}_examples'])} {title}:")
+                for example in sorted(result[f'{kind}_examples'], key=lambda e: e[side]):
+                    ordinal, combo = example[side], example[side + 1]
+                    if isinstance(combo, dict):
+                        print(f"  Combo {ordinal+1}: Cost: {combo.get('total_cost')}, Traits: {combo.get('trait_count')}, Units: {combo.get('units')}")
+                    else:
+                        print(f"  Combo {ordinal+1}: {combo!r}")
+        if result['changed']:
+            print(f"\nFirst {len(result['changed_examples'])} changed:")
+            for ordinal_a, combo_a, ordinal_b, combo_b in sorted(result['changed_examples'], key=lambda e: e[0]):
+                print(f"  A combo {ordinal_a+1} / B combo {ordinal_b+1}: Units: {sorted(combo_a['units'])}")
+                for field in sorted(set(combo_a) | set(combo_b)):
+                    if field != 'units' and combo_a.get(field) != combo_b.get(field):
+                        print(f"    {field}: {combo_a.get(field)} -> {combo_b.get(field)}")
+                        
+        identical = result['changed'] == 0 and result['missing'] == 0 and result['extra'] == 0
+        if identical:
+            print(f"\n✅ Both files contain the same combinations")
+        else:
+            print(f"\n❌ The files differ")
+        return identical
+
+# Checker shared with pool workers through the initializer
+_shard_checker = None
+
+def _init_shard_worker(checker):
+    global _shard_checker
+    _shard_checker = checker
+
+def _scan_shard(task):
+    """Scan one shard: a whole file, or an ordinal range [start, end) of an indexed file"""
+    path, start, end, (validate, statistics, best, top_n) = task
+    checker = _shard_checker
+    if start is None:
+        return checker.scan_combo_file(path, validate, statistics, best, top_n)
+        
+    index = load_combo_index(path)
+    header = read_combo_header(path)
+    
+    def combos():
+        with open(path, 'rb') as f:
+            for ordinal in range(start, end):
+                offset, length = (int(v) for v in index[ordinal])
+                f.seek(offset)
+                yield json.loads(f.read(length))
+                
+    result = checker._scan_combos(combos(), header, validate, statistics, best, top_n)
+    result['path'] = path
+    result['missing_keys'] = [key for key in ['search_parameters', 'total_combinations_found'] if key not in header]
+    return result
 
 def main():
     import sys
     
     checker = ComboChecker()
     
-    if len(sys.argv) > 1:
-        command = sys.argv[1]
+    # Optional "--workers N" and shard files for the full, best and stats commands
+    args = sys.argv[1:]
+    workers = None
+    if '--workers' in args:
+        position = args.index('--workers')
+        try:
+            workers = int(args[position + 1])
+        except (IndexError, ValueError):
+            print("ERROR: Please provide a valid number of workers")
+            return
+        del args[position:position + 2]
+    
+    def scan(paths, **options):
+        if workers is None and len(paths) <= 1:
+            return checker.scan_combo_file(paths[0] if paths else None, **options)
+        return checker.scan_combo_files(paths or [checker.combos_path], workers, **options)
+    
+    if args:
+        command = args[0]
         
-        if command == "inspect" and len(sys.argv) > 2:
+        if command == "inspect" and len(args) > 1:
             try:
-                combo_index = int(sys.argv[2])
+                combo_index = int(args[1])
                 checker.inspect_combo(combo_index)
             except ValueError:
                 print("ERROR: Please provide a valid combo index number")
             return
             
         elif command == "best":
-            checker.find_best_combos()
+            checker.report_best_combos(scan(args[1:], validate=False, statistics=False))
             return
             
+        elif command == "diff":
+            if len(args) != 3:
+                print("ERROR: Please provide two combo files to compare")
+                return
+            print("="*60)
+            print("COMBO FILE DIFF")
+            print("="*60)
+            identical = checker.diff_combo_files(args[1], args[2])
+            sys.exit(0 if identical else 1)
+            
         elif command == "stats":
-            checker.summary_statistics()
+            checker.report_statistics(scan(args[1:], validate=False, best=False))
             return
             
         elif command == "help":
@@ -379,7 +1048,12 @@ def main():
             print("  python combo_checker.py inspect N    - Inspect combo at index N")
             print("  python combo_checker.py best         - Show best combinations")
             print("  python combo_checker.py stats        - Show summary statistics only")
+            print("  python combo_checker.py diff A B     - Compare the combinations of two files")
             print("  python combo_checker.py help         - Show this help")
+            print("")
+            print("The full run, best and stats accept result shards and a process pool:")
+            print("  python combo_checker.py [best|stats] [--workers N] [FILE ...]")
+            print("  (a single FILE with --workers N is split on record boundaries)")
             return
     
     # Default: full validation
@@ -387,8 +1061,9 @@ def main():
     print("COMBO FILE VALIDATION")
     print("="*60)
     
-    # Validate the combo file
-    is_valid = checker.validate_combo_file()
+    # Validation, statistics and best combinations share a single pass over the file(s)
+    result = scan(args)
+    is_valid = checker.report_validation(result)
     
     if is_valid:
         print("\n✅ All combinations are VALID!")
@@ -396,10 +1071,12 @@ def main():
         print("\n❌ Some combinations are INVALID!")
         
     # Generate summary statistics
-    checker.summary_statistics()
+    checker.report_statistics(result)
     
     # Show best combinations
-    checker.find_best_combos()
+    checker.report_best_combos(result)
+    
+    print(f"\nPeak memory: {peak_memory_mb(include_children=True):.1f} MB")
     
     return is_valid
 
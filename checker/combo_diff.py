@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+import hashlib
+import heapq
+import json
+import os
+import tempfile
+from array import array
+
+import numpy as np
+
+from utils.combo_index import load_combo_index, read_combo_at, write_combo_index
+from utils.combo_stream import ComboFileReader
+
+# Records held in memory per sorted run; each record is 24 bytes
+DIFF_RUN_SIZE = 1 << 21
+# Records read at once from a run file while merging
+DIFF_BLOCK_SIZE = 1 << 16
+# Largest team keyed by its exact rank when a rank codec is given; larger teams are hashed
+DIFF_RANK_MAX_SIZE = 12
+
+RECORD_DTYPE = np.dtype([('key', '<u8'), ('payload', '<u8'), ('ordinal', '<u8')])
+
+def _hash64(text):
+    return int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'little')
+
+def _canonical(value):
+    return json.dumps(value, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+
+def combo_key_hash(combo):
+    """Hash of the unit set, independent of unit order.
+
+    A record without a list of unit names is keyed by its whole content,
+    so it only matches an identical record.
+    """
+    units = combo.get('units') if isinstance(combo, dict) else None
+    if not isinstance(units, list) or not all(isinstance(unit, str) for unit in units):
+        return _hash64('\x1e' + _canonical(combo))
+    return _hash64('\x1f'.join(sorted(units)))
+
+def combo_key(combo, codec=None):
+    """Unit-set key of a combo: its rank under `codec` (a ComboRankCodec) when it has one, else its hash.
+
+    Ranks are exact, so two different unit sets never share a key unless
+    a hashed team collides with a rank, as likely as two hashes colliding.
+    """
+    if codec is not None:
+        try:
+            return codec.encode(combo['units'])
+        except (KeyError, ValueError):
+            # unknown units, a unit twice or a team larger than the codec
+            pass
+    return combo_key_hash(combo)
+
+def combo_payload_hash(combo):
+    """Hash of every field except the units, in canonical form"""
+    if not isinstance(combo, dict):
+        return _hash64(_canonical(combo))
+    payload = {key: value for key, value in combo.items() if key != 'units'}
+    if isinstance(payload.get('activated_traits'), list) and all(isinstance(t, str) for t in payload['activated_traits']):
+        payload['activated_traits'] = sorted(payload['activated_traits'])
+    return _hash64(_canonical(payload))
+
+class SortedComboHashes:
+    """(key hash, payload hash, ordinal) records of one combo file, externally sorted.
+
+    The file is streamed once; records are sorted in runs of at most
+    `run_size` entries spilled to temporary files and merged lazily, so
+    memory stays bounded regardless of the file size. The offset index of
+    the file is written from the same pass so entries can be fetched back
+    by ordinal for reporting. Keys come from combo_key with `codec`.
+    """
+    def __init__(self, combo_file, tmpdir, run_size=DIFF_RUN_SIZE, codec=None):
+        self.combo_file = combo_file
+        self.header = {}
+        self.count = 0
+        self.run_paths = []
+
+        reader = ComboFileReader(combo_file)
+        offsets = array('Q')
+        lengths = array('Q')
+        run = np.empty(run_size, dtype=RECORD_DTYPE)
+        filled = 0
+        for offset, length, combo in reader.iter_records():
+            offsets.append(offset)
+            lengths.append(length)
+            run[filled] = (combo_key(combo, codec), combo_payload_hash(combo), self.count)
+            filled += 1
+            self.count += 1
+            if filled == run_size:
+                self._spill(run[:filled], tmpdir)
+                filled = 0
+        if filled or not self.run_paths:
+            self._spill(run[:filled], tmpdir)
+        self.header = dict(reader.header)
+        write_combo_index(combo_file, offsets, lengths)
+
+    def _spill(self, records, tmpdir):
+        records = np.sort(records, order=('key', 'payload', 'ordinal'))
+        fd, path = tempfile.mkstemp(suffix='.run', dir=tmpdir)
+        with os.fdopen(fd, 'wb') as fw:
+            records.tofile(fw)
+        self.run_paths.append(path)
+
+    @staticmethod
+    def _iter_run(path):
+        records = np.memmap(path, dtype=RECORD_DTYPE, mode='r') if os.path.getsize(path) else []
+        for start in range(0, len(records), DIFF_BLOCK_SIZE):
+            block = records[start:start + DIFF_BLOCK_SIZE]
+            yield from zip(block['key'].tolist(), block['payload'].tolist(), block['ordinal'].tolist())
+
+    def __iter__(self):
+        """Records in (key, payload, ordinal) order"""
+        if len(self.run_paths) == 1:
+            return self._iter_run(self.run_paths[0])
+        return heapq.merge(*(self._iter_run(path) for path in self.run_paths))
+
+def _group_by_key(records):
+    """Group a sorted record stream into (key, [(payload, ordinal), ...])"""
+    current_key = None
+    group = []
+    for key, payload, ordinal in records:
+        if key != current_key and group:
+            yield current_key, group
+            group = []
+        current_key = key
+        group.append((payload, ordinal))
+    if group:
+        yield current_key, group
+
+def diff_sorted_hashes(hashes_a, hashes_b, max_examples=10):
+    """Sort-merge two SortedComboHashes into a diff summary.
+
+    Entries are paired by unit set; a unit set present more often in one
+    file than the other counts the surplus as missing or extra. Example
+    lists hold (ordinal_a, ordinal_b) pairs, with None on the absent side.
+    """
+    result = {
+        'common': 0,
+        'unchanged': 0,
+        'changed': 0,
+        'missing': 0,
+        'extra': 0,
+        'duplicates_a': 0,
+        'duplicates_b': 0,
+        'changed_examples': [],
+        'missing_examples': [],
+        'extra_examples': [],
+    }
+
+    def note(kind, pair):
+        result[kind] += 1
+        examples = result[f'{kind}_examples']
+        if len(examples) < max_examples:
+            examples.append(pair)
+
+    groups_a = _group_by_key(iter(hashes_a))
+    groups_b = _group_by_key(iter(hashes_b))
+    group_a = next(groups_a, None)
+    group_b = next(groups_b, None)
+    while group_a is not None or group_b is not None:
+        if group_b is None or (group_a is not None and group_a[0] < group_b[0]):
+            result['duplicates_a'] += len(group_a[1]) - 1
+            for _payload, ordinal in group_a[1]:
+                note('missing', (ordinal, None))
+            group_a = next(groups_a, None)
+        elif group_a is None or group_b[0] < group_a[0]:
+            result['duplicates_b'] += len(group_b[1]) - 1
+            for _payload, ordinal in group_b[1]:
+                note('extra', (None, ordinal))
+            group_b = next(groups_b, None)
+        else:
+            entries_a, entries_b = group_a[1], group_b[1]
+            result['duplicates_a'] += len(entries_a) - 1
+            result['duplicates_b'] += len(entries_b) - 1
+            # pair identical payloads first, then the remaining entries in order
+            payloads_b = {}
+            for payload, ordinal in entries_b:
+                payloads_b.setdefault(payload, []).append(ordinal)
+            unmatched_a = []
+            for payload, ordinal in entries_a:
+                if payloads_b.get(payload):
+                    payloads_b[payload].pop(0)
+                    result['common'] += 1
+                    result['unchanged'] += 1
+                else:
+                    unmatched_a.append(ordinal)
+            unmatched_b = sorted(ordinal for ordinals in payloads_b.values() for ordinal in ordinals)
+            for ordinal_a, ordinal_b in zip(unmatched_a, unmatched_b):
+                result['common'] += 1
+                note('changed', (ordinal_a, ordinal_b))
+            for ordinal_a in unmatched_a[len(unmatched_b):]:
+                note('missing', (ordinal_a, None))
+            for ordinal_b in unmatched_b[len(unmatched_a):]:
+                note('extra', (None, ordinal_b))
+            group_a = next(groups_a, None)
+            group_b = next(groups_b, None)
+    return result
+
+def diff_combo_files(path_a, path_b, max_examples=10, run_size=DIFF_RUN_SIZE, tmpdir=None, codec=None):
+    """Compare the combination sets of two combo files in bounded memory.
+
+    Unit sets are keyed by their rank under `codec` where it covers them
+    (see combo_key), by a 64-bit hash otherwise. Returns the diff summary of diff_sorted_hashes extended with the file
+    headers and counts, and the example entries read back through the
+    offset index as (combo_a, combo_b) pairs.
+    """
+    with tempfile.TemporaryDirectory(dir=tmpdir) as workdir:
+        hashes_a = SortedComboHashes(path_a, workdir, run_size, codec)
+        hashes_b = SortedComboHashes(path_b, workdir, run_size, codec)
+        result = diff_sorted_hashes(hashes_a, hashes_b, max_examples)
+
+    result['count_a'] = hashes_a.count
+    result['count_b'] = hashes_b.count
+    result['header_a'] = hashes_a.header
+    result['header_b'] = hashes_b.header
+
+    index_a = load_combo_index(path_a)
+    index_b = load_combo_index(path_b)
+    for kind in ['changed', 'missing', 'extra']:
+        result[f'{kind}_examples'] = [
+            (ordinal_a, read_combo_at(path_a, index_a, ordinal_a) if ordinal_a is not None else None,
+             ordinal_b, read_combo_at(path_b, index_b, ordinal_b) if ordinal_b is not None else None)
+            for ordinal_a, ordinal_b in result[f'{kind}_examples']
+        ]
+    return result
@@ -0,0 +1,412 @@
+import heapq
+
+from collections import Counter
+from math import ceil, comb
+
+import numpy as np
+
+from preprocessor.search_cache import SubproblemCache
+
+try:
+    from ortools.sat.python import cp_model
+except ImportError:  # optional solver backend
+    cp_model = None
+
+# optimal-board backends selectable through the `backend` argument; 'auto' prefers CP-SAT when installed
+SOLVER_BACKENDS = ['auto', 'bnb', 'cpsat']
+# Seconds CP-SAT may spend on one solve
+CPSAT_TIME_LIMIT = 30.0
+# Dual prices tried by the branch and bound's LP bound, per extra unit and per missing region contribution
+SLOT_PRICES = np.arange(0, 6.5, 0.5)
+CONTRIBUTION_PRICES = np.arange(0, 6.5, 0.5)
+
+def board_rank(combo, position):
+    """Ranking of a board: total cost, then more active traits, then the order of the exhaustive search output"""
+    return (combo['total_cost'], -combo['trait_count'], len(combo['units']), [position[u] for u in combo['units']])
+
+def _activated(calc, counts):
+    activated = {}
+    for trait, thresholds in calc.trait_thresholds.items():
+        cnt = counts.get(trait, 0)
+        valids = [th for th in thresholds if th <= cnt]
+        if valids:
+            activated[trait] = max(valids)
+    return activated
+
+def _combo(calc, units, counts, cost):
+    activated = _activated(calc, counts)
+    return {
+        'units': list(units),
+        'trait_count': len(activated),
+        'activated_traits': sorted(list(activated.keys())),
+        'total_cost': cost,
+        'activated_details': activated
+    }
+
+def _setup(calc, candidates, required_units):
+    # like the exhaustive search, every required unit takes a team slot, even one outside the candidates
+    chosen = []
+    for unit in required_units or []:
+        if unit in candidates and unit not in chosen:
+            chosen.append(unit)
+    pool = [u for u in candidates if u not in chosen]
+    unit_cost = {u: int(calc.units_costs.get(u, 0)) for u in chosen + pool}
+    return chosen, pool, unit_cost
+
+def lagrangian_cost_bound(unit_costs, gains, min_slots, demand):
+    """Lower bound on the cost of taking at least min_slots of the units while their gains add up to demand.
+
+    Lagrangian dual of the LP relaxation: any slot price and contribution
+    price give a lower bound, the best over a grid of both is returned.
+    """
+    reduced = np.minimum(0, unit_costs[None, None, :] - SLOT_PRICES[:, None, None]
+                         - CONTRIBUTION_PRICES[None, :, None] * gains[None, None, :]).sum(axis=2)
+    bound = SLOT_PRICES[:, None] * min_slots + CONTRIBUTION_PRICES[None, :] * demand + reduced
+    return max(0.0, float(bound.max()))
+
+def root_cost_bound(calc, min_size, max_size, candidates, required_units=None, min_regions=4):
+    """Lower bound on the total cost of any valid board of min_size to max_size units, or None when none exists"""
+    chosen, pool, unit_cost = _setup(calc, candidates, required_units)
+    initial_depth = len(required_units) if required_units else 0
+    min_slots = max(0, min_size - initial_depth)
+    slots = max_size - initial_depth
+    if slots < min_slots or len(pool) < min_slots:
+        return None
+    base_cost = sum(unit_cost[u] for u in chosen)
+    costs = np.array(sorted(unit_cost[u] for u in pool), dtype=float)
+    counts = Counter(t for u in chosen for t in calc.unit_traits.get(u, []))
+    regions = [r for r in calc.target_regions if r in calc.trait_thresholds]
+    active = 0
+    needs = []
+    open_regions = []
+    for region in regions:
+        need = calc.trait_thresholds[region][0] - counts[region]
+        if need <= 0:
+            active += 1
+            continue
+        open_regions.append(region)
+        if need <= slots and sum(region in calc.unit_traits.get(u, []) for u in pool) >= need:
+            needs.append(need)
+    missing = min_regions - active
+    if missing <= 0:
+        return base_cost + float(costs[:min_slots].sum())
+    if len(needs) < missing:
+        return None
+    gains = np.array([sum(r in calc.unit_traits.get(u, []) for r in open_regions) for u in pool], dtype=float)
+    pool_costs = np.array([unit_cost[u] for u in pool], dtype=float)
+    return base_cost + lagrangian_cost_bound(pool_costs, gains, min_slots, sum(sorted(needs)[:missing]))
+
+def bnb_best_boards(calc, min_size, max_size, candidates, max_cost, required_units=None, min_regions=4, min_traits=0,
+                    k=1, instr=None):
+    """Depth-first branch and bound for the k best boards of any size in [min_size, max_size].
+
+    Candidates must be sorted by cost. They are visited cheapest first, so
+    good boards are found early and their cost becomes the incumbent
+    bound. A node is cut when even the
+    cheapest completion is worse than the k-th best board so far: it must
+    still take the cheapest remaining units up to the smallest open size
+    and buy the region contributions still missing. The bound is the LP
+    relaxation of both, evaluated through its Lagrangian dual over a grid
+    of prices per unit and per missing contribution.
+    Region and trait goals that cannot be reached any more cut the node too.
+    A subproblem (next candidate, depth, open sizes, capped goal counts)
+    whose subtree held no board good enough records the cost its boards
+    reach at least, which cuts it when another prefix reaches it again.
+
+    Returns the boards ranked by `board_rank`, which is the order of the
+    exhaustive search output sorted by (total cost, -trait count).
+    """
+    chosen, pool, unit_cost = _setup(calc, candidates, required_units)
+    n = len(pool)
+    initial_depth = len(required_units) if required_units else 0
+    ghosts = initial_depth - len(chosen)
+    position = {u: i for i, u in enumerate(chosen + pool)}
+    # boards need at least one active trait
+    min_traits = max(1, min_traits)
+
+    regions = [r for r in calc.target_regions if r in calc.trait_thresholds]
+    region_needs = {r: calc.trait_thresholds[r][0] for r in regions}
+    unit_regions = [[r for r in calc.unit_traits.get(u, []) if r in region_needs] for u in pool]
+    unit_trait_count = [sum(1 for t in calc.unit_traits.get(u, []) if t in calc.trait_thresholds) for u in pool]
+    costs = [unit_cost[u] for u in pool]
+    unit_costs = np.array(costs, dtype=float)
+    unit_region_matrix = np.array([[r in unit_regions[i] for r in regions] for i in range(n)], dtype=float).reshape(n, len(regions))
+    # cheapest_after[i][s]: cost of the s cheapest pool units at index >= i
+    max_slots = max(0, max_size - initial_depth)
+    cheapest_after = [[0]] * (n + 1)
+    window = []
+    for i in range(n - 1, -1, -1):
+        window = sorted(window + [costs[i]])[:max_slots]
+        cheapest_after[i] = [0] + [sum(window[:s]) for s in range(1, len(window) + 1)]
+    region_suffix = {}
+    for region in regions:
+        suffix = [0] * (n + 1)
+        for i in range(n - 1, -1, -1):
+            suffix[i] = suffix[i + 1] + (region in unit_regions[i])
+        region_suffix[region] = suffix
+    max_regions_per_unit = max((len(r) for r in unit_regions), default=0)
+    max_traits_per_unit = max(unit_trait_count, default=0)
+    # per trait: number of pool units at index >= i holding it, for the bound on active traits
+    trait_suffix = {}
+    for trait in calc.trait_thresholds:
+        suffix = [0] * (n + 1)
+        for i in range(n - 1, -1, -1):
+            suffix[i] = suffix[i + 1] + (trait in calc.unit_traits.get(pool[i], []))
+        trait_suffix[trait] = suffix
+
+    counts = {}
+    for unit in chosen:
+        for t in calc.unit_traits.get(unit, []):
+            counts[t] = counts.get(t, 0) + 1
+    # found: boards that entered the k best so far
+    state = {'cost': sum(unit_cost[u] for u in chosen), 'found': 0}
+    # subproblem -> added cost every board below it is known to reach at least; a subproblem is
+    # decided by the counts capped at the first threshold of the goal traits
+    cache = SubproblemCache()
+    if min_regions >= 1 and min_traits <= 1:
+        signature_thresholds = [(r, region_needs[r]) for r in regions]
+    else:
+        signature_thresholds = [(t, thresholds[0]) for t, thresholds in calc.trait_thresholds.items()]
+    team = list(chosen)
+    # max-heap of the k best boards: (negated rank, combo)
+    best = []
+
+    def worst_cost():
+        return best[0][1]['total_cost'] if len(best) >= k else max_cost
+
+    def space(remaining, depth, first_size, last_size):
+        return sum(comb(remaining, size - depth) for size in range(first_size, last_size + 1) if 0 <= size - depth <= remaining)
+
+    def negated(rank):
+        cost, traits, size, indices = rank
+        return (-cost, -traits, -size, [-i for i in indices])
+
+    if instr is not None:
+        instr.add_space(space(n, initial_depth, max(initial_depth, min_size), max_size))
+
+    def region_cost_bound(start_idx, min_slots, slots):
+        # lower bound on the cost of taking at least min_slots more units that hold the region contributions
+        # still missing (LP relaxation), or None when the region goal is unreachable
+        active = 0
+        needs = []
+        for region, need_total in region_needs.items():
+            need = need_total - counts.get(region, 0)
+            if need <= 0:
+                active += 1
+            elif need <= slots and region_suffix[region][start_idx] >= need:
+                needs.append(need)
+        missing = min_regions - active
+        if missing <= 0:
+            return cheapest_after[start_idx][min_slots]
+        if len(needs) < missing:
+            return None
+        demand = sum(sorted(needs)[:missing])
+        if demand > slots * max_regions_per_unit:
+            return None
+        open_regions = np.array([counts.get(r, 0) < region_needs[r] for r in regions])
+        gains = unit_region_matrix[start_idx:, open_regions].sum(axis=1)
+        if gains.sum() < demand:
+            return None
+        return lagrangian_cost_bound(unit_costs[start_idx:], gains, min_slots, demand)
+
+    def backtrack(start_idx, depth, top_size):
+        # one slot left: its children are single boards, cheaper to evaluate than to look up
+        if depth >= top_size - 1:
+            expand(start_idx, depth, top_size)
+            return
+        key = (start_idx, depth, top_size, tuple(min(counts.get(t, 0), th) for t, th in signature_thresholds))
+        bound = cache.get(key)
+        if bound is not None and state['cost'] + bound > worst_cost():
+            if instr is not None:
+                instr.prune('transposition', depth, space(n - start_idx, depth, max(depth, min_size), top_size))
+            return
+        found_before = state['found']
+        expand(start_idx, depth, top_size)
+        if state['found'] == found_before:
+            # nothing below beat the k-th best board, so every board below costs at least its cost
+            cache.put(key, max(bound or 0, worst_cost() - state['cost']))
+
+    def expand(start_idx, depth, top_size):
+        if instr is not None:
+            instr.node(depth)
+        if depth >= min_size:
+            if instr is not None:
+                instr.leaf()
+            activated = _activated(calc, counts)
+            if (len(activated) >= min_traits and calc.count_activated_target_regions(activated) >= min_regions
+                    and state['cost'] <= max_cost):
+                combo = _combo(calc, team, counts, state['cost'])
+                rank = board_rank(combo, position)
+                if len(best) < k:
+                    heapq.heappush(best, (negated(rank), combo))
+                    state['found'] += 1
+                    if instr is not None:
+                        instr.result()
+                elif rank < board_rank(best[0][1], position):
+                    heapq.heapreplace(best, (negated(rank), combo))
+                    state['found'] += 1
+                    if instr is not None:
+                        instr.result()
+        if depth >= top_size:
+            return
+        remaining = n - start_idx
+        first_size = max(depth + 1, min_size)
+        if remaining < first_size - depth:
+            if instr is not None:
+                instr.prune('slot_bound', depth)
+            return
+        # the cheapest completion has to reach the k-th best board; close the sizes that cannot
+        limit = worst_cost()
+        open_size = min(top_size, depth + len(cheapest_after[start_idx]) - 1)
+        while open_size >= first_size and state['cost'] + cheapest_after[start_idx][open_size - depth] > limit:
+            open_size -= 1
+        if open_size < first_size:
+            if instr is not None:
+                instr.prune('cost_bound', depth, space(remaining, depth, first_size, top_size))
+            return
+        if instr is not None:
+            instr.advance(space(remaining, depth, open_size + 1, top_size))
+        region_bound = region_cost_bound(start_idx, first_size - depth, open_size - depth)
+        if region_bound is None or state['cost'] + region_bound > limit:
+            if instr is not None:
+                instr.prune('region_bound', depth, space(remaining, depth, first_size, open_size))
+            return
+        traits_bound = calc.region_upper_bound(counts, start_idx, open_size - depth, trait_suffix, max_traits_per_unit)
+        if traits_bound < min_traits:
+            if instr is not None:
+                instr.prune('trait_bound', depth, space(remaining, depth, first_size, open_size))
+            return
+        if len(best) >= k:
+            # a board costing exactly the k-th best one only wins with more traits, or as many on a smaller
+            # team; a team of the same size found later in the DFS comes later in the exhaustive order
+            cost_bound = state['cost'] + ceil(region_bound - 1e-9)
+            worst = best[0][1]
+            if cost_bound == limit and (traits_bound < worst['trait_count'] or
+                                        (traits_bound == worst['trait_count'] and first_size >= len(worst['units']) + ghosts)):
+                if instr is not None:
+                    instr.prune('cost_bound', depth, space(remaining, depth, first_size, open_size))
+                return
+
+        for i in range(start_idx, n):
+            u = pool[i]
+            if state['cost'] + costs[i] > worst_cost():
+                # candidates are cheapest first, so every later sibling is over the bound as well
+                if instr is not None:
+                    instr.prune('cost_bound', depth + 1, space(n - i, depth, first_size, open_size))
+                break
+            team.append(u)
+            state['cost'] += costs[i]
+            for t in calc.unit_traits.get(u, []):
+                counts[t] = counts.get(t, 0) + 1
+            backtrack(i + 1, depth + 1, open_size)
+            for t in calc.unit_traits.get(u, []):
+                counts[t] -= 1
+                if counts[t] == 0:
+                    del counts[t]
+            state['cost'] -= costs[i]
+            team.pop()
+
+    backtrack(0, initial_depth, max_size)
+    return [combo for _rank, combo in sorted(best, key=lambda entry: board_rank(entry[1], position))]
+
+def _cpsat_model(calc, min_size, max_size, chosen, pool, unit_cost, max_cost, min_regions, min_traits):
+    """CP-SAT model of a board: unit choice, trait counts and first-threshold activation"""
+    model = cp_model.CpModel()
+    x = {u: model.NewBoolVar(u) for u in chosen + pool}
+    for unit in chosen:
+        model.Add(x[unit] == 1)
+    model.Add(sum(x.values()) >= min_size)
+    model.Add(sum(x.values()) <= max_size)
+    cost = sum(unit_cost[u] * x[u] for u in x)
+    model.Add(cost <= max_cost)
+    active = {}
+    for trait, thresholds in calc.trait_thresholds.items():
+        holders = [x[u] for u in calc.trait_units.get(trait, []) if u in x]
+        if len(holders) < thresholds[0]:
+            continue
+        active[trait] = model.NewBoolVar(f"active {trait}")
+        model.Add(sum(holders) >= thresholds[0]).OnlyEnforceIf(active[trait])
+        model.Add(sum(holders) <= thresholds[0] - 1).OnlyEnforceIf(active[trait].Not())
+    model.Add(sum(active[r] for r in calc.target_regions if r in active) >= min_regions)
+    trait_count = sum(active.values())
+    model.Add(trait_count >= min_traits)
+    # lexicographic (cost, -trait count) as a single integer key
+    scale = len(calc.trait_thresholds) + 1
+    key = cost * scale + (scale - 1) - trait_count
+    return model, x, key
+
+class _BoardCollector(cp_model.CpSolverSolutionCallback if cp_model is not None else object):
+    def __init__(self, x):
+        super().__init__()
+        self.x = x
+        self.teams = []
+
+    def on_solution_callback(self):
+        self.teams.append([u for u, var in self.x.items() if self.Value(var)])
+
+def cpsat_best_boards(calc, min_size, max_size, candidates, max_cost, required_units=None, min_regions=4, min_traits=0,
+                      k=1, instr=None):
+    """The k best boards from OR-Tools CP-SAT, ranked like `bnb_best_boards`.
+
+    Boards are found level by level of the (cost, -trait count) key: the
+    solver minimises the key above the previous level, then every board of
+    that key is enumerated and ordered by `board_rank`, so ties come out
+    in the same order as from the branch and bound.
+    """
+    if cp_model is None:
+        raise ImportError("The 'cpsat' backend needs OR-Tools (pip install ortools)")
+    chosen, pool, unit_cost = _setup(calc, candidates, required_units)
+    position = {u: i for i, u in enumerate(chosen + pool)}
+    min_traits = max(1, min_traits)
+    ghosts = (len(required_units) if required_units else 0) - len(chosen)
+    min_size, max_size = min_size - ghosts, max_size - ghosts
+    boards = []
+    floor = None
+    while len(boards) < k:
+        model, x, key = _cpsat_model(calc, min_size, max_size, chosen, pool, unit_cost, max_cost, min_regions, min_traits)
+        if floor is not None:
+            model.Add(key >= floor)
+        model.Minimize(key)
+        solver = cp_model.CpSolver()
+        solver.parameters.max_time_in_seconds = CPSAT_TIME_LIMIT
+        status = solver.Solve(model)
+        if status != cp_model.OPTIMAL:
+            if status == cp_model.FEASIBLE:
+                raise TimeoutError(f"CP-SAT did not prove an optimum within {CPSAT_TIME_LIMIT}s")
+            break
+        level = int(round(solver.ObjectiveValue()))
+        if instr is not None:
+            instr.nodes += int(solver.NumBranches())
+
+        # every board of this level; ties are ordered like the exhaustive search
+        model, x, key = _cpsat_model(calc, min_size, max_size, chosen, pool, unit_cost, max_cost, min_regions, min_traits)
+        model.Add(key == level)
+        solver = cp_model.CpSolver()
+        solver.parameters.enumerate_all_solutions = True
+        solver.parameters.max_time_in_seconds = CPSAT_TIME_LIMIT
+        collector = _BoardCollector(x)
+        solver.Solve(model, collector)
+        level_boards = []
+        for team in collector.teams:
+            units = sorted(team, key=position.get)
+            counts = {}
+            for unit in units:
+                for t in calc.unit_traits.get(unit, []):
+                    counts[t] = counts.get(t, 0) + 1
+            level_boards.append(_combo(calc, units, counts, sum(unit_cost[u] for u in units)))
+        level_boards.sort(key=lambda combo: board_rank(combo, position))
+        boards.extend(level_boards)
+        if instr is not None:
+            instr.leaves += len(level_boards)
+            instr.results += len(level_boards)
+        floor = level + 1
+    return boards[:k]
+
+def best_boards(calc, min_size, max_size, candidates, max_cost, required_units=None, min_regions=4, min_traits=0, k=1,
+                backend='auto', instr=None):
+    """The k best boards (cheapest, then most active traits) with the selected backend"""
+    if backend not in SOLVER_BACKENDS:
+        raise ValueError(f"Unknown solver backend '{backend}', expected one of {SOLVER_BACKENDS}")
+    if backend == 'cpsat' or (backend == 'auto' and cp_model is not None):
+        return cpsat_best_boards(calc, min_size, max_size, candidates, max_cost, required_units, min_regions, min_traits, k, instr)
+    return bnb_best_boards(calc, min_size, max_size, candidates, max_cost, required_units, min_regions, min_traits, k, instr)
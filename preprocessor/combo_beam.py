@@ -0,0 +1,222 @@
+import bisect
+import math
+import random
+import time
+
+from preprocessor.board_solver import _combo, _setup, board_rank
+
+# Seconds an approximate search may run
+BEAM_TIME_LIMIT = 3.0
+# Partial teams kept per beam level
+BEAM_WIDTH = 64
+# Share of the time budget the beam may use before local search takes over
+BEAM_SHARE = 0.5
+# Annealing moves without a new best state before restarting from the best one
+RESTART_MOVES = 2000
+# Score added per unit still missing to reach the region goal, about the price of a cheap unit so that
+# local search can cross invalid teams
+REGION_PENALTY = 2.0
+
+def anytime_search(pool_size, min_slots, max_slots, evaluate, score, k=1, seeds=(), time_limit=BEAM_TIME_LIMIT,
+                   beam_width=BEAM_WIDTH, rng_seed=None, instr=None):
+    """Approximate search for the k best teams within a time budget.
+
+    Teams are sorted tuples of pool indices with min_slots to max_slots
+    members. `evaluate(team)` ranks a valid team (lower is better) or
+    returns None; `score(team)` guides the search on any team, valid or
+    not, and should roughly agree with the rank on valid ones.
+
+    A beam search first grows teams one unit at a time, keeping the
+    `beam_width` best scored teams per size, with the prefixes of every
+    seed team added to their level. Its best teams are then improved by
+    local search over swap, add and drop moves: steepest descent to a
+    local optimum, then simulated annealing, restarting with a descent
+    when it stalls, until the budget runs out.
+    Returns the best (rank, team) pairs found, best first.
+    """
+    deadline = time.perf_counter() + time_limit
+    rng = random.Random(rng_seed)
+    best = []
+    seen = set()
+    cache = {}
+
+    def visit(team):
+        # cached score of a team, recording it among the best when valid
+        value = cache.get(team)
+        if value is not None:
+            return value
+        if instr is not None:
+            instr.nodes += 1
+        value = score(team)
+        cache[team] = value
+        if min_slots <= len(team) <= max_slots:
+            rank = evaluate(team)
+            if rank is not None and team not in seen and (len(best) < k or rank < best[-1][0]):
+                bisect.insort(best, (rank, team))
+                seen.add(team)
+                if len(best) > k:
+                    seen.discard(best.pop()[1])
+        return value
+
+    def neighbours(team):
+        members = set(team)
+        outside = [i for i in range(pool_size) if i not in members]
+        if len(team) < max_slots:
+            yield from (tuple(sorted(team + (i,))) for i in outside)
+        if len(team) > max(min_slots, 1):
+            yield from (team[:j] + team[j + 1:] for j in range(len(team)))
+        for j in range(len(team)):
+            rest = team[:j] + team[j + 1:]
+            yield from (tuple(sorted(rest + (i,))) for i in outside)
+
+    def descend(team):
+        # steepest descent over every move, to a local optimum or the deadline
+        value = visit(team)
+        while time.perf_counter() < deadline:
+            step = min(neighbours(team), key=visit, default=None)
+            if step is None or visit(step) >= value:
+                break
+            team, value = step, visit(step)
+        return team, value
+
+    # beam search, level by level
+    seed_teams = [tuple(sorted(team)) for team in seeds if team]
+    level = {(): visit(())}
+    best_per_size = {0: ()}
+    beam_deadline = time.perf_counter() + time_limit * BEAM_SHARE
+    for size in range(1, max_slots + 1):
+        expanded = {}
+        for team in level:
+            members = set(team)
+            for i in range(pool_size):
+                if i not in members:
+                    child = tuple(sorted(team + (i,)))
+                    if child not in expanded:
+                        expanded[child] = visit(child)
+            if time.perf_counter() > beam_deadline:
+                break
+        for team in seed_teams:
+            prefix = tuple(sorted(team[:size]))
+            if len(prefix) == size:
+                expanded[prefix] = visit(prefix)
+        if not expanded:
+            break
+        level = dict(sorted(expanded.items(), key=lambda item: item[1])[:beam_width])
+        best_per_size[size] = next(iter(level))
+        if time.perf_counter() > beam_deadline:
+            break
+
+    # simulated annealing from the best teams of each size
+    starts = [team for size, team in best_per_size.items() if min_slots <= size <= max_slots]
+    starts += [team for team in seed_teams if min_slots <= len(team) <= max_slots]
+    starts += [team for _rank, team in best]
+    if not starts:
+        return best
+    scale = max(1.0, abs(max(cache.values()) - min(cache.values())) / 10) if cache else 1.0
+    current, current_score = min((descend(team) for team in starts), key=lambda item: item[1])
+    best_state, best_score = current, current_score
+    since_best = 0
+    started = time.perf_counter()
+    while True:
+        now = time.perf_counter()
+        if now >= deadline:
+            break
+        temperature = scale * max(1e-3, 1 - (now - started) / max(1e-9, deadline - started))
+        for _ in range(100):
+            members = list(current)
+            move = rng.random()
+            if move < 0.2 and len(members) < max_slots:
+                outside = [i for i in range(pool_size) if i not in current]
+                if not outside:
+                    continue
+                members.append(rng.choice(outside))
+            elif move < 0.4 and len(members) > max(min_slots, 1):
+                members.pop(rng.randrange(len(members)))
+            elif members and len(members) < pool_size:
+                members[rng.randrange(len(members))] = rng.choice([i for i in range(pool_size) if i not in current])
+            else:
+                continue
+            candidate = tuple(sorted(members))
+            candidate_score = visit(candidate)
+            delta = candidate_score - current_score
+            if delta <= 0 or rng.random() < math.exp(-delta / temperature):
+                current, current_score = candidate, candidate_score
+                if current_score < best_score:
+                    best_state, best_score = current, current_score
+                    since_best = 0
+            since_best += 1
+            if since_best >= RESTART_MOVES:
+                current, current_score = descend(current)
+                if current_score < best_score:
+                    best_state, best_score = current, current_score
+                elif rng.random() < 0.5:
+                    current, current_score = best_state, best_score
+                since_best = 0
+    return best
+
+def beam_best_boards(calc, min_size, max_size, candidates, max_cost, required_units=None, min_regions=4, min_traits=0,
+                     k=1, seeds=(), time_limit=BEAM_TIME_LIMIT, rng_seed=None, instr=None):
+    """Approximate k best boards (cheapest, then most active traits) found within time_limit seconds.
+
+    Teams are scored by their cost plus REGION_PENALTY per unit still
+    missing to activate min_regions regions (and per trait short of
+    min_traits) and by how far they exceed max_cost. `seeds` are teams of
+    candidate names to start from. Returns the boards in the order of
+    `board_rank`, like find_best_combos, but they are not guaranteed to be
+    the best ones.
+    """
+    chosen, pool, unit_cost = _setup(calc, candidates, required_units)
+    initial_depth = len(required_units) if required_units else 0
+    min_slots = max(0, min_size - initial_depth)
+    max_slots = max_size - initial_depth
+    if max_slots < min_slots:
+        return []
+    position = {u: i for i, u in enumerate(chosen + pool)}
+    index = {u: i for i, u in enumerate(pool)}
+    min_traits = max(1, min_traits)
+    base_cost = sum(unit_cost[u] for u in chosen)
+    base_counts = {}
+    for unit in chosen:
+        for t in calc.unit_traits.get(unit, []):
+            base_counts[t] = base_counts.get(t, 0) + 1
+    regions = [r for r in calc.target_regions if r in calc.trait_thresholds]
+    first_thresholds = {t: thresholds[0] for t, thresholds in calc.trait_thresholds.items()}
+    pool_traits = [[t for t in calc.unit_traits.get(u, []) if t in first_thresholds] for u in pool]
+    pool_costs = [unit_cost[u] for u in pool]
+
+    def state(team):
+        counts = dict(base_counts)
+        for i in team:
+            for t in pool_traits[i]:
+                counts[t] = counts.get(t, 0) + 1
+        return counts, base_cost + sum(pool_costs[i] for i in team)
+
+    def score(team):
+        counts, cost = state(team)
+        region_needs = sorted(max(0, first_thresholds[r] - counts.get(r, 0)) for r in regions)
+        missing_units = sum(region_needs[:max(0, min_regions)])
+        traits = sum(1 for t, threshold in first_thresholds.items() if counts.get(t, 0) >= threshold)
+        penalty = missing_units + max(0, min_traits - traits) + max(0, cost - max_cost)
+        return cost + REGION_PENALTY * penalty - traits / (len(first_thresholds) + 1)
+
+    def evaluate(team):
+        counts, cost = state(team)
+        if cost > max_cost:
+            return None
+        active_regions = sum(1 for r in regions if counts.get(r, 0) >= first_thresholds[r])
+        traits = sum(1 for t, threshold in first_thresholds.items() if counts.get(t, 0) >= threshold)
+        if active_regions < min_regions or traits < min_traits:
+            return None
+        units = chosen + [pool[i] for i in team]
+        return (cost, -traits, initial_depth + len(team), [position[u] for u in units])
+
+    seed_teams = [[index[u] for u in team if u in index] for team in seeds]
+    found = anytime_search(len(pool), min_slots, max_slots, evaluate, score, k, seed_teams, time_limit,
+                           rng_seed=rng_seed, instr=instr)
+    boards = []
+    for _rank, team in found:
+        counts, cost = state(team)
+        boards.append(_combo(calc, chosen + [pool[i] for i in team], counts, cost))
+    if instr is not None:
+        instr.results += len(boards)
+    return sorted(boards, key=lambda combo: board_rank(combo, position))
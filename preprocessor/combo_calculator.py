@@ -1,26 +1,57 @@
 #!/usr/bin/env python3
+import argparse
+import hashlib
 import json
 import itertools
+import os
+import numpy as np
 from collections import defaultdict, Counter
 from pathlib import Path
 from utils import file_processor
+from utils.combo_index import read_combo_header, write_combo_index
+from utils.combo_stream import ComboFileReader, write_combo_json, write_combo_jsonl
+from preprocessor.board_solver import SOLVER_BACKENDS, best_boards, root_cost_bound
+from preprocessor.combo_beam import BEAM_TIME_LIMIT, beam_best_boards
+from preprocessor.combo_kernel import kernel_search_all_sizes
+from preprocessor.combo_mitm import mitm_search_for_size
+from preprocessor.combo_patch import patch_search
+from preprocessor.combo_pareto import ParetoSkyline
+from preprocessor.combo_score import BoardScore, scored_best_boards
+from preprocessor.combo_symmetry import symmetry_search_all_sizes
+from preprocessor.combo_vector import vector_search_for_size
+from preprocessor.result_cache import RESULT_CACHE_DIR, ResultCache, search_params
+from preprocessor.search_cache import CACHE_MB, SubproblemCache
+from preprocessor.search_constraints import SearchConstraints
+from preprocessor.search_checkpoint import CHECKPOINT_INTERVAL, FRONTIER_DEPTH, SearchCheckpoint
+from preprocessor.search_stats import SearchInstrumentation, progress_bar, progress_log
+from preprocessor.traits_processor import greedy_start
 
 DATA_TRAITS = Path('var/traits_units_activations.json')
 DATA_COSTS = Path('var/units_cost.json')
 
+# the 13 origin regions to consider by default
+TARGET_REGIONS = [
+    'Bilgewater', 'Demacia', 'Freljord', 'Ionia', 'Ixtal', 
+    'Noxus', 'Piltover', 'Shadow Isles', 'Shurima', 'Targon', 
+    'Void', 'Yordle', 'Zaun'
+]
+
+# search engines selectable through the `strategy` argument
+STRATEGIES = ['dfs', 'mitm', 'symmetry', 'vector', 'kernel']
+# handling of dominated candidate units: keep them, prune them when provably empty, or drop them
+DOMINANCE_MODES = ['off', 'prune', 'drop']
+
 class TraitComboCalculatorOptimized:
-    def __init__(self):
-        with DATA_TRAITS.open('r', encoding='utf-8') as f:
+    def __init__(self, traits_path=DATA_TRAITS, costs_path=DATA_COSTS, target_regions=None):
+        with Path(traits_path).open('r', encoding='utf-8') as f:
             self.traits_data = json.load(f)
-        with DATA_COSTS.open('r', encoding='utf-8') as f:
+        with Path(costs_path).open('r', encoding='utf-8') as f:
             self.units_costs = json.load(f)
         
-        # the 13 origin regions to consider
-        self.target_regions = [
-            'Bilgewater', 'Demacia', 'Freljord', 'Ionia', 'Ixtal', 
-            'Noxus', 'Piltover', 'Shadow Isles', 'Shurima', 'Targon', 
-            'Void', 'Yordle', 'Zaun'
-        ]
+        self.target_regions = list(target_regions) if target_regions is not None else list(TARGET_REGIONS)
+        
+        # counters and progress of the last search
+        self.instrumentation = SearchInstrumentation()
         
         # build mappings: unit -> traits, trait -> units
         self.unit_traits = defaultdict(list)
@@ -67,6 +98,12 @@ class TraitComboCalculatorOptimized:
         print(f"Loaded {len(self.traits_data)} traits and {len(self.units_costs)} unit costs")
         print(f"Candidate units after filtering: {len(self.candidates)}")
     
+    def dataset_hash(self):
+        # fingerprint of everything the search depends on besides its parameters
+        payload = json.dumps([self.traits_data, self.units_costs, self.target_regions, self.candidates],
+                             sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
     def calculate_total_cost(self, units):
         total_cost = 0
         for u in units:
@@ -91,47 +128,348 @@ class TraitComboCalculatorOptimized:
         # number of target regions that are in activated_dict
         return sum(1 for r in self.target_regions if r in activated_dict)
     
-    def can_reach_more_regions(self, current_counts, start_idx, remaining_slots, candidates):
-        # optimistic bound for how many distinct regions could be activated
-        possible_regions = set()
-        # include already possibly satisfied regions if current_counts meets smallest threshold
-        for trait in self.target_regions:
-            if trait in self.trait_thresholds:
-                thresholds = self.trait_thresholds[trait]
-                if current_counts.get(trait,0) >= thresholds[0]:
-                    possible_regions.add(trait)
-        idx = start_idx
-        slots = remaining_slots
-        while idx < len(candidates) and slots > 0:
-            u = candidates[idx]
-            for t in self.unit_traits.get(u, []):
-                if t in self.target_regions:
-                    possible_regions.add(t)
-            idx += 1
-            slots -= 1
-        return len(possible_regions)
+    def region_upper_bound(self, current_counts, start_idx, remaining_slots, region_suffix, max_regions_per_unit,
+                           emblems=0):
+        # sound bound on the number of target regions activatable by adding at most remaining_slots
+        # candidates from start_idx onwards; region_suffix[region][i] counts candidates at index >= i
+        # holding the region, and no unit adds to more than max_regions_per_unit regions. Each of the
+        # `emblems` adds one more to any region, so only regions within that many of their threshold gain
+        activated = 0
+        needs = []
+        for region, suffix in region_suffix.items():
+            need = self.trait_thresholds[region][0] - current_counts.get(region, 0)
+            if need <= 0:
+                activated += 1
+            elif need <= remaining_slots + emblems and suffix[start_idx] + emblems >= need:
+                needs.append(need)
+        budget = remaining_slots * max_regions_per_unit + emblems
+        for need in sorted(needs):
+            if need > budget:
+                break
+            budget -= need
+            activated += 1
+        return activated
+    
+    def allocate_emblems(self, counts, team_size, emblems, min_regions=4):
+        # trait -> emblems for a team of team_size units with these trait counts: the fewest that activate
+        # min_regions target regions (closest to their threshold first), then the rest on the inactive traits
+        # closest to theirs; None when the regions cannot be reached. An emblem goes to a unit without the
+        # trait, so a threshold above the team size stays out of reach
+        allocation = {}
+        active = 0
+        deficits = []
+        for region in self.target_regions:
+            if region not in self.trait_thresholds:
+                continue
+            deficit = self.trait_thresholds[region][0] - counts.get(region, 0)
+            if deficit <= 0:
+                active += 1
+            elif deficit <= emblems and self.trait_thresholds[region][0] <= team_size:
+                deficits.append((deficit, region))
+        deficits.sort(key=lambda item: item[0])
+        for deficit, region in deficits:
+            if active >= min_regions or deficit > emblems:
+                break
+            allocation[region] = deficit
+            emblems -= deficit
+            active += 1
+        if active < min_regions:
+            return None
+        rest = []
+        for trait, thresholds in self.trait_thresholds.items():
+            deficit = thresholds[0] - counts.get(trait, 0)
+            if deficit > 0 and trait not in allocation and deficit <= emblems and thresholds[0] <= team_size:
+                rest.append((deficit, trait))
+        rest.sort(key=lambda item: item[0])
+        for deficit, trait in rest:
+            if deficit > emblems:
+                break
+            allocation[trait] = deficit
+            emblems -= deficit
+        return allocation
     
-    def find_all_valid_combos(self, max_units=8, max_cost=50, start_units=7, required_units=None):
+    def find_dominated_units(self, candidates, min_regions=4):
+        # unit -> set of earlier candidates dominating it for the search goal: they have every goal trait
+        # of the unit (target regions, or any activatable trait when no region is required) and cost no
+        # more, so swapping one in for the unit keeps a valid team valid
+        if min_regions >= 1:
+            goal_traits = {r for r in self.target_regions if r in self.trait_thresholds}
+        else:
+            goal_traits = set(self.trait_thresholds)
+        traits = [frozenset(t for t in self.unit_traits.get(u, []) if t in goal_traits) for u in candidates]
+        costs = [int(self.units_costs.get(u, 999)) for u in candidates]
+        dominators = {}
+        for i, unit in enumerate(candidates):
+            found = {candidates[j] for j in range(i) if traits[i] <= traits[j] and costs[j] <= costs[i]}
+            if found:
+                dominators[unit] = found
+        return dominators
+    
+    @staticmethod
+    def _effective_dominance(dominance, pareto=False, constraints=None):
+        # dominance mode the search actually uses: swapping in a dominating unit could leave the Pareto
+        # frontier or break a constraint checked per node, so dominance is off for those searches
+        return 'off' if pareto or (constraints and constraints.node_checks) else dominance
+    
+    def _search_candidates(self, max_units, max_cost, required_units=None, min_regions=4, dominance='prune', constraints=None):
+        # candidates within the cost cap and allowed by the constraints, and their dominators for the given dominance mode
+        viable_candidates = [u for u in self.candidates if int(self.units_costs.get(u, 999)) <= max_cost]
+        if constraints:
+            viable_candidates = constraints.filter_candidates(viable_candidates, self.units_costs)
+        dominators = self.find_dominated_units(viable_candidates, min_regions) if dominance != 'off' else {}
+        if dominance == 'drop':
+            # besides the unit, a team holds the required units and at most max_units - 1 - len(required_units)
+            # others, so a unit with max_units - len(required_units) kept dominators that are not required
+            # always has one outside the team to swap in: every team holding it maps to a valid team that is
+            # no more expensive
+            required = set(required_units or [])
+            free_slots = max_units - len(required_units or [])
+            kept = []
+            kept_set = set()
+            for u in viable_candidates:
+                if u in required or len(dominators.get(u, set()) & kept_set) < free_slots:
+                    kept.append(u)
+                    if u not in required:
+                        kept_set.add(u)
+            print(f"Dropped {len(viable_candidates) - len(kept)} dominated candidate units")
+            viable_candidates = kept
+            # the kept units still dominate each other, so the search prunes as well
+            dominators = self.find_dominated_units(viable_candidates, min_regions)
+        return viable_candidates, dominators
+    
+    def find_all_valid_combos(self, max_units=8, max_cost=50, start_units=7, required_units=None, min_regions=4, progress=None, checkpoint=None,
+                              strategy='dfs', dominance='prune', cache=None, pareto=False, jit=True, emblems=0, constraints=None):
+        # progress: optional callback receiving the SearchInstrumentation periodically
+        # checkpoint: optional SearchCheckpoint; the search resumes from it when it holds a snapshot
+        # strategy: 'dfs' (one traversal over every size), 'mitm' (meet-in-the-middle per size) or
+        # 'symmetry' (traversal over classes of units with identical traits), 'vector' (chunked NumPy
+        # enumeration per size, without pruning) or 'kernel' (the dfs traversal over flat arrays, compiled
+        # with Numba when installed); all return the same results
+        # dominance: 'prune' skips a dominated unit where a dominating sibling's subtree held no valid team
+        #            (dfs only, results unchanged), 'drop' removes units with enough dominators that the
+        #            cheapest team of each size survives, then prunes (fewer results, for best-only queries),
+        #            'off' does neither
+        # cache: optional SubproblemCache (dfs only) skipping subproblems already known to hold no valid team
+        # pareto: only return the (cost, trait count, region count) frontier, one team per frontier point
+        #         (dfs only); dominance and the cache assume every valid team is kept, so they are not used
+        # jit: compile the 'kernel' strategy with Numba when installed; False runs the same code under CPython
+        # emblems: emblems a team may carry on top of its units' traits (dfs only, not with pareto)
+        # constraints: optional SearchConstraints (dfs only); excluded units and the like leave the candidate
+        # list, the rest is checked on bitmasks as units are added. Swapping in a dominating unit may break
+        # a constraint, so dominance is off whenever they are checked per node
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown search strategy '{strategy}', expected one of {STRATEGIES}")
+        if dominance not in DOMINANCE_MODES:
+            raise ValueError(f"Unknown dominance mode '{dominance}', expected one of {DOMINANCE_MODES}")
+        if strategy != 'dfs' and checkpoint is not None:
+            raise ValueError("Checkpoints are only supported by the 'dfs' strategy")
+        if pareto and (strategy != 'dfs' or checkpoint is not None):
+            raise ValueError("The Pareto mode is only supported by the 'dfs' strategy, without checkpoints")
+        if emblems and (strategy != 'dfs' or pareto):
+            raise ValueError("Emblems are only supported by the 'dfs' strategy, without the Pareto mode")
+        if constraints and strategy != 'dfs':
+            raise ValueError("Constraints are only supported by the 'dfs' strategy")
+        if constraints:
+            constraints.check_required(required_units, self.units_costs)
         print(f"Optimized search: start {start_units}, max {max_units}, max_cost {max_cost}")
         if required_units:
             print(f"Required starting units: {required_units}")
         
-        viable_candidates = [u for u in self.candidates if int(self.units_costs.get(u, 999)) <= max_cost]
+        viable_candidates, dominators = self._search_candidates(max_units, max_cost, required_units, min_regions,
+                                                                self._effective_dominance(dominance, pareto, constraints),
+                                                                constraints)
         all_results = []
+        instr = self.instrumentation = SearchInstrumentation(progress)
         
+        if pareto:
+            print(f"Searching the Pareto frontier of team sizes {start_units}-{max_units} ...")
+            for team_size in range(start_units, max_units + 1):
+                instr.add_space(instr.subtree_size(len(viable_candidates), team_size - len(required_units or [])))
+            skyline = ParetoSkyline(len(self.trait_thresholds), len(self.target_regions))
+            self._dfs_search_all_sizes(start_units, max_units, viable_candidates, max_cost, required_units, min_regions,
+                                       skyline=skyline, constraints=constraints)
+            instr.finish()
+            return skyline.boards()
+        if strategy == 'mitm':
+            for team_size in range(start_units, max_units + 1):
+                print(f"Searching team size = {team_size} (meet in the middle) ...")
+                instr.set_phase(f"size {team_size}")
+                mitm_search_for_size(self, team_size, viable_candidates, max_cost, required_units, min_regions,
+                                     results=all_results, instr=instr)
+            instr.finish()
+            return all_results
+        if strategy == 'kernel':
+            print(f"Searching team sizes {start_units}-{max_units} (flat kernel) ...")
+            kernel_search_all_sizes(self, start_units, max_units, viable_candidates, max_cost, required_units, min_regions,
+                                    results=all_results, instr=instr, jit=jit)
+            instr.finish()
+            all_results.sort(key=lambda combo: len(combo['units']))
+            return all_results
+        if strategy == 'vector':
+            for team_size in range(start_units, max_units + 1):
+                print(f"Searching team size = {team_size} (vectorized) ...")
+                instr.set_phase(f"size {team_size}")
+                vector_search_for_size(self, team_size, viable_candidates, max_cost, required_units, min_regions,
+                                       results=all_results, instr=instr)
+            instr.finish()
+            return all_results
+        if strategy == 'symmetry':
+            print(f"Searching team sizes {start_units}-{max_units} over trait signature classes ...")
+            symmetry_search_all_sizes(self, start_units, max_units, viable_candidates, max_cost, required_units, min_regions,
+                                      results=all_results, instr=instr)
+            instr.finish()
+            return all_results
+        
+        initial_depth = len(required_units) if required_units else 0
         for team_size in range(start_units, max_units + 1):
-            print(f"Searching team size = {team_size} ...")
-            results = self._dfs_search_all_for_size(team_size, viable_candidates, max_cost, required_units)
-            all_results.extend(results)
-            
+            instr.add_space(instr.subtree_size(len(viable_candidates), team_size - initial_depth))
+        
+        resume_path = None
+        if checkpoint is not None:
+            restored = checkpoint.load(instr)
+            if restored is not None:
+                all_results = restored
+                resume_path = checkpoint.path
+                print(f"Resuming from checkpoint: branch {list(resume_path)}, {len(all_results)} results so far")
+        
+        on_branch = None
+        if checkpoint is not None:
+            def on_branch(path):
+                checkpoint.maybe_save(path, all_results, instr)
+        
+        print(f"Searching team sizes {start_units}-{max_units} ...")
+        self._dfs_search_all_sizes(start_units, max_units, viable_candidates, max_cost, required_units, min_regions,
+                                   results=all_results, resume_path=resume_path, on_branch=on_branch,
+                                   dominators=dominators, cache=cache, emblems=emblems, constraints=constraints)
+        instr.finish()
+        
+        # one traversal emits every size in DFS order; group them by team size (stable)
+        all_results.sort(key=lambda combo: len(combo['units']))
         return all_results
     
-    def _dfs_search_all_for_size(self, team_size, candidates, max_cost, required_units=None):
+    def find_best_combos(self, max_units=8, max_cost=50, start_units=7, required_units=None, min_regions=4, min_traits=0, k=1,
+                         backend='auto', progress=None):
+        # the k best valid teams (cheapest, then most active traits) with at least min_traits active traits,
+        # from an exact solver instead of the full enumeration; 'bnb' is a pure-Python branch and bound,
+        # 'cpsat' uses OR-Tools when installed and 'auto' picks it when available. The boards come in the
+        # order of run_and_save_all's output
+        viable_candidates = [u for u in self.candidates if int(self.units_costs.get(u, 999)) <= max_cost]
+        instr = self.instrumentation = SearchInstrumentation(progress)
+        boards = best_boards(self, start_units, max_units, viable_candidates, max_cost, required_units, min_regions,
+                             min_traits, k, backend, instr)
+        instr.finish()
+        return boards
+    
+    def find_approximate_combos(self, max_units=8, max_cost=50, start_units=7, required_units=None, min_regions=4, min_traits=0,
+                                k=1, time_limit=BEAM_TIME_LIMIT, progress=None):
+        # anytime counterpart of find_best_combos for boards too large to solve exactly: a beam search seeded
+        # with the greedy team covering the most target regions, then local search, for time_limit seconds.
+        # self.approximation holds the best cost found, a lower bound on the optimal cost and their gap
+        viable_candidates = [u for u in self.candidates if int(self.units_costs.get(u, 999)) <= max_cost]
+        instr = self.instrumentation = SearchInstrumentation(progress)
+        pool = [u for u in viable_candidates if u not in (required_units or [])]
+        region_traits = {u: {t for t in self.unit_traits.get(u, []) if t in self.target_regions} for u in pool}
+        initial_depth = len(required_units) if required_units else 0
+        seeds = []
+        for slots in range(max_units - initial_depth, max(start_units - initial_depth, 1) - 1, -1):
+            seed = greedy_start(pool, region_traits, slots)
+            if seed:
+                seeds.append(seed)
+                break
+        boards = beam_best_boards(self, start_units, max_units, viable_candidates, max_cost, required_units, min_regions,
+                                  min_traits, k, seeds, time_limit, instr=instr)
+        instr.finish()
+        bound = root_cost_bound(self, start_units, max_units, viable_candidates, required_units, min_regions)
+        best_cost = boards[0]['total_cost'] if boards else None
+        self.approximation = {
+            'best_cost': best_cost,
+            'cost_lower_bound': bound,
+            'gap': best_cost - bound if best_cost is not None and bound is not None else None,
+        }
+        return boards
+    
+    def find_top_scored_combos(self, max_units=8, max_cost=50, start_units=7, required_units=None, min_regions=4, k=1,
+                               scoring=None, progress=None):
+        # the k valid teams with the highest weighted score (a BoardScore, or a path to its YAML/JSON config;
+        # by default every active tier scores its tier number), from a branch and bound that cuts subtrees
+        # whose score upper bound cannot reach the k-th best. Each board carries its 'score', best first
+        if scoring is None or isinstance(scoring, (str, Path)):
+            scoring = (BoardScore(self.trait_thresholds, max_count=max_units) if scoring is None
+                       else BoardScore.from_config(self.trait_thresholds, scoring, max_count=max_units))
+        viable_candidates = [u for u in self.candidates if int(self.units_costs.get(u, 999)) <= max_cost]
+        instr = self.instrumentation = SearchInstrumentation(progress)
+        boards = scored_best_boards(self, start_units, max_units, viable_candidates, max_cost, scoring, required_units,
+                                    min_regions, k, instr)
+        instr.finish()
+        return boards
+    
+    def count_valid_combos(self, max_units=8, max_cost=50, start_units=7, required_units=None, min_regions=4, progress=None,
+                           dominance='prune', cache=None):
+        # number of valid teams per team size, without building them; subproblems reached again through
+        # another prefix reuse their counts from the cache (a new SubproblemCache by default)
+        tally = self._aggregate_valid_combos('size', max_units, max_cost, start_units, required_units, min_regions,
+                                             progress, dominance, cache)
+        return {team_size: tally.get((team_size,), 0) for team_size in range(start_units, max_units + 1)}
+    
+    def histogram_valid_combos(self, max_units=8, max_cost=50, start_units=7, required_units=None, min_regions=4, progress=None,
+                               dominance='prune', cache=None):
+        # number of valid teams as an int64 array indexed by [team size, total cost, trait count, region count],
+        # aggregated without building any combo; cached subproblems reuse their histograms
+        tally = self._aggregate_valid_combos('histogram', max_units, max_cost, start_units, required_units, min_regions,
+                                             progress, dominance, cache)
+        shape = (max_units + 1, max_cost + 1, len(self.trait_thresholds) + 1, len(self.target_regions) + 1)
+        histogram = np.zeros(shape, dtype=np.int64)
+        for bucket, count in tally.items():
+            histogram[bucket] = count
+        return histogram
+    
+    def _aggregate_valid_combos(self, aggregate, max_units, max_cost, start_units, required_units, min_regions, progress,
+                                dominance, cache):
+        if dominance not in DOMINANCE_MODES:
+            raise ValueError(f"Unknown dominance mode '{dominance}', expected one of {DOMINANCE_MODES}")
+        viable_candidates, dominators = self._search_candidates(max_units, max_cost, required_units, min_regions, dominance)
+        instr = self.instrumentation = SearchInstrumentation(progress)
+        initial_depth = len(required_units) if required_units else 0
+        for team_size in range(start_units, max_units + 1):
+            instr.add_space(instr.subtree_size(len(viable_candidates), team_size - initial_depth))
+        tally = Counter()
+        self._dfs_search_all_sizes(start_units, max_units, viable_candidates, max_cost, required_units, min_regions,
+                                   dominators=dominators, cache=cache if cache is not None else SubproblemCache(),
+                                   aggregate=aggregate, tally=tally)
+        instr.finish()
+        return tally
+    
+    def _dfs_search_all_sizes(self, min_size, max_size, candidates, max_cost, required_units=None, min_regions=4,
+                              results=None, resume_path=None, on_branch=None, dominators=None, cache=None,
+                              aggregate=None, tally=None, skyline=None, emblems=0, constraints=None):
+        # a single DFS emitting valid teams of every size in [min_size, max_size]; a node at a depth in
+        # that range is evaluated as a team and extended while a larger size is still open
+        # results: list the combos are appended to (a new one by default)
+        # resume_path: branch indices of the top DFS levels to continue from; earlier branches are skipped
+        # on_branch(path): called after each branch of the top FRONTIER_DEPTH levels with the path of the next one
+        # dominators: unit -> earlier units dominating it (see find_dominated_units). A valid team holding
+        # the unit maps to a valid team in the subtree of any earlier sibling dominating it, so the unit
+        # is skipped once such a sibling's subtree turned out empty
+        # cache: optional SubproblemCache; subtrees whose subproblem is known to hold no valid team are skipped
+        # aggregate: 'size' or 'histogram' to only count valid teams into the `tally` Counter, keyed by
+        # (team size,) or (team size, total cost, trait count, region count); no combos are built. Size
+        # counts only depend on the subproblem, so the cache reuses them; a histogram bucket also depends
+        # on every trait of the prefix, which hardly ever repeats, so there it only reuses empty outcomes
+        # skyline: optional ParetoSkyline; valid teams only enter it while on the (cost, traits, regions)
+        # frontier instead of the results, and subtrees whose best case the frontier covers are cut
+        # emblems: number of emblems the team may carry, each adding one to a trait of a unit without it;
+        # a team is valid when some allocation reaches the goal (see allocate_emblems), and the combo
+        # records it under 'emblems'. The region bound counts them as extra increments
+        # constraints: optional SearchConstraints, compiled into bitmasks over the candidates; a unit the
+        # team's mask does not allow is skipped with its subtree
         n = len(candidates)
         chosen = []
         chosen_set = set()
-        backtrack_state = {'cost': 0, 'counts': {}}
-        all_combos = []
+        # found: valid teams so far in every mode; tally: Counter the valid teams are counted into
+        backtrack_state = {'cost': 0, 'counts': {}, 'found': 0, 'tally': tally, 'mask': 0}
+        counting = aggregate is not None
+        reuse_counts = aggregate == 'size'
+        all_combos = results if results is not None else []
         
         # Initialize with required units if specified
         if required_units:
@@ -143,82 +481,278 @@ class TraitComboCalculatorOptimized:
                     for t in self.unit_traits.get(unit, []):
                         backtrack_state['counts'][t] = backtrack_state['counts'].get(t, 0) + 1
         
-        def get_activated_from_state():
+        compiled = constraints.compile(candidates, self.units_costs) if constraints else None
+        if compiled is not None:
+            backtrack_state['mask'] = compiled.team_mask(chosen, candidates)
+        
+        # per region: number of candidates at index >= i holding it
+        region_suffix = {}
+        for region in self.target_regions:
+            if region not in self.trait_thresholds:
+                continue
+            suffix = [0] * (n + 1)
+            for i in range(n - 1, -1, -1):
+                suffix[i] = suffix[i + 1] + (region in self.unit_traits.get(candidates[i], []))
+            region_suffix[region] = suffix
+        max_regions_per_unit = max((sum(1 for t in self.unit_traits.get(u, []) if t in region_suffix) for u in candidates), default=0)
+        region_min_thresholds = [(region, self.trait_thresholds[region][0]) for region in region_suffix]
+        # a team is valid once enough regions reach their first threshold (or, with no region required,
+        # once any trait does), so counts are capped there in the subproblem signature
+        trait_min_thresholds = [(trait, thresholds[0]) for trait, thresholds in self.trait_thresholds.items()]
+        signature_thresholds = region_min_thresholds if min_regions >= 1 else trait_min_thresholds
+        if cache is not None:
+            cache.bind((self.dataset_hash(), tuple(candidates), tuple(chosen), min_size, min_regions, reuse_counts, emblems,
+                        json.dumps(constraints.describe(), sort_keys=True) if constraints else None))
+        if skyline is not None:
+            # bound on the active traits of a subtree, like the region bound
+            trait_suffix = {}
+            for trait in self.trait_thresholds:
+                suffix = [0] * (n + 1)
+                for i in range(n - 1, -1, -1):
+                    suffix[i] = suffix[i + 1] + (trait in self.unit_traits.get(candidates[i], []))
+                trait_suffix[trait] = suffix
+            max_traits_per_unit = max((sum(1 for t in self.unit_traits.get(u, []) if t in trait_suffix) for u in candidates), default=0)
+            position = {u: i for i, u in enumerate(candidates)}
+            required_count = len(chosen)
+        
+        def get_activated_from_state(counts):
             activated_local = {}
             for trait, thresholds in self.trait_thresholds.items():
-                cnt = backtrack_state['counts'].get(trait, 0)
+                cnt = counts.get(trait, 0)
                 valids = [th for th in thresholds if th <= cnt]
                 if valids:
                     activated_local[trait] = max(valids)
             return activated_local
         
-        def backtrack(start_idx, depth):
-            if depth == team_size:
-                activated_local = get_activated_from_state()
-                if not activated_local:
-                    return
-                region_count = self.count_activated_target_regions(activated_local)
-                if region_count >= 4 and backtrack_state['cost'] <= max_cost:
-                    combo = {
-                        'units': chosen.copy(),
-                        'trait_count': len(activated_local),
-                        'activated_traits': sorted(list(activated_local.keys())),
-                        'total_cost': backtrack_state['cost'],
-                        'activated_details': activated_local
-                    }
-                    all_combos.append(combo)
+        instr = self.instrumentation
+        subtree_size = instr.subtree_size
+        initial_depth = len(required_units) if required_units else 0
+        frontier_end = initial_depth + FRONTIER_DEPTH
+        branch_path = [0] * FRONTIER_DEPTH
+        
+        def space(remaining, depth, first_size, last_size):
+            # leaves of team sizes first_size..last_size below a node at depth with `remaining` candidates left
+            return sum(subtree_size(remaining, size - depth) for size in range(first_size, last_size + 1))
+        
+        def backtrack(start_idx, depth, top_size, resume=None):
+            # top_size: largest team size still open in this subtree
+            # a resumed subtree only runs its remainder, so it neither reads nor records an outcome
+            if cache is None or resume or depth >= top_size:
+                expand(start_idx, depth, top_size, resume)
                 return
-            
-            if start_idx >= n:
+            counts = backtrack_state['counts']
+            key = (start_idx, depth, top_size, max_cost - backtrack_state['cost'],
+                   tuple(min(counts.get(trait, 0), threshold) for trait, threshold in signature_thresholds),
+                   compiled.signature(backtrack_state['mask']) if compiled is not None else None)
+            outcome = cache.get(key)
+            if outcome is not None and (reuse_counts or not outcome):
+                instr.prune('transposition', depth, space(n - start_idx, depth, max(depth, min_size), top_size))
+                if outcome:
+                    backtrack_state['tally'].update(outcome)
+                    backtrack_state['found'] += sum(outcome.values())
+                    instr.results += sum(outcome.values())
+                return
+            found_before = backtrack_state['found']
+            if not reuse_counts:
+                expand(start_idx, depth, top_size)
+                # only empty outcomes are reused here, so only those are worth the memory
+                if backtrack_state['found'] == found_before:
+                    cache.put(key, {})
+                return
+            # count the subtree into its own tally, then add that to the enclosing one
+            outer = backtrack_state['tally']
+            backtrack_state['tally'] = Counter()
+            expand(start_idx, depth, top_size)
+            outcome = backtrack_state['tally']
+            backtrack_state['tally'] = outer
+            outer.update(outcome)
+            cache.put(key, outcome)
+        
+        def expand(start_idx, depth, top_size, resume=None):
+            instr.node(depth)
+            # nodes on the resume path were evaluated before the checkpoint
+            if depth >= min_size and not resume:
+                instr.leaf()
+                # cheap region count first: most teams fail it, so skip building their activation details
+                counts = backtrack_state['counts']
+                reachable = sum(1 for region, threshold in region_min_thresholds if counts.get(region, 0) >= threshold)
+                if counting:
+                    # the region count is exactly the number of active target regions
+                    trait_count = sum(1 for trait, threshold in trait_min_thresholds if counts.get(trait, 0) >= threshold)
+                    if reachable >= min_regions and trait_count and backtrack_state['cost'] <= max_cost:
+                        instr.result()
+                        backtrack_state['found'] += 1
+                        bucket = (depth,) if aggregate == 'size' else (depth, backtrack_state['cost'], trait_count, reachable)
+                        backtrack_state['tally'][bucket] += 1
+                team_counts = counts
+                allocation = None
+                if emblems and not counting and backtrack_state['cost'] <= max_cost:
+                    allocation = self.allocate_emblems(counts, len(chosen), emblems, min_regions)
+                    if allocation is not None:
+                        reachable = min_regions
+                        team_counts = dict(counts)
+                        for trait, count in allocation.items():
+                            team_counts[trait] = team_counts.get(trait, 0) + count
+                activated_local = get_activated_from_state(team_counts) if not counting and reachable >= min_regions and backtrack_state['cost'] <= max_cost else None
+                if activated_local:
+                    region_count = self.count_activated_target_regions(activated_local)
+                    if region_count >= min_regions and backtrack_state['cost'] <= max_cost:
+                        # the key orders teams like the output: team size, then candidate index
+                        key = (depth, tuple(position[u] for u in chosen[required_count:])) if skyline is not None else None
+                        if skyline is None or not skyline.dominated(backtrack_state['cost'], len(activated_local), region_count, key):
+                            instr.result()
+                            backtrack_state['found'] += 1
+                            combo = {
+                                'units': chosen.copy(),
+                                'trait_count': len(activated_local),
+                                'activated_traits': sorted(list(activated_local.keys())),
+                                'total_cost': backtrack_state['cost'],
+                                'activated_details': activated_local
+                            }
+                            if emblems:
+                                combo['emblems'] = allocation
+                            if skyline is None:
+                                all_combos.append(combo)
+                            else:
+                                skyline.add(backtrack_state['cost'], len(activated_local), region_count, key, combo)
+            if depth >= top_size:
                 return
-            if (n - start_idx) < (team_size - depth):
+            
+            remaining = n - start_idx
+            first_size = max(depth + 1, min_size)
+            if remaining < first_size - depth:
+                instr.prune('slot_bound', depth)
                 return
-                
-            slots_needed = team_size - depth
-            # optimistic min cost using next 200 candidates
+            
+            # optimistic min cost using next 200 candidates; close the sizes that cannot fit the budget
             next_costs = []
             for j in range(start_idx, min(n, start_idx + 200)):
                 next_costs.append(int(self.units_costs.get(candidates[j], 999)))
             next_costs.sort()
-            if len(next_costs) < slots_needed:
+            if len(next_costs) < first_size - depth:
+                instr.prune('slot_bound', depth, space(remaining, depth, first_size, top_size))
                 return
-            optimistic_min_cost = sum(next_costs[:slots_needed])
-            if backtrack_state['cost'] + optimistic_min_cost > max_cost:
+            open_size = min(top_size, depth + len(next_costs))
+            while open_size >= first_size and backtrack_state['cost'] + sum(next_costs[:open_size - depth]) > max_cost:
+                open_size -= 1
+            if open_size < first_size:
+                instr.prune('cost_bound', depth, space(remaining, depth, first_size, top_size))
                 return
-                
-            possible_region_count = self.can_reach_more_regions(backtrack_state['counts'], start_idx, slots_needed, candidates)
-            already_activated_regions = sum(1 for r in self.target_regions if backtrack_state['counts'].get(r, 0) >= 1 and r in self.trait_thresholds and any(th <= backtrack_state['counts'].get(r,0) for th in self.trait_thresholds.get(r,[])))
-            if possible_region_count < 4 and already_activated_regions < 4:
+            instr.advance(space(remaining, depth, open_size + 1, top_size))
+            
+            # region bound against the largest size still open, which has the most slots
+            regions_bound = self.region_upper_bound(backtrack_state['counts'], start_idx, open_size - depth,
+                                                    region_suffix, max_regions_per_unit, emblems)
+            if regions_bound < min_regions:
+                instr.prune('region_bound', depth, space(remaining, depth, first_size, open_size))
                 return
-                
-            for i in range(start_idx, n):
+            if skyline is not None:
+                # best case of the subtree: the cheapest fill of the smallest open size, and every trait and
+                # region still reachable with the most slots
+                traits_bound = self.region_upper_bound(backtrack_state['counts'], start_idx, open_size - depth,
+                                                       trait_suffix, max_traits_per_unit)
+                if skyline.covers(backtrack_state['cost'] + sum(next_costs[:first_size - depth]), traits_bound,
+                                  regions_bound, first_size):
+                    instr.prune('pareto_bound', depth, space(remaining, depth, first_size, open_size))
+                    return
+            
+            first_idx = resume[0] if resume else start_idx
+            empty_siblings = set()
+            for i in range(first_idx, n):
                 u = candidates[i]
                 if u in chosen_set:
+                    instr.advance(space(n - i - 1, depth + 1, first_size, open_size))
+                    continue
+                if empty_siblings and dominators and not empty_siblings.isdisjoint(dominators.get(u, ())):
+                    instr.prune('dominance', depth + 1, space(n - i - 1, depth + 1, first_size, open_size))
+                    continue
+                if compiled is not None and not compiled.allows(backtrack_state['mask'], i):
+                    instr.prune('constraint', depth + 1, space(n - i - 1, depth + 1, first_size, open_size))
                     continue
+                found_before = backtrack_state['found']
                 chosen.append(u)
                 chosen_set.add(u)
+                prev_mask = backtrack_state['mask']
+                backtrack_state['mask'] = prev_mask | (1 << i)
                 prev_cost = backtrack_state['cost']
                 backtrack_state['cost'] = prev_cost + int(self.units_costs.get(u, 0))
                 for t in self.unit_traits.get(u, []):
                     backtrack_state['counts'][t] = backtrack_state['counts'].get(t, 0) + 1
                     
+                if depth < frontier_end:
+                    branch_path[depth - initial_depth] = i
+                resumed_child = bool(resume) and i == first_idx
                 if backtrack_state['cost'] <= max_cost:
-                    backtrack(i+1, depth+1)
+                    backtrack(i+1, depth+1, open_size, resume[1:] if resumed_child else None)
+                else:
+                    instr.prune('cost_bound', depth + 1, space(n - i - 1, depth + 1, first_size, open_size))
+                # a resumed child only ran its remainder, so it cannot prove its subtree empty
+                if backtrack_state['found'] == found_before and not resumed_child:
+                    empty_siblings.add(u)
                     
                 backtrack_state['cost'] = prev_cost
+                backtrack_state['mask'] = prev_mask
                 for t in self.unit_traits.get(u, []):
                     backtrack_state['counts'][t] -= 1
                     if backtrack_state['counts'][t] == 0:
                         del backtrack_state['counts'][t]
                 chosen.pop()
                 chosen_set.remove(u)
+                if on_branch is not None and depth < frontier_end:
+                    on_branch(tuple(branch_path[:depth - initial_depth]) + (i + 1,))
         
-        initial_depth = len(required_units) if required_units else 0
-        backtrack(0, initial_depth)
+        backtrack(0, initial_depth, max_size, tuple(resume_path) if resume_path else None)
         return all_combos
     
-    def run_and_save_all(self, start_units=7, max_units=8, max_cost=50, required_units=None, outpath='var/all_valid_combos_optimized.json'):
-        results = self.find_all_valid_combos(max_units=max_units, max_cost=max_cost, start_units=start_units, required_units=required_units)
+    def run_and_save_all(self, start_units=7, max_units=8, max_cost=50, required_units=None, outpath='var/all_valid_combos_optimized.json', min_regions=4, progress=None,
+                         checkpoint_interval=None, resume=False, strategy='dfs', dominance='prune', cache=None, pareto=False,
+                         jit=True, emblems=0, constraints=None, result_cache=None, patch_from=None):
+        # checkpoint_interval: seconds between checkpoints next to outpath (None disables checkpointing)
+        # resume: continue from the checkpoint of an interrupted run with the same parameters
+        # result_cache: optional ResultCache; the query is answered from a cached run covering it when there
+        # is one, otherwise the search runs and its results are cached
+        # patch_from: the calculator of the data before a balance patch, whose results of the same search are
+        # saved at outpath; they are patched up (see patch_valid_combos) instead of searching from scratch
+        # the output and the cache record the dominance mode the search uses, so a run whose constraints turn
+        # dropping off counts as exhaustive
+        dominance = self._effective_dominance(dominance, pareto, constraints)
+        params = search_params(start_units, max_units, max_cost, required_units, min_regions, dominance, pareto, emblems,
+                               constraints)
+        results = result_cache.answer(self, params) if result_cache is not None else None
+        if results is not None:
+            # nothing was searched, so the counters only hold the results
+            instr = self.instrumentation = SearchInstrumentation(progress)
+            instr.results = len(results)
+            instr.finish()
+        elif patch_from is not None:
+            results = self.patch_valid_combos(patch_from, outpath, params, constraints, progress)
+            if results is not None and result_cache is not None:
+                result_cache.store(self, params, results)
+        checkpoint = None
+        if results is None and (checkpoint_interval is not None or resume) and not pareto:
+            fingerprint = {
+                'dataset': self.dataset_hash(),
+                'start_units': start_units,
+                'max_units': max_units,
+                'max_cost': max_cost,
+                'required_units': required_units,
+                'min_regions': min_regions,
+                'dominance': dominance,
+            }
+            if emblems:
+                fingerprint['emblems'] = emblems
+            if constraints:
+                fingerprint['constraints'] = constraints.describe()
+            checkpoint = SearchCheckpoint(outpath, fingerprint, checkpoint_interval if checkpoint_interval is not None else CHECKPOINT_INTERVAL)
+            if not resume:
+                checkpoint.clear()
+            elif not checkpoint.exists():
+                print(f"No checkpoint found for {outpath}, starting a new search")
+        
+        if results is None:
+            results = self.find_all_valid_combos(max_units=max_units, max_cost=max_cost, start_units=start_units, required_units=required_units, min_regions=min_regions, progress=progress, checkpoint=checkpoint, strategy=strategy, dominance=dominance, cache=cache, pareto=pareto, jit=jit, emblems=emblems, constraints=constraints)
+            if result_cache is not None:
+                result_cache.store(self, params, results)
         if results:
             # Sort results by total cost, then by trait count
             results.sort(key=lambda x: (x['total_cost'], -x['trait_count']))
@@ -228,30 +762,211 @@ class TraitComboCalculatorOptimized:
                     'start_units': start_units,
                     'max_units': max_units,
                     'max_cost': max_cost,
-                    'required_units': required_units
+                    'required_units': required_units,
+                    'min_regions': min_regions,
+                    'target_regions': self.target_regions
                 },
                 'total_combinations_found': len(results),
                 'combinations': results
             }
+            if dominance == 'drop':
+                # dominated units were left out, so the combinations are not exhaustive
+                output_data['search_parameters']['dominance'] = dominance
+            if pareto:
+                # one team per point of the (cost, trait count, region count) frontier
+                output_data['search_parameters']['pareto'] = True
+            if emblems:
+                # teams may carry up to this many emblems, recorded per combo under 'emblems'
+                output_data['search_parameters']['emblems'] = emblems
+            if constraints:
+                # teams breaking the constraints were never built
+                output_data['search_parameters']['constraints'] = constraints.describe()
             
-            file_processor.write_json(outpath, output_data)
+            header = {k: v for k, v in output_data.items() if k != 'combinations'}
+            if outpath.endswith('.jsonl'):
+                # JSON Lines: header line, then one combination per line
+                offsets, lengths = write_combo_jsonl(outpath, header, results)
+            else:
+                offsets, lengths = write_combo_json(outpath, header, results)
+            # offset index sidecar so single combinations can be read without a full parse,
+            # from the offsets recorded while writing
+            write_combo_index(outpath, offsets, lengths)
             print(f"Found {len(results)} valid combinations and saved to {outpath}")
         else:
             print("No valid combos found with the optimized search within given limits.")
+        if checkpoint is not None:
+            checkpoint.clear()
         return results
 
+    def patch_valid_combos(self, old_calc, combos_path, params, constraints=None, progress=None):
+        # results of the search with these normalized parameters (see search_params) under the current data,
+        # from its results under the data of old_calc saved at combos_path: stored teams without a unit the
+        # patch touched are kept, the others are validated again, and only the subtrees of units that may
+        # now complete new teams are searched (see combo_patch.patch_search). None when the saved results
+        # are missing or come from another search, or when the patch cannot be applied incrementally
+        if not os.path.exists(combos_path):
+            print(f"No results at {combos_path} to patch, searching from scratch")
+            return None
+        stored = read_combo_header(combos_path).get('search_parameters', {})
+        stored_constraints = SearchConstraints.from_description(stored['constraints']) if stored.get('constraints') else None
+        stored_params = search_params(stored.get('start_units'), stored.get('max_units'), stored.get('max_cost'),
+                                      stored.get('required_units'), stored.get('min_regions'), stored.get('dominance', 'prune'),
+                                      stored.get('pareto', False), stored.get('emblems', 0), stored_constraints)
+        if stored_params != params or params['dominance'] or params['pareto'] or params['emblems']:
+            print(f"The results at {combos_path} come from other search parameters, searching from scratch")
+            return None
+        instr = self.instrumentation = SearchInstrumentation(progress)
+        results = patch_search(self, old_calc, list(ComboFileReader(combos_path)), params, constraints, instr)
+        instr.finish()
+        if results is None:
+            print("The patch changes the target regions or a required unit's candidacy, searching from scratch")
+        return results
+    
+    def run_and_save_histogram(self, start_units=7, max_units=8, max_cost=50, required_units=None, outpath='var/combo_histogram.json',
+                               min_regions=4, progress=None, dominance='prune', cache=None):
+        # histogram of the valid teams, saved as one entry per non-empty (team size, cost, trait count, region count) bucket
+        histogram = self.histogram_valid_combos(max_units=max_units, max_cost=max_cost, start_units=start_units,
+                                                required_units=required_units, min_regions=min_regions, progress=progress,
+                                                dominance=dominance, cache=cache)
+        buckets = [{'team_size': int(size), 'total_cost': int(cost), 'trait_count': int(traits), 'region_count': int(regions),
+                    'count': int(histogram[size, cost, traits, regions])}
+                   for size, cost, traits, regions in zip(*np.nonzero(histogram))]
+        output_data = {
+            'search_parameters': {
+                'start_units': start_units,
+                'max_units': max_units,
+                'max_cost': max_cost,
+                'required_units': required_units,
+                'min_regions': min_regions,
+                'target_regions': self.target_regions
+            },
+            'total_combinations_found': int(histogram.sum()),
+            'buckets': buckets
+        }
+        if dominance == 'drop':
+            output_data['search_parameters']['dominance'] = dominance
+        file_processor.write_json(outpath, output_data)
+        print(f"Counted {output_data['total_combinations_found']} valid combinations in {len(buckets)} buckets and saved to {outpath}")
+        return histogram
+
 def main():
+    parser = argparse.ArgumentParser(description='Exhaustive search of valid team combinations')
+    parser.add_argument('--progress-log', help='append progress lines to this file instead of drawing a progress bar')
+    parser.add_argument('--no-progress', action='store_true', help='disable progress reporting')
+    parser.add_argument('--checkpoint-interval', type=float, default=CHECKPOINT_INTERVAL,
+                        help='seconds between checkpoints of the search (default %(default)s)')
+    parser.add_argument('--resume', action='store_true', help='continue an interrupted search from its last checkpoint')
+    parser.add_argument('--dominance', choices=DOMINANCE_MODES, default='prune',
+                        help="dominated units: 'prune' keeps results complete, 'drop' only keeps best-only answers (default %(default)s)")
+    parser.add_argument('--strategy', choices=STRATEGIES, default='dfs',
+                        help="search engine; checkpoints are only written by 'dfs' (default %(default)s)")
+    parser.add_argument('--no-jit', action='store_true',
+                        help="run the 'kernel' strategy under CPython even when Numba is installed")
+    parser.add_argument('--emblems', type=int, default=0,
+                        help="emblems a team may carry, each adding a trait to a unit without it (dfs only)")
+    parser.add_argument('--exclude', nargs='+', default=[], metavar='UNIT', help='units no team may hold (dfs only)')
+    parser.add_argument('--at-most-one', action='append', default=[], metavar='UNIT,UNIT,...',
+                        help='comma-separated units of which a team holds at most one; may be repeated (dfs only)')
+    parser.add_argument('--tier-cap', action='append', default=[], metavar='COST=N',
+                        help='at most N units costing COST per team; may be repeated (dfs only)')
+    parser.add_argument('--owned', nargs='+', metavar='UNIT', help='units on the bench, see --max-unowned')
+    parser.add_argument('--max-unowned', type=int, default=0,
+                        help='units from outside the --owned bench a team may hold (default %(default)s)')
+    parser.add_argument('--result-cache', metavar='DIR', nargs='?', const=RESULT_CACHE_DIR,
+                        help=f'answer from earlier runs cached in DIR ({RESULT_CACHE_DIR} by default) when one covers the query')
+    parser.add_argument('--patch-from', nargs=2, metavar=('OLD_TRAITS', 'OLD_COSTS'),
+                        help='update the saved results of the data files before a balance patch instead of searching again')
+    parser.add_argument('--count-only', action='store_true', help='only count the valid teams per team size')
+    parser.add_argument('--pareto', action='store_true',
+                        help='only save the teams on the (cost, trait count, region count) Pareto frontier')
+    parser.add_argument('--best', type=int, metavar='K', help='only find the K cheapest teams with an exact solver')
+    parser.add_argument('--backend', choices=SOLVER_BACKENDS, default='auto',
+                        help="solver for --best; 'auto' uses OR-Tools CP-SAT when installed (default %(default)s)")
+    parser.add_argument('--min-traits', type=int, default=0, help='minimum number of active traits for --best')
+    parser.add_argument('--approximate', type=float, metavar='SECONDS',
+                        help='answer --best with an anytime beam and local search limited to SECONDS instead of a solver')
+    parser.add_argument('--score-config', metavar='FILE',
+                        help='answer --best with the K highest scoring teams, weighted by this YAML or JSON scoring config')
+    parser.add_argument('--histogram', metavar='FILE',
+                        help='only save the number of valid teams per (team size, cost, trait count, region count) to FILE')
+    parser.add_argument('--cache-mb', type=float,
+                        help=f'memory of the subproblem cache; always used by --count-only and --histogram ({CACHE_MB} MB by default), '
+                             "by the 'dfs' enumeration when given")
+    args = parser.parse_args()
+    
+    if args.no_progress:
+        progress = None
+    elif args.progress_log:
+        progress = progress_log(args.progress_log)
+    else:
+        progress = progress_bar()
+    
     calc = TraitComboCalculatorOptimized()
     # Define the required starting units
     required_units = ['Xin Zhao', 'Poppy', 'Kennen']
+    tier_caps = {}
+    for cap in args.tier_cap:
+        cost, _, count = cap.partition('=')
+        tier_caps[int(cost)] = int(count)
+    constraints = SearchConstraints(excluded=args.exclude, at_most_one=[group.split(',') for group in args.at_most_one],
+                                    tier_caps=tier_caps, owned=args.owned, max_unowned=args.max_unowned)
+    
+    if args.count_only:
+        cache = SubproblemCache(args.cache_mb if args.cache_mb is not None else CACHE_MB)
+        size_counts = calc.count_valid_combos(max_units=8, max_cost=50, start_units=8, required_units=required_units,
+                                              progress=progress, dominance=args.dominance, cache=cache)
+        for team_size, count in size_counts.items():
+            print(f"Team size {team_size}: {count} valid combinations")
+        print(f"Subproblem cache: {cache.summary()}")
+        return
+    if args.approximate is not None:
+        boards = calc.find_approximate_combos(max_units=8, max_cost=50, start_units=8, required_units=required_units,
+                                              min_traits=args.min_traits, k=args.best or 1, time_limit=args.approximate,
+                                              progress=progress)
+        for i, combo in enumerate(boards):
+            print(f"{i+1}. Cost: {combo['total_cost']}, Traits: {combo['trait_count']}, Units: {combo['units']}")
+        print(f"Approximation: {calc.approximation}")
+        return
+    if args.score_config:
+        boards = calc.find_top_scored_combos(max_units=8, max_cost=50, start_units=8, required_units=required_units,
+                                             k=args.best or 1, scoring=args.score_config, progress=progress)
+        for i, combo in enumerate(boards):
+            print(f"{i+1}. Score: {combo['score']:g}, Cost: {combo['total_cost']}, Traits: {combo['trait_count']}, Units: {combo['units']}")
+        return
+    if args.best:
+        boards = calc.find_best_combos(max_units=8, max_cost=50, start_units=8, required_units=required_units,
+                                       min_traits=args.min_traits, k=args.best, backend=args.backend, progress=progress)
+        for i, combo in enumerate(boards):
+            print(f"{i+1}. Cost: {combo['total_cost']}, Traits: {combo['trait_count']}, Units: {combo['units']}")
+        return
+    if args.histogram:
+        calc.run_and_save_histogram(start_units=8, max_units=8, max_cost=50, required_units=required_units,
+                                    outpath=args.histogram, progress=progress, dominance=args.dominance,
+                                    cache=SubproblemCache(args.cache_mb if args.cache_mb is not None else CACHE_MB))
+        return
     
     results = calc.run_and_save_all(
         start_units=8, 
         max_units=8, 
         max_cost=50, 
-        required_units=required_units
+        required_units=required_units,
+        progress=progress,
+        checkpoint_interval=args.checkpoint_interval if args.strategy == 'dfs' and not args.pareto else None,
+        resume=args.resume,
+        strategy=args.strategy,
+        dominance=args.dominance,
+        cache=SubproblemCache(args.cache_mb) if args.cache_mb and args.strategy == 'dfs' else None,
+        pareto=args.pareto,
+        jit=not args.no_jit,
+        emblems=args.emblems,
+        constraints=constraints or None,
+        result_cache=ResultCache(args.result_cache) if args.result_cache else None,
+        patch_from=TraitComboCalculatorOptimized(*args.patch_from) if args.patch_from else None
     )
     
+    summary = calc.instrumentation.summary()
+    print(f"Search: {summary['nodes']} nodes, {summary['leaves']} leaves, {summary['pruned']} pruned {summary['pruned_by_reason']}")
+    
     if results:
         print(f"Found {len(results)} valid combinations starting with {required_units}")
         print("\nTop 5 combinations by cost:")
@@ -0,0 +1,236 @@
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+# Rows of the result buffer allocated up front; a search finding more runs once more with room for all of them
+KERNEL_CAPACITY = 1 << 16
+# Stands in for the cost of a fill with too few units left
+NO_FILL = 1 << 40
+
+# kernel counters: nodes, leaves, results, cost_bound, region_bound, slot_bound
+STATS_SIZE = 6
+
+def _search_kernel(unit_costs, cheapest_fill, trait_ptr, trait_idx, counts, first_threshold, is_region,
+                   region_suffix, max_regions_per_unit, min_slots, max_slots, budget, min_regions, out, out_sizes, stats):
+    """DFS over flat arrays, emitting valid teams in candidate index order.
+
+    unit_costs[i] and the CSR pair trait_ptr/trait_idx describe pool unit i;
+    counts holds the trait counts of the required units and is updated in
+    place. cheapest_fill[i, m] is the cost of the m cheapest units at index
+    >= i (NO_FILL when fewer are left); region_suffix[t, i] counts the units
+    at index >= i holding region trait t. Up to len(out) teams are written
+    to out/out_sizes; the return value counts them all.
+    """
+    n = len(unit_costs)
+    n_traits = len(first_threshold)
+    path = np.zeros(max_slots + 1, dtype=np.int64)
+    next_idx = np.zeros(max_slots + 1, dtype=np.int64)
+    open_slots = np.zeros(max_slots + 1, dtype=np.int64)
+    needs = np.zeros(n_traits, dtype=np.int64)
+    found = 0
+    cost = 0
+    level = 0
+    entering = True
+    open_slots[0] = max_slots
+    while True:
+        if entering:
+            entering = False
+            stats[0] += 1
+            if level >= min_slots:
+                stats[1] += 1
+                active = 0
+                regions = 0
+                for t in range(n_traits):
+                    if counts[t] >= first_threshold[t]:
+                        active += 1
+                        if is_region[t]:
+                            regions += 1
+                if active > 0 and regions >= min_regions:
+                    if found < len(out):
+                        for j in range(level):
+                            out[found, j] = path[j]
+                        out_sizes[found] = level
+                    found += 1
+                    stats[2] += 1
+            top = open_slots[level]
+            next_idx[level] = n
+            if level < top:
+                first = max(level + 1, min_slots)
+                start = path[level - 1] + 1 if level > 0 else 0
+                if n - start < first - level:
+                    stats[5] += 1
+                else:
+                    # close the sizes whose cheapest fill exceeds the budget
+                    top_open = top
+                    while top_open >= first and cost + cheapest_fill[start, top_open - level] > budget:
+                        top_open -= 1
+                    if top_open < first:
+                        stats[3] += 1
+                    else:
+                        # region bound with the slots of the largest open size
+                        slots = top_open - level
+                        reachable = 0
+                        n_needs = 0
+                        for t in range(n_traits):
+                            if is_region[t]:
+                                need = first_threshold[t] - counts[t]
+                                if need <= 0:
+                                    reachable += 1
+                                elif need <= slots and region_suffix[t, start] >= need:
+                                    # insertion sort, there are only a dozen regions
+                                    k = n_needs
+                                    while k > 0 and needs[k - 1] > need:
+                                        needs[k] = needs[k - 1]
+                                        k -= 1
+                                    needs[k] = need
+                                    n_needs += 1
+                        spare = slots * max_regions_per_unit
+                        for k in range(n_needs):
+                            if needs[k] > spare:
+                                break
+                            spare -= needs[k]
+                            reachable += 1
+                        if reachable < min_regions:
+                            stats[4] += 1
+                        else:
+                            next_idx[level] = start
+                            open_slots[level + 1] = top_open
+        i = next_idx[level]
+        if i < n:
+            next_idx[level] = i + 1
+            if cost + unit_costs[i] <= budget:
+                cost += unit_costs[i]
+                for p in range(trait_ptr[i], trait_ptr[i + 1]):
+                    counts[trait_idx[p]] += 1
+                path[level] = i
+                level += 1
+                entering = True
+            else:
+                stats[3] += 1
+            continue
+        if level == 0:
+            break
+        level -= 1
+        i = path[level]
+        cost -= unit_costs[i]
+        for p in range(trait_ptr[i], trait_ptr[i + 1]):
+            counts[trait_idx[p]] -= 1
+    return found
+
+_compiled_kernel = None
+
+def _kernel(jit):
+    """The search kernel, compiled with Numba when asked for and installed"""
+    global _compiled_kernel
+    if not jit or njit is None:
+        return _search_kernel
+    if _compiled_kernel is None:
+        _compiled_kernel = njit(cache=True)(_search_kernel)
+    return _compiled_kernel
+
+def kernel_search_all_sizes(calc, min_size, max_size, candidates, max_cost, required_units=None, min_regions=4,
+                            results=None, instr=None, jit=True):
+    """Flat-array search over every team size in [min_size, max_size].
+
+    The same traversal and bounds as the DFS engine (cost of the cheapest
+    fill, region bound) over integer arrays instead of dicts, so that
+    Numba can compile it: with `jit` and Numba installed the kernel runs
+    compiled, otherwise the same code runs under CPython. Only unit indices
+    come back from the kernel; combos are built afterwards.
+
+    Emits the same combos in the same order as the DFS engine (before its
+    grouping by team size).
+    """
+    all_combos = results if results is not None else []
+    initial_depth = len(required_units) if required_units else 0
+    chosen = []
+    for unit in required_units or []:
+        if unit in candidates and unit not in chosen:
+            chosen.append(unit)
+    base_cost = sum(int(calc.units_costs.get(u, 0)) for u in chosen)
+    pool = [u for u in candidates if u not in chosen]
+    min_slots = max(min_size - initial_depth, 0)
+    max_slots = max_size - initial_depth
+    if max_slots < min_slots or base_cost > max_cost:
+        return all_combos
+
+    traits = list(calc.trait_thresholds)
+    trait_pos = {t: j for j, t in enumerate(traits)}
+    unit_trait_lists = [[trait_pos[t] for t in calc.unit_traits.get(u, []) if t in trait_pos] for u in pool]
+    trait_ptr = np.zeros(len(pool) + 1, dtype=np.int64)
+    trait_ptr[1:] = np.cumsum([len(ts) for ts in unit_trait_lists])
+    trait_idx = np.array([j for ts in unit_trait_lists for j in ts], dtype=np.int64)
+    counts = np.zeros(len(traits), dtype=np.int64)
+    for unit in chosen:
+        for t in calc.unit_traits.get(unit, []):
+            if t in trait_pos:
+                counts[trait_pos[t]] += 1
+    first_threshold = np.array([calc.trait_thresholds[t][0] for t in traits], dtype=np.int64)
+    is_region = np.array([t in calc.target_regions for t in traits], dtype=np.bool_)
+    region_suffix = np.zeros((len(traits), len(pool) + 1), dtype=np.int64)
+    for i in range(len(pool) - 1, -1, -1):
+        region_suffix[:, i] = region_suffix[:, i + 1]
+        for j in unit_trait_lists[i]:
+            region_suffix[j, i] += is_region[j]
+    max_regions_per_unit = max((int(is_region[ts].sum()) for ts in unit_trait_lists if ts), default=0)
+    unit_costs = np.array([int(calc.units_costs.get(u, 0)) for u in pool], dtype=np.int64)
+    cheapest_fill = np.full((len(pool) + 1, max_slots + 1), NO_FILL, dtype=np.int64)
+    for i in range(len(pool) + 1):
+        fill = np.cumsum(np.sort(unit_costs[i:]))[:max_slots]
+        cheapest_fill[i, 0] = 0
+        cheapest_fill[i, 1:len(fill) + 1] = fill
+
+    if instr is not None:
+        instr.add_space(sum(instr.subtree_size(len(pool), slots) for slots in range(min_slots, max_slots + 1)))
+    kernel = _kernel(jit)
+    capacity = KERNEL_CAPACITY
+    while True:
+        # rows shorter than max_slots are padded with len(pool), a unit without cost or traits below
+        out = np.full((capacity, max_slots), len(pool), dtype=np.int64)
+        out_sizes = np.zeros(capacity, dtype=np.int64)
+        stats = np.zeros(STATS_SIZE, dtype=np.int64)
+        found = kernel(unit_costs, cheapest_fill, trait_ptr, trait_idx, counts.copy(), first_threshold, is_region,
+                       region_suffix, max_regions_per_unit, min_slots, max_slots, max_cost - base_cost, min_regions,
+                       out, out_sizes, stats)
+        if found <= capacity:
+            break
+        capacity = found
+
+    if instr is not None:
+        nodes, leaves, result_count, cost_pruned, region_pruned, slot_pruned = stats.tolist()
+        instr.nodes += nodes
+        instr.leaves += leaves
+        instr.results += result_count
+        for reason, count in (('cost_bound', cost_pruned), ('region_bound', region_pruned), ('slot_bound', slot_pruned)):
+            if count:
+                instr.prune(reason, initial_depth, count=count)
+
+    # activation of every team at once: trait counts from the incidence matrix, levels from a lookup table
+    rows = out[:found]
+    incidence = np.zeros((len(pool) + 1, len(traits)), dtype=np.int64)
+    for i, ts in enumerate(unit_trait_lists):
+        incidence[i, ts] = 1
+    team_counts = np.broadcast_to(counts, (found, len(traits))).copy()
+    for j in range(max_slots):
+        team_counts += incidence[rows[:, j]]
+    max_count = len(chosen) + max_slots
+    levels = np.zeros((len(traits), max_count + 1), dtype=np.int64)
+    for j, trait in enumerate(traits):
+        for count in range(max_count + 1):
+            levels[j, count] = max([th for th in calc.trait_thresholds[trait] if th <= count], default=0)
+    team_levels = levels[np.arange(len(traits)), team_counts]
+    team_costs = base_cost + np.append(unit_costs, 0)[rows].sum(axis=1)
+    for row, size, cost, row_levels in zip(rows.tolist(), out_sizes[:found].tolist(), team_costs.tolist(),
+                                           team_levels.tolist()):
+        activated = {trait: level for trait, level in zip(traits, row_levels) if level}
+        all_combos.append({
+            'units': chosen + [pool[i] for i in row[:size]],
+            'trait_count': len(activated),
+            'activated_traits': sorted(list(activated.keys())),
+            'total_cost': cost,
+            'activated_details': activated
+        })
+    return all_combos
@@ -0,0 +1,156 @@
+import itertools
+
+import numpy as np
+
+# Upper bound on the cells of one (left halves x right halves) block compared at once
+JOIN_BLOCK_CELLS = 1 << 22
+
+def _half_table(size, pool_size, unit_costs, unit_regions):
+    """Every `size`-subset of the pool as index rows, with its cost and capped region counts"""
+    if size == 0:
+        indices = np.zeros((1, 0), dtype=np.int32)
+    else:
+        flat = np.fromiter(itertools.chain.from_iterable(itertools.combinations(range(pool_size), size)), dtype=np.int32)
+        indices = flat.reshape(-1, size)
+    costs = unit_costs[indices].sum(axis=1)
+    counts = unit_regions[indices].sum(axis=1)
+    return indices, costs, counts
+
+def _group_by_signature(counts):
+    """Group half rows by their region signature: (signatures, members per signature)"""
+    signatures, inverse = np.unique(counts, axis=0, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    order = np.argsort(inverse, kind='stable')
+    bounds = np.searchsorted(inverse[order], np.arange(len(signatures) + 1))
+    return signatures, [order[bounds[g]:bounds[g + 1]] for g in range(len(signatures))]
+
+def mitm_search_for_size(calc, team_size, candidates, max_cost, required_units=None, min_regions=4, results=None, instr=None):
+    """Meet-in-the-middle search for teams of exactly `team_size` units.
+
+    The free slots after the required units are split into a left half of
+    `slots // 2` units and a right half with the rest. Each team is counted
+    once as (its first left-half units, its last right-half units) in
+    candidate order, so a left and a right half join only when the left
+    half ends before the right half starts. Halves are enumerated into
+    NumPy tables (unit indices, cost, region counts capped at what is still
+    missing to activate each region) and grouped by region signature;
+    validity of a join only depends on the two signatures, so the region
+    goal is checked once per pair of signatures and the index order and
+    cost cap per member of the accepted pairs.
+
+    Emits the same combos in the same order as the DFS engine.
+    """
+    all_combos = results if results is not None else []
+    initial_depth = len(required_units) if required_units else 0
+    slots = team_size - initial_depth
+    if slots < 0:
+        return all_combos
+
+    chosen = []
+    for unit in required_units or []:
+        if unit in candidates and unit not in chosen:
+            chosen.append(unit)
+    base_cost = sum(int(calc.units_costs.get(u, 0)) for u in chosen)
+    base_counts = {}
+    for unit in chosen:
+        for t in calc.unit_traits.get(unit, []):
+            base_counts[t] = base_counts.get(t, 0) + 1
+    budget = max_cost - base_cost
+    pool = [u for u in candidates if u not in chosen]
+    if budget < 0 or len(pool) < slots:
+        return all_combos
+
+    # regions still missing units; regions already active count as a constant
+    regions = [r for r in calc.target_regions if r in calc.trait_thresholds]
+    needs = np.array([calc.trait_thresholds[r][0] - base_counts.get(r, 0) for r in regions], dtype=np.int16)
+    active_regions = int((needs <= 0).sum())
+    open_mask = needs > 0
+    needs = needs[open_mask]
+    open_regions = [r for r, is_open in zip(regions, open_mask) if is_open]
+    required_regions = min_regions - active_regions
+
+    unit_costs = np.array([int(calc.units_costs.get(u, 0)) for u in pool], dtype=np.int32)
+    unit_regions = np.array([[1 if r in calc.unit_traits.get(u, []) else 0 for r in open_regions] for u in pool],
+                            dtype=np.int16).reshape(len(pool), len(open_regions))
+
+    left_size = slots // 2
+    right_size = slots - left_size
+    left_idx, left_cost, left_counts = _half_table(left_size, len(pool), unit_costs, unit_regions)
+    right_idx, right_cost, right_counts = _half_table(right_size, len(pool), unit_costs, unit_regions)
+    if instr is not None:
+        instr.nodes += len(left_idx) + len(right_idx)
+        instr.add_space(len(left_idx))
+
+    # halves over budget on their own can never join
+    cheapest_right = right_cost.min() if len(right_cost) else 0
+    cheapest_left = left_cost.min() if len(left_cost) else 0
+    left_keep = left_cost + cheapest_right <= budget
+    right_keep = right_cost + cheapest_left <= budget
+    if instr is not None:
+        instr.prune('cost_bound', initial_depth, count=int((~left_keep).sum() + (~right_keep).sum()))
+    left_idx, left_cost, left_counts = left_idx[left_keep], left_cost[left_keep], left_counts[left_keep]
+    right_idx, right_cost, right_counts = right_idx[right_keep], right_cost[right_keep], right_counts[right_keep]
+    if instr is not None:
+        instr.advance(int((~left_keep).sum()))
+    if len(left_idx) == 0 or len(right_idx) == 0:
+        return all_combos
+
+    # a region is active once left + right reach its need, so larger counts are equivalent
+    left_signatures, left_groups = _group_by_signature(np.minimum(left_counts, needs))
+    right_signatures, right_groups = _group_by_signature(np.minimum(right_counts, needs))
+    left_last = left_idx[:, -1] if left_size else np.full(len(left_idx), -1, dtype=np.int32)
+    right_first = right_idx[:, 0] if right_size else np.full(len(right_idx), len(pool), dtype=np.int32)
+
+    pairs_left = []
+    pairs_right = []
+    for g, members in enumerate(left_groups):
+        reached = ((left_signatures[g] + right_signatures) >= needs).sum(axis=1)
+        accepted = np.nonzero(reached >= required_regions)[0]
+        if instr is not None:
+            instr.prune('region_bound', initial_depth, count=len(right_groups) - len(accepted))
+            instr.advance(len(members))
+        if len(accepted) == 0:
+            continue
+        right_members = np.concatenate([right_groups[r] for r in accepted])
+        r_first = right_first[right_members]
+        r_cost = right_cost[right_members]
+        rows = max(1, JOIN_BLOCK_CELLS // max(1, len(right_members)))
+        for start in range(0, len(members), rows):
+            block = members[start:start + rows]
+            ok = (left_last[block][:, None] < r_first[None, :]) & (left_cost[block][:, None] + r_cost[None, :] <= budget)
+            li, ri = np.nonzero(ok)
+            if instr is not None:
+                instr.leaves += ok.size
+            pairs_left.append(block[li])
+            pairs_right.append(right_members[ri])
+
+    if not pairs_left:
+        return all_combos
+    combos_idx = np.concatenate([left_idx[np.concatenate(pairs_left)], right_idx[np.concatenate(pairs_right)]], axis=1)
+    # canonical DFS order: lexicographic by candidate index
+    combos_idx = combos_idx[np.lexsort(combos_idx.T[::-1])] if slots else combos_idx
+
+    for row in combos_idx.tolist():
+        units = chosen + [pool[i] for i in row]
+        counts = dict(base_counts)
+        for unit in units[len(chosen):]:
+            for t in calc.unit_traits.get(unit, []):
+                counts[t] = counts.get(t, 0) + 1
+        activated = {}
+        for trait, thresholds in calc.trait_thresholds.items():
+            cnt = counts.get(trait, 0)
+            valids = [th for th in thresholds if th <= cnt]
+            if valids:
+                activated[trait] = max(valids)
+        if not activated:
+            continue
+        if instr is not None:
+            instr.result()
+        all_combos.append({
+            'units': units,
+            'trait_count': len(activated),
+            'activated_traits': sorted(list(activated.keys())),
+            'total_cost': base_cost + sum(int(calc.units_costs.get(u, 0)) for u in units[len(chosen):]),
+            'activated_details': activated
+        })
+    return all_combos
@@ -0,0 +1,54 @@
+INF = float('inf')
+
+class ParetoSkyline:
+    """Frontier of boards over (total cost, active traits, active regions).
+
+    A board dominates another when it costs no more and activates at least
+    as many traits and regions, and is better in one of them. The skyline
+    keeps one board per non-dominated (cost, traits, regions) point: the
+    first in the exhaustive output order (team size, then candidate index),
+    identified by its `key`.
+
+    `min_cost[t][r]` is the cheapest board on the frontier with at least `t`
+    traits and `r` regions, so dominance by any frontier board is a
+    constant-time lookup, both for a finished board and for the best case
+    of a whole subtree.
+    """
+    def __init__(self, max_traits, max_regions):
+        self.min_cost = [[INF] * (max_regions + 2) for _ in range(max_traits + 2)]
+        self.points = {}
+
+    def _strictly_dominated(self, cost, traits, regions):
+        m = self.min_cost
+        return m[traits][regions] < cost or m[traits + 1][regions] <= cost or m[traits][regions + 1] <= cost
+
+    def dominated(self, cost, traits, regions, key):
+        """True when the board adds nothing: a frontier board dominates it, or has its point and comes first"""
+        if self._strictly_dominated(cost, traits, regions):
+            return True
+        point = self.points.get((cost, traits, regions))
+        return point is not None and point[0] <= key
+
+    def covers(self, cost, traits, regions, min_size):
+        """True when no board of at least `min_size` units, costing at least `cost` and activating at most
+        `traits` traits and `regions` regions, can enter the frontier. A later board in DFS order of a size
+        no smaller than the board holding the same point comes after it in the output order"""
+        if self._strictly_dominated(cost, traits, regions):
+            return True
+        point = self.points.get((cost, traits, regions))
+        return point is not None and point[0][0] <= min_size
+
+    def add(self, cost, traits, regions, key, combo):
+        self.points[(cost, traits, regions)] = (key, combo)
+        for c, t, r in list(self.points):
+            if (c, t, r) != (cost, traits, regions) and cost <= c and traits >= t and regions >= r:
+                del self.points[(c, t, r)]
+        for t in range(traits + 1):
+            row = self.min_cost[t]
+            for r in range(regions + 1):
+                if cost < row[r]:
+                    row[r] = cost
+
+    def boards(self):
+        """Frontier boards in the exhaustive output order"""
+        return [combo for _key, combo in sorted(self.points.values(), key=lambda point: point[0])]
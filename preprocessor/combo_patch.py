@@ -0,0 +1,134 @@
+from preprocessor.result_cache import search_order
+from preprocessor.search_constraints import SearchConstraints
+
+def diff_datasets(old_calc, new_calc, cost_tiers=False):
+    """Units and traits changed by a balance patch, and the units whose teams need another look.
+
+    `touched` units changed cost, traits or candidacy, or hold a trait whose
+    thresholds changed (before or after the patch): a stored team holding
+    one of them has to be validated again, and no other team changed.
+    `loosened` units are the touched candidates that can make a team valid
+    that was not before: new candidates, cheaper units, units that gained
+    a trait and holders of a trait whose first threshold went down. Cost
+    increases, lost traits and higher thresholds only invalidate teams,
+    unless `cost_tiers` is set (the search caps units per cost): then a
+    unit leaving a capped tier frees room in it, so any cost change
+    loosens.
+    """
+    old_candidates = set(old_calc.candidates)
+    new_candidates = set(new_calc.candidates)
+    units = {}
+    for unit in sorted(set(old_calc.unit_traits) | set(new_calc.unit_traits) | set(old_calc.units_costs) | set(new_calc.units_costs)):
+        old_cost, new_cost = old_calc.units_costs.get(unit), new_calc.units_costs.get(unit)
+        old_traits, new_traits = set(old_calc.unit_traits.get(unit, [])), set(new_calc.unit_traits.get(unit, []))
+        if old_cost != new_cost or old_traits != new_traits or (unit in old_candidates) != (unit in new_candidates):
+            units[unit] = {
+                'cost': [old_cost, new_cost],
+                'gained_traits': sorted(new_traits - old_traits),
+                'lost_traits': sorted(old_traits - new_traits),
+            }
+    traits = {}
+    for trait in sorted(set(old_calc.trait_thresholds) | set(new_calc.trait_thresholds)):
+        old_thresholds, new_thresholds = old_calc.trait_thresholds.get(trait), new_calc.trait_thresholds.get(trait)
+        if old_thresholds != new_thresholds:
+            traits[trait] = [old_thresholds, new_thresholds]
+
+    touched = set(units)
+    loosened = set()
+    for unit, change in units.items():
+        old_cost, new_cost = change['cost']
+        if unit in new_candidates and (unit not in old_candidates or change['gained_traits']
+                                       or int(new_cost) < int(old_cost)
+                                       or (cost_tiers and int(new_cost) != int(old_cost))):
+            loosened.add(unit)
+    for trait, (old_thresholds, new_thresholds) in traits.items():
+        touched.update(old_calc.trait_units.get(trait, []))
+        touched.update(new_calc.trait_units.get(trait, []))
+        if new_thresholds and (not old_thresholds or new_thresholds[0] < old_thresholds[0]):
+            loosened.update(u for u in new_calc.trait_units.get(trait, []) if u in new_candidates)
+    return {'units': units, 'traits': traits, 'touched': touched, 'loosened': loosened}
+
+def revalidate_combo(calc, units, params, constraints=None):
+    """The combo for a stored team under the current data, or None when it is no longer valid"""
+    # a unit that left the candidates, e.g. with its last target region, can no longer be in a team
+    if any(u not in calc.candidates for u in units):
+        return None
+    if not (params['start_units'] <= len(units) <= params['max_units']):
+        return None
+    total_cost = calc.calculate_total_cost(units)
+    if total_cost > params['max_cost'] or any(int(calc.units_costs[u]) > params['max_cost'] for u in units):
+        return None
+    if constraints is not None and not constraints.allows_team(units, calc.units_costs):
+        return None
+    activated, _counts = calc.get_activation_state(units)
+    if not activated or calc.count_activated_target_regions(activated) < params['min_regions']:
+        return None
+    return {
+        'units': list(units),
+        'trait_count': len(activated),
+        'activated_traits': sorted(list(activated.keys())),
+        'total_cost': total_cost,
+        'activated_details': activated
+    }
+
+def patch_search(calc, old_calc, old_combos, params, constraints=None, instr=None):
+    """Results of a search under the patched data in `calc`, from the results of the same search before it.
+
+    Stored teams without a touched unit (see diff_datasets) are kept as
+    they are and the others are validated again under the new data; only
+    the subtrees of teams holding a loosened unit are searched. The i-th
+    loosened unit is searched as a required unit with the earlier ones
+    excluded, so every new team is found exactly once.
+
+    Returns the combos in the order of find_all_valid_combos, or None when
+    the patch cannot be applied incrementally (other target regions, or a
+    required unit outside the candidates, which takes a slot without
+    showing in the teams).
+    """
+    required = params['required_units']
+    viable = [u for u in calc.candidates if int(calc.units_costs.get(u, 999)) <= params['max_cost']]
+    if old_calc.target_regions != calc.target_regions or any(u not in viable or u not in old_calc.candidates for u in required):
+        return None
+    diff = diff_datasets(old_calc, calc, cost_tiers=bool(constraints and constraints.tier_caps))
+    touched, loosened = diff['touched'], diff['loosened']
+    print(f"Patch: {len(diff['units'])} units and {len(diff['traits'])} traits changed, "
+          f"{len(touched)} units touched, {len(loosened)} loosened")
+
+    results = []
+    revalidated = 0
+    for combo in old_combos:
+        units = combo['units']
+        if touched.isdisjoint(units):
+            results.append(combo)
+        elif loosened.isdisjoint(units):
+            # teams holding a loosened unit come back from the searches below
+            combo = revalidate_combo(calc, units, params, constraints)
+            revalidated += 1
+            if combo is not None:
+                results.append(combo)
+    kept = len(results)
+    print(f"Patch: kept {kept} of {len(old_combos)} stored teams ({revalidated} validated again)")
+
+    base = constraints.describe() if constraints else SearchConstraints().describe()
+    searched = []
+    for unit in [u for u in viable if u in loosened]:
+        team_required = list(dict.fromkeys(required + [unit]))
+        subtree = SearchConstraints(set(base['excluded']) | set(searched), base['at_most_one'], base['tier_caps'],
+                                    base['owned'], base['max_unowned'])
+        searched.append(unit)
+        try:
+            subtree.check_required(team_required, calc.units_costs)
+        except ValueError:
+            # no team may hold the unit alongside the required ones
+            continue
+        candidates, dominators = calc._search_candidates(params['max_units'], params['max_cost'], team_required,
+                                                         params['min_regions'],
+                                                         'off' if subtree.node_checks else 'prune', subtree)
+        if instr is not None:
+            for team_size in range(params['start_units'], params['max_units'] + 1):
+                instr.add_space(instr.subtree_size(len(candidates), team_size - len(team_required)))
+        calc._dfs_search_all_sizes(params['start_units'], params['max_units'], candidates, params['max_cost'],
+                                   team_required, params['min_regions'], results=results, dominators=dominators,
+                                   constraints=subtree)
+    print(f"Patch: searched {len(searched)} loosened units, {len(results) - kept} new or changed teams")
+    return search_order(calc, results, required)
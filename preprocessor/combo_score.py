@@ -0,0 +1,180 @@
+import heapq
+
+from preprocessor.board_solver import _combo, _setup
+from utils import file_processor
+
+class BoardScore:
+    """Weighted score of a board: trait tiers, region bonuses and a cost penalty.
+
+    `tier_weights` maps a trait to the weight of each of its tiers, in the
+    order of the thresholds in its `activations` table; the 'default' entry
+    covers unlisted traits, and without one a trait scores its tier number
+    (1 for the first threshold, 2 for the second, ...). `region_bonus` adds
+    a flat bonus per active trait (meant for target regions), and the
+    board's total cost is charged `cost_penalty` per gold.
+
+    weight_at[trait][count] is what the trait contributes with `count`
+    units, so the best a trait can still reach from count units with up
+    to `extra` more is a lookup over a short range of counts.
+    """
+    def __init__(self, trait_thresholds, tier_weights=None, region_bonus=None, cost_penalty=0.0, max_count=12):
+        tier_weights = tier_weights or {}
+        region_bonus = region_bonus or {}
+        self.cost_penalty = float(cost_penalty)
+        self.weight_at = {}
+        for trait, thresholds in trait_thresholds.items():
+            weights = tier_weights.get(trait, tier_weights.get('default'))
+            if weights is None:
+                weights = list(range(1, len(thresholds) + 1))
+            weight_at = [0.0] * (max(max_count, thresholds[-1]) + 1)
+            for tier, threshold in enumerate(thresholds):
+                weight = float(weights[min(tier, len(weights) - 1)]) if weights else 0.0
+                for count in range(threshold, len(weight_at)):
+                    weight_at[count] = weight + float(region_bonus.get(trait, 0))
+            self.weight_at[trait] = weight_at
+
+    @classmethod
+    def from_config(cls, trait_thresholds, config_path, max_count=12):
+        """Scoring from a YAML or JSON file with optional tier_weights, region_bonus and cost_penalty keys"""
+        path = str(config_path)
+        config = file_processor.read_yaml(path) if path.endswith(('.yaml', '.yml')) else file_processor.read_json(path)
+        return cls(trait_thresholds, config.get('tier_weights'), config.get('region_bonus'),
+                   config.get('cost_penalty', 0.0), max_count)
+
+    def contribution(self, trait, count):
+        weight_at = self.weight_at[trait]
+        return weight_at[min(count, len(weight_at) - 1)]
+
+    def score(self, counts, cost):
+        return sum(self.contribution(trait, counts.get(trait, 0)) for trait in self.weight_at) - self.cost_penalty * cost
+
+    def trait_bound(self, trait, count, extra):
+        """Best contribution of the trait with count units plus at most `extra` more"""
+        weight_at = self.weight_at[trait]
+        last = len(weight_at) - 1
+        return max(weight_at[min(c, last)] for c in range(count, count + extra + 1))
+
+def scored_best_boards(calc, min_size, max_size, candidates, max_cost, scoring, required_units=None, min_regions=4,
+                       k=1, instr=None):
+    """Depth-first branch and bound for the k valid boards with the highest `scoring` score.
+
+    A node is cut when an admissible bound on the score of every board
+    below it falls short of the k-th best score so far. The bound lets
+    each trait independently reach the best contribution available with
+    the units of the suffix still holding it (at most the open slots),
+    and charges the cost penalty on the cheapest completion to the
+    smallest open size (a negative penalty, rewarding cost, is credited
+    on the whole budget). Candidates must be sorted by cost.
+
+    Returns the boards with their 'score', best first; equal scores keep
+    the order of the exhaustive search output sorted by (total cost,
+    -trait count).
+    """
+    chosen, pool, unit_cost = _setup(calc, candidates, required_units)
+    n = len(pool)
+    initial_depth = len(required_units) if required_units else 0
+    position = {u: i for i, u in enumerate(chosen + pool)}
+    costs = [unit_cost[u] for u in pool]
+    max_slots = max(0, max_size - initial_depth)
+    # cheapest_after[i][s]: cost of the s cheapest pool units at index >= i
+    cheapest_after = [[0]] * (n + 1)
+    window = []
+    for i in range(n - 1, -1, -1):
+        window = sorted(window + [costs[i]])[:max_slots]
+        cheapest_after[i] = [0] + [sum(window[:s]) for s in range(1, len(window) + 1)]
+    trait_suffix = {}
+    for trait in calc.trait_thresholds:
+        suffix = [0] * (n + 1)
+        for i in range(n - 1, -1, -1):
+            suffix[i] = suffix[i + 1] + (trait in calc.unit_traits.get(pool[i], []))
+        trait_suffix[trait] = suffix
+    region_suffix = {r: trait_suffix[r] for r in calc.target_regions if r in trait_suffix}
+    max_regions_per_unit = max((sum(1 for t in calc.unit_traits.get(u, []) if t in region_suffix) for u in pool), default=0)
+
+    counts = {}
+    for unit in chosen:
+        for t in calc.unit_traits.get(unit, []):
+            counts[t] = counts.get(t, 0) + 1
+    state = {'cost': sum(unit_cost[u] for u in chosen)}
+    team = list(chosen)
+    # min-heap of the k best boards: (score, negated output position, combo)
+    best = []
+
+    def order(combo):
+        # position in the exhaustive output sorted by (total cost, -trait count), negated for the heap
+        return (-combo['total_cost'], combo['trait_count'], -len(combo['units']), [-position[u] for u in combo['units']])
+
+    def worst_score():
+        return best[0][0] if len(best) >= k else None
+
+    def expand(start_idx, depth, top_size):
+        if instr is not None:
+            instr.node(depth)
+        if depth >= min_size:
+            if instr is not None:
+                instr.leaf()
+            combo = _combo(calc, team, counts, state['cost'])
+            if (combo['activated_details'] and calc.count_activated_target_regions(combo['activated_details']) >= min_regions
+                    and state['cost'] <= max_cost):
+                combo['score'] = scoring.score(counts, state['cost'])
+                entry = (combo['score'], order(combo), combo)
+                if len(best) < k:
+                    heapq.heappush(best, entry)
+                elif entry[:2] > best[0][:2]:
+                    heapq.heapreplace(best, entry)
+                if instr is not None:
+                    instr.result()
+        if depth >= top_size:
+            return
+        first_size = max(depth + 1, min_size)
+        if n - start_idx < first_size - depth:
+            if instr is not None:
+                instr.prune('slot_bound', depth)
+            return
+        open_size = min(top_size, depth + len(cheapest_after[start_idx]) - 1)
+        while open_size >= first_size and state['cost'] + cheapest_after[start_idx][open_size - depth] > max_cost:
+            open_size -= 1
+        if open_size < first_size:
+            if instr is not None:
+                instr.prune('cost_bound', depth)
+            return
+        slots = open_size - depth
+        if calc.region_upper_bound(counts, start_idx, slots, region_suffix, max_regions_per_unit) < min_regions:
+            if instr is not None:
+                instr.prune('region_bound', depth)
+            return
+        limit = worst_score()
+        if limit is not None:
+            bound = sum(scoring.trait_bound(t, counts.get(t, 0), min(slots, suffix[start_idx]))
+                        for t, suffix in trait_suffix.items())
+            if scoring.cost_penalty >= 0:
+                bound -= scoring.cost_penalty * (state['cost'] + cheapest_after[start_idx][first_size - depth])
+            else:
+                # a cost reward: no board below spends more than the budget
+                bound -= scoring.cost_penalty * max_cost
+            # boards scoring exactly the k-th best may still come earlier in the output, so only cut below it
+            if bound < limit - 1e-9:
+                if instr is not None:
+                    instr.prune('score_bound', depth)
+                return
+
+        for i in range(start_idx, n):
+            u = pool[i]
+            if state['cost'] + costs[i] > max_cost:
+                # candidates are cheapest first, so every later sibling is over the budget as well
+                break
+            team.append(u)
+            state['cost'] += costs[i]
+            for t in calc.unit_traits.get(u, []):
+                counts[t] = counts.get(t, 0) + 1
+            expand(i + 1, depth + 1, open_size)
+            for t in calc.unit_traits.get(u, []):
+                counts[t] -= 1
+                if counts[t] == 0:
+                    del counts[t]
+            state['cost'] -= costs[i]
+            team.pop()
+
+    if state['cost'] <= max_cost:
+        expand(0, initial_depth, max_size)
+    return [combo for _score, _order, combo in sorted(best, key=lambda entry: entry[:2], reverse=True)]
@@ -0,0 +1,164 @@
+import itertools
+
+from math import comb
+
+def trait_signature_classes(units, traits_of):
+    """Group units with identical trait sets, in order of first appearance; returns the member lists"""
+    classes = {}
+    for unit in units:
+        classes.setdefault(frozenset(traits_of(unit)), []).append(unit)
+    return list(classes.values())
+
+def symmetry_search_all_sizes(calc, min_size, max_size, candidates, max_cost, required_units=None, min_regions=4,
+                              results=None, instr=None):
+    """Search over multisets of trait signature classes instead of single units.
+
+    Units whose activatable traits are identical only differ by cost, so a
+    team is decided by how many units it takes from each class. The DFS
+    picks (class, count) pairs in class order, bounding with the cheapest
+    members of each class, and evaluates activation once per multiset;
+    valid multisets are expanded into every member choice within the cost
+    cap only at output time. Results are sorted into the DFS engine's
+    order (team size, then candidate index), so both return the same list.
+    """
+    all_combos = results if results is not None else []
+    initial_depth = len(required_units) if required_units else 0
+
+    chosen = []
+    for unit in required_units or []:
+        if unit in candidates and unit not in chosen:
+            chosen.append(unit)
+    pool = [u for u in candidates if u not in chosen]
+    position = {u: i for i, u in enumerate(pool)}
+    unit_cost = {u: int(calc.units_costs.get(u, 0)) for u in chosen + pool}
+
+    def activatable_traits(unit):
+        return [t for t in calc.unit_traits.get(unit, []) if t in calc.trait_thresholds]
+
+    classes = trait_signature_classes(pool, activatable_traits)
+    class_traits = [activatable_traits(members[0]) for members in classes]
+    class_count = len(classes)
+    # cheapest_cost[j][c]: cost of the c cheapest members of class j (members keep the candidate cost order)
+    cheapest_cost = [list(itertools.accumulate((unit_cost[u] for u in sorted(members, key=unit_cost.get)), initial=0))
+                     for members in classes]
+
+    max_slots = max(0, max_size - initial_depth)
+    # members in classes >= j, and the cost of filling s slots from them as cheaply as possible
+    suffix_members = [0] * (class_count + 1)
+    fill_cost = [[0]] * (class_count + 1)
+    pooled_costs = []
+    for j in range(class_count - 1, -1, -1):
+        suffix_members[j] = suffix_members[j + 1] + len(classes[j])
+        pooled_costs = sorted(pooled_costs + [unit_cost[u] for u in classes[j]])[:max_slots]
+        fill_cost[j] = list(itertools.accumulate(pooled_costs, initial=0))
+
+    region_suffix = {}
+    for region in calc.target_regions:
+        if region not in calc.trait_thresholds:
+            continue
+        suffix = [0] * (class_count + 1)
+        for j in range(class_count - 1, -1, -1):
+            suffix[j] = suffix[j + 1] + (len(classes[j]) if region in class_traits[j] else 0)
+        region_suffix[region] = suffix
+    max_regions_per_unit = max((sum(1 for t in traits if t in region_suffix) for traits in class_traits), default=0)
+    region_min_thresholds = [(region, calc.trait_thresholds[region][0]) for region in region_suffix]
+
+    counts = {}
+    for unit in chosen:
+        for t in activatable_traits(unit):
+            counts[t] = counts.get(t, 0) + 1
+    state = {'cost': sum(unit_cost[u] for u in chosen)}
+    picks = []
+    found = []
+
+    def space(remaining, depth, first_size, last_size):
+        return sum(comb(remaining, size - depth) for size in range(first_size, last_size + 1) if 0 <= size - depth <= remaining)
+
+    if instr is not None:
+        instr.add_space(space(len(pool), initial_depth, max(initial_depth, min_size), max_size))
+
+    def expand(depth, activated_local):
+        # every member choice of the picked classes that fits the cost cap
+        base_cost = sum(unit_cost[u] for u in chosen)
+        member_choices = [list(itertools.combinations(classes[j], c)) for j, c in picks]
+        for choice in itertools.product(*member_choices):
+            free_units = sorted((u for group in choice for u in group), key=position.get)
+            total_cost = base_cost + sum(unit_cost[u] for u in free_units)
+            if total_cost > max_cost:
+                continue
+            if instr is not None:
+                instr.result()
+            found.append((depth, tuple(position[u] for u in free_units), {
+                'units': chosen + free_units,
+                'trait_count': len(activated_local),
+                'activated_traits': sorted(list(activated_local.keys())),
+                'total_cost': total_cost,
+                'activated_details': dict(activated_local)
+            }))
+
+    def backtrack(j_start, depth, top_size, multiplicity):
+        # multiplicity: concrete teams represented by the classes picked so far
+        if instr is not None:
+            instr.node(depth)
+        if depth >= min_size:
+            if instr is not None:
+                instr.leaf()
+                instr.advance(multiplicity - 1)
+            reachable = sum(1 for region, threshold in region_min_thresholds if counts.get(region, 0) >= threshold)
+            if reachable >= min_regions and state['cost'] <= max_cost:
+                activated_local = {}
+                for trait, thresholds in calc.trait_thresholds.items():
+                    cnt = counts.get(trait, 0)
+                    valids = [th for th in thresholds if th <= cnt]
+                    if valids:
+                        activated_local[trait] = max(valids)
+                if activated_local and calc.count_activated_target_regions(activated_local) >= min_regions:
+                    expand(depth, activated_local)
+        if depth >= top_size:
+            return
+
+        remaining = suffix_members[j_start]
+        first_size = max(depth + 1, min_size)
+        if remaining < first_size - depth:
+            if instr is not None:
+                instr.prune('slot_bound', depth)
+            return
+        open_size = min(top_size, depth + remaining)
+        while open_size >= first_size and state['cost'] + fill_cost[j_start][open_size - depth] > max_cost:
+            open_size -= 1
+        if open_size < first_size:
+            if instr is not None:
+                instr.prune('cost_bound', depth, multiplicity * space(remaining, depth, first_size, top_size))
+            return
+        if instr is not None:
+            instr.advance(multiplicity * space(remaining, depth, open_size + 1, top_size))
+        if calc.region_upper_bound(counts, j_start, open_size - depth, region_suffix, max_regions_per_unit) < min_regions:
+            if instr is not None:
+                instr.prune('region_bound', depth, multiplicity * space(remaining, depth, first_size, open_size))
+            return
+
+        for j in range(j_start, class_count):
+            members = classes[j]
+            for c in range(1, min(len(members), open_size - depth) + 1):
+                ways = comb(len(members), c)
+                prev_cost = state['cost']
+                state['cost'] = prev_cost + cheapest_cost[j][c]
+                for t in class_traits[j]:
+                    counts[t] = counts.get(t, 0) + c
+                picks.append((j, c))
+                if state['cost'] <= max_cost:
+                    backtrack(j + 1, depth + c, open_size, multiplicity * ways)
+                elif instr is not None:
+                    instr.prune('cost_bound', depth + c,
+                                multiplicity * ways * space(suffix_members[j + 1], depth + c, first_size, open_size))
+                picks.pop()
+                for t in class_traits[j]:
+                    counts[t] -= c
+                    if counts[t] == 0:
+                        del counts[t]
+                state['cost'] = prev_cost
+
+    backtrack(0, initial_depth, max_size, 1)
+    found.sort(key=lambda entry: (entry[0], entry[1]))
+    all_combos.extend(combo for _depth, _key, combo in found)
+    return all_combos
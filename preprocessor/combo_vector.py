@@ -0,0 +1,106 @@
+from math import comb
+
+import numpy as np
+
+# Boards unranked and evaluated at once; bounds the working arrays to a few tens of MB
+VECTOR_CHUNK_SIZE = 1 << 18
+
+def _binomial_table(n, k):
+    """table[v, i] = C(v, i) for v <= n, i <= k; every column is non-decreasing in v"""
+    return np.array([[comb(v, i) for i in range(k + 1)] for v in range(n + 1)], dtype=np.int64)
+
+def unrank_combinations(ranks, n, k, binomials):
+    """Index rows of the k-subsets of range(n) with the given lexicographic ranks.
+
+    The lexicographic rank L of c_0 < ... < c_{k-1} is C(n, k) - 1 - N, with
+    N the combinatorial-number-system rank of d_i = n - 1 - c_{k-1-i}; N is
+    unranked greedily from the largest d down, one searchsorted per column.
+    """
+    rest = comb(n, k) - 1 - np.asarray(ranks, dtype=np.int64)
+    rows = np.empty((len(rest), k), dtype=np.intp)
+    for i in range(k, 0, -1):
+        d = np.searchsorted(binomials[:, i], rest, side='right') - 1
+        rows[:, k - i] = n - 1 - d
+        rest -= binomials[d, i]
+    return rows
+
+def vector_search_for_size(calc, team_size, candidates, max_cost, required_units=None, min_regions=4, results=None,
+                           instr=None, chunk_size=VECTOR_CHUNK_SIZE):
+    """Brute-force search for teams of exactly `team_size` units, vectorized with NumPy.
+
+    Every choice of the free slots is visited in lexicographic candidate
+    order, `chunk_size` boards at a time: ranks are unranked into index
+    rows, costs come from a cost vector and trait counts from a units x
+    traits incidence matrix, a lookup table maps each count to its active
+    threshold, and boards within the budget that activate enough target
+    regions survive. There is no pruning, so it suits moderate pools where
+    the per-node overhead of the DFS dominates.
+
+    Emits the same combos in the same order as the DFS engine.
+    """
+    all_combos = results if results is not None else []
+    initial_depth = len(required_units) if required_units else 0
+    slots = team_size - initial_depth
+    if slots < 0:
+        return all_combos
+
+    chosen = []
+    for unit in required_units or []:
+        if unit in candidates and unit not in chosen:
+            chosen.append(unit)
+    base_cost = sum(int(calc.units_costs.get(u, 0)) for u in chosen)
+    pool = [u for u in candidates if u not in chosen]
+    if base_cost > max_cost or len(pool) < slots:
+        return all_combos
+
+    traits = list(calc.trait_thresholds)
+    incidence = np.array([[1 if t in calc.unit_traits.get(u, []) else 0 for t in traits] for u in pool],
+                         dtype=np.int16).reshape(len(pool), len(traits))
+    base_counts = np.array([sum(1 for u in chosen if t in calc.unit_traits.get(u, [])) for t in traits],
+                           dtype=np.int16)
+    unit_costs = np.array([int(calc.units_costs.get(u, 0)) for u in pool], dtype=np.int64)
+    # levels[t, count]: highest threshold of trait t reached by count units, 0 when inactive
+    max_count = len(chosen) + slots
+    levels = np.zeros((len(traits), max_count + 1), dtype=np.int16)
+    for j, trait in enumerate(traits):
+        for count in range(max_count + 1):
+            levels[j, count] = max([th for th in calc.trait_thresholds[trait] if th <= count], default=0)
+    region_mask = np.array([t in calc.target_regions for t in traits], dtype=bool)
+    trait_rows = np.arange(len(traits))
+
+    total = comb(len(pool), slots)
+    binomials = _binomial_table(len(pool), slots)
+    if instr is not None:
+        instr.add_space(total)
+    for start in range(0, total, chunk_size):
+        ranks = np.arange(start, min(start + chunk_size, total), dtype=np.int64)
+        rows = unrank_combinations(ranks, len(pool), slots, binomials)
+        if instr is not None:
+            instr.nodes += len(rows)
+            instr.leaves += len(rows)
+            instr.advance(len(rows))
+        costs = base_cost + unit_costs[rows].sum(axis=1)
+        affordable = costs <= max_cost
+        if instr is not None:
+            instr.prune('cost_bound', initial_depth, count=int((~affordable).sum()))
+        rows, costs = rows[affordable], costs[affordable]
+        counts = np.broadcast_to(base_counts, (len(rows), len(traits))).copy()
+        for i in range(slots):
+            counts += incidence[rows[:, i]]
+        active = levels[trait_rows, counts]
+        keep = (active[:, region_mask] > 0).sum(axis=1) >= min_regions
+        keep &= (active > 0).any(axis=1)
+        if instr is not None:
+            instr.prune('region_bound', initial_depth, count=int((~keep).sum()))
+        for row, cost, row_levels in zip(rows[keep].tolist(), costs[keep].tolist(), active[keep].tolist()):
+            activated = {trait: level for trait, level in zip(traits, row_levels) if level}
+            if instr is not None:
+                instr.result()
+            all_combos.append({
+                'units': chosen + [pool[i] for i in row],
+                'trait_count': len(activated),
+                'activated_traits': sorted(list(activated.keys())),
+                'total_cost': cost,
+                'activated_details': activated
+            })
+    return all_combos
@@ -0,0 +1,162 @@
+import hashlib
+import json
+import os
+
+from preprocessor.search_constraints import SearchConstraints
+from utils.combo_stream import ComboFileReader, write_combo_jsonl
+
+# Directory of the cached runs
+RESULT_CACHE_DIR = 'var/result_cache'
+# Runs kept before the least recently used ones are dropped
+RESULT_CACHE_ENTRIES = 32
+
+def search_params(start_units, max_units, max_cost, required_units=None, min_regions=4, dominance='prune', pareto=False,
+                  emblems=0, constraints=None):
+    """Normalized parameters of a search: only what changes its results, in a canonical form.
+
+    The strategy, the subproblem cache and the 'prune' and 'off' dominance
+    modes all return the same results, so they are left out; required
+    units are a set, in the order they were given.
+    """
+    return {
+        'start_units': start_units,
+        'max_units': max_units,
+        'max_cost': max_cost,
+        'required_units': list(dict.fromkeys(required_units or [])),
+        'min_regions': min_regions,
+        'dominance': dominance if dominance == 'drop' else None,
+        'pareto': bool(pareto),
+        'emblems': emblems,
+        'constraints': constraints.describe() if constraints else None,
+    }
+
+def search_order(calc, combos, required_units):
+    """Put combos in the order find_all_valid_combos emits them: team size, then candidate index.
+
+    Every team lists the required units first, in the order they were
+    given, then the others in candidate order.
+    """
+    required = list(dict.fromkeys(required_units or []))
+    required_set = set(required)
+    position = {u: i for i, u in enumerate(calc.candidates)}
+    for combo in combos:
+        combo['units'] = required + sorted((u for u in combo['units'] if u not in required_set), key=position.get)
+    combos.sort(key=lambda combo: (len(combo['units']), [position[u] for u in combo['units'][len(required):]]))
+    return combos
+
+class ResultCache:
+    """Results of earlier searches on disk, reused to answer new queries.
+
+    Each run is stored as JSON Lines in `directory`, keyed by the dataset
+    hash and its normalized search parameters (see `search_params`), and
+    listed in an index.json. A query is answered by the planner (`plan`)
+    from the smallest cached run that covers it: an exact match, or an
+    exhaustive run with looser parameters (a wider size range, a higher
+    budget, a subset of the required units, fewer regions, no constraints
+    or the same ones). Its teams are then filtered down to the query and put
+    back in the order the search would have emitted them.
+
+    Runs with dropped dominated units, Pareto runs and emblem runs are not
+    exhaustive in the same sense, so they only answer identical queries.
+    """
+    def __init__(self, directory=RESULT_CACHE_DIR, max_entries=RESULT_CACHE_ENTRIES):
+        self.directory = str(directory)
+        self.max_entries = max_entries
+        self.index_path = os.path.join(self.directory, 'index.json')
+        self.entries = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path, 'r', encoding='utf8') as f:
+                self.entries = json.load(f)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(dataset, params):
+        payload = json.dumps([dataset, params], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def covers(self, calc, cached, params):
+        """Whether the cached run holds every team of the query with these parameters"""
+        if cached == params:
+            return True
+        if cached['dominance'] or cached['pareto'] or cached['emblems'] or params['pareto'] or params['emblems']:
+            return False
+        if cached['constraints'] is not None and cached['constraints'] != params['constraints']:
+            return False
+        # required units outside the candidates still take a team slot, which filtering cannot tell apart
+        viable = {u for u in calc.candidates if int(calc.units_costs.get(u, 999)) <= params['max_cost']}
+        return (cached['start_units'] <= params['start_units'] and cached['max_units'] >= params['max_units']
+                and cached['max_cost'] >= params['max_cost'] and cached['min_regions'] <= params['min_regions']
+                and set(cached['required_units']) <= set(params['required_units'])
+                and all(u in viable for u in params['required_units']))
+
+    def plan(self, calc, params):
+        """Key of the smallest cached run covering the query, or None when it needs a search"""
+        dataset = calc.dataset_hash()
+        covering = [(entry['count'], key) for key, entry in self.entries.items()
+                    if entry['dataset'] == dataset and self.covers(calc, entry['params'], params)]
+        return min(covering)[1] if covering else None
+
+    def answer(self, calc, params):
+        """The query's results from the cache, in the order of find_all_valid_combos, or None"""
+        key = self.plan(calc, params)
+        if key is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        entry = self.entries[key]
+        self._touch(key)
+        self._write_index()
+        combos = list(ComboFileReader(os.path.join(self.directory, entry['file'])))
+        if entry['params'] == params:
+            print(f"Answered from the cached run {key[:12]}")
+            return combos
+        results = self._narrow(calc, combos, params)
+        print(f"Answered from the cached run {key[:12]}: {len(results)} of its {len(combos)} teams")
+        return results
+
+    def _narrow(self, calc, combos, params):
+        # the teams of a covering run that meet the query
+        required_set = set(params['required_units'])
+        constraints = SearchConstraints.from_description(params['constraints']) if params['constraints'] else None
+        results = []
+        for combo in combos:
+            units = combo['units']
+            if not (params['start_units'] <= len(units) <= params['max_units']) or combo['total_cost'] > params['max_cost']:
+                continue
+            if not required_set.issubset(units):
+                continue
+            if calc.count_activated_target_regions(combo['activated_details']) < params['min_regions']:
+                continue
+            if constraints is not None and not constraints.allows_team(units, calc.units_costs):
+                continue
+            results.append(combo)
+        return search_order(calc, results, params['required_units'])
+
+    def store(self, calc, params, results):
+        """Cache the results of a search, in the order of find_all_valid_combos"""
+        dataset = calc.dataset_hash()
+        key = self.key(dataset, params)
+        os.makedirs(self.directory, exist_ok=True)
+        filename = f"{key}.jsonl"
+        write_combo_jsonl(os.path.join(self.directory, filename), {'search_parameters': params}, results)
+        self.entries[key] = {'dataset': dataset, 'params': params, 'count': len(results), 'file': filename, 'used': 0}
+        self._touch(key)
+        while len(self.entries) > self.max_entries:
+            oldest = min(self.entries, key=lambda k: self.entries[k]['used'])
+            path = os.path.join(self.directory, self.entries.pop(oldest)['file'])
+            if os.path.exists(path):
+                os.remove(path)
+        self._write_index()
+
+    def _touch(self, key):
+        self.entries[key]['used'] = max((entry['used'] for entry in self.entries.values()), default=0) + 1
+
+    def _write_index(self):
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf8') as f:
+            json.dump(self.entries, f, ensure_ascii=False)
+        os.replace(tmp_path, self.index_path)
+
+    def summary(self):
+        return f"{len(self.entries)} runs, {self.hits} hits, {self.misses} misses"
@@ -0,0 +1,84 @@
+import sys
+
+from collections import OrderedDict
+
+# Default memory budget of a subproblem cache (MB)
+CACHE_MB = 256
+# Bookkeeping of one OrderedDict entry on top of its key and value (bytes, approximate)
+ENTRY_OVERHEAD = 100
+
+class SubproblemCache:
+    """Bounded LRU transposition table for the DFS engine.
+
+    A DFS node is decided by its subproblem: the next candidate index, the
+    depth and largest team size still open, the budget left, and the trait
+    counts of the prefix capped at what the goal can still tell apart.
+    Different prefixes often reach the same subproblem, so its outcome is
+    stored once: a dict counting the valid teams below it per team size.
+    Enumeration and histograms only reuse empty outcomes (the teams
+    themselves differ by prefix), which cuts infeasible subtrees after their
+    first visit; counting per size reuses every outcome.
+
+    Entries are evicted least recently used first once the estimated size
+    exceeds `max_mb`. The table is bound to one search `context` (dataset
+    and parameters) and starts over when a search with another one binds it.
+    """
+    def __init__(self, max_mb=CACHE_MB):
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.entries = OrderedDict()
+        self.context = None
+        self.bytes = 0
+        self.key_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def bind(self, context):
+        """Use the table for a search with this context, dropping entries of any other one"""
+        if context != self.context:
+            self.clear()
+            self.context = context
+
+    def clear(self):
+        self.entries.clear()
+        self.context = None
+        self.bytes = 0
+        self.key_bytes = 0
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key, value):
+        if not self.key_bytes:
+            # keys share their shape within a search, so the first one sizes them all
+            self.key_bytes = sys.getsizeof(key) + sum(sys.getsizeof(part) for part in key)
+        size = ENTRY_OVERHEAD + self.key_bytes + sys.getsizeof(value)
+        if isinstance(value, dict) and value:
+            size += len(value) * (sys.getsizeof(next(iter(value))) + sys.getsizeof(0))
+        previous = self.entries.pop(key, None)
+        if previous is not None:
+            self.bytes -= previous[1]
+        self.entries[key] = (value, size)
+        self.bytes += size
+        while self.bytes > self.max_bytes and self.entries:
+            _key, (_value, evicted) = self.entries.popitem(last=False)
+            self.bytes -= evicted
+            self.evictions += 1
+
+    def __len__(self):
+        return len(self.entries)
+
+    def summary(self):
+        return {
+            'entries': len(self.entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'approx_mb': round(self.bytes / (1024 * 1024), 1),
+        }
@@ -0,0 +1,107 @@
+import json
+import os
+import time
+
+# Seconds between two checkpoint writes
+CHECKPOINT_INTERVAL = 60.0
+# Number of top levels of the DFS whose branch index is recorded in the frontier
+FRONTIER_DEPTH = 2
+CHECKPOINT_VERSION = 2
+
+class SearchCheckpoint:
+    """Periodic snapshot of an exhaustive search, so a killed run can resume.
+
+    Two files live next to the output file:
+      <outpath>.ckpt        JSON state: search fingerprint, the frontier
+                            (the DFS path of the next unexplored branch),
+                            and the committed byte offset and count of
+                            the results file
+      <outpath>.ckpt.jsonl  results emitted so far, one combination per line
+
+    Results are appended and fsynced before the state file is atomically
+    replaced, so the state never points past data on disk. Anything written
+    after the last committed offset is truncated on resume. Branches of the
+    DFS are explored in a fixed order, so resuming from the frontier
+    reproduces exactly the remaining results, in the same order.
+    """
+    def __init__(self, outpath, fingerprint, interval=CHECKPOINT_INTERVAL):
+        self.state_path = f"{outpath}.ckpt"
+        self.results_path = f"{outpath}.ckpt.jsonl"
+        self.fingerprint = fingerprint
+        self.interval = interval
+        # frontier of the last committed snapshot
+        self.path = ()
+        self.written = 0
+        self.offset = 0
+        self._next_save = time.monotonic() + interval
+
+    def exists(self):
+        return os.path.exists(self.state_path)
+
+    def load(self, instrumentation=None):
+        """Restore the last snapshot; returns the committed results, or None without a checkpoint"""
+        if not self.exists():
+            return None
+        with open(self.state_path, 'r', encoding='utf8') as f:
+            state = json.load(f)
+        if state.get('version') != CHECKPOINT_VERSION:
+            raise ValueError(f"Unsupported checkpoint version in {self.state_path}")
+        if state['fingerprint'] != self.fingerprint:
+            raise ValueError(f"Checkpoint {self.state_path} was written for different search parameters or data")
+
+        # drop results appended after the last committed snapshot
+        with open(self.results_path, 'r+b') as f:
+            f.truncate(state['offset'])
+        results = []
+        with open(self.results_path, 'r', encoding='utf8') as f:
+            for line in f:
+                results.append(json.loads(line))
+        if len(results) != state['count']:
+            raise ValueError(f"Checkpoint results {self.results_path} hold {len(results)} entries, expected {state['count']}")
+
+        self.path = tuple(state['path'])
+        self.written = state['count']
+        self.offset = state['offset']
+        if instrumentation is not None and state.get('instrumentation'):
+            instrumentation.restore(state['instrumentation'])
+        return results
+
+    def maybe_save(self, path, results, instrumentation=None):
+        if time.monotonic() >= self._next_save:
+            self.save(path, results, instrumentation)
+
+    def save(self, path, results, instrumentation=None):
+        """Commit every result so far; the search continues at branch `path`"""
+        with open(self.results_path, 'ab') as f:
+            for combo in results[self.written:]:
+                f.write((json.dumps(combo, ensure_ascii=False) + '\n').encode('utf8'))
+            f.flush()
+            os.fsync(f.fileno())
+            self.offset = f.tell()
+        self.written = len(results)
+        self.path = tuple(path)
+
+        state = {
+            'version': CHECKPOINT_VERSION,
+            'fingerprint': self.fingerprint,
+            'path': list(path),
+            'offset': self.offset,
+            'count': self.written,
+            'instrumentation': instrumentation.state() if instrumentation is not None else None,
+        }
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf8') as f:
+            json.dump(state, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.state_path)
+        self._next_save = time.monotonic() + self.interval
+
+    def clear(self):
+        """Remove the checkpoint files, e.g. once the final output is written"""
+        for path in [self.state_path, self.results_path, f"{self.state_path}.tmp"]:
+            if os.path.exists(path):
+                os.remove(path)
+        self.path = ()
+        self.written = 0
+        self.offset = 0
@@ -0,0 +1,157 @@
+class SearchConstraints:
+    """Restrictions on the teams a search may build, beyond the required units.
+
+    - `excluded`: units that may not be picked at all.
+    - `at_most_one`: groups of units of which a team holds at most one.
+    - `tier_caps`: unit cost -> most units of that cost a team may hold.
+    - `owned` and `max_unowned`: the units on the bench, and how many units
+      from outside it a team may hold (0 builds from the bench only).
+
+    Restrictions that rule a unit out on its own shrink the candidate list
+    before the search (see `filter_candidates`); the others are compiled
+    into bitmasks over the candidate indices (see `compile`) and checked
+    as each unit is added.
+    """
+    def __init__(self, excluded=(), at_most_one=(), tier_caps=None, owned=None, max_unowned=None):
+        self.excluded = set(excluded)
+        self.at_most_one = [list(group) for group in at_most_one if len(set(group)) > 1]
+        self.tier_caps = {int(cost): int(cap) for cost, cap in (tier_caps or {}).items()}
+        self.owned = set(owned) if owned is not None else None
+        self.max_unowned = max_unowned if self.owned is not None else None
+
+    def __bool__(self):
+        return bool(self.excluded or self.at_most_one or self.tier_caps or self.max_unowned is not None)
+
+    @property
+    def node_checks(self):
+        # whether teams are checked as they grow, rather than only through the candidate list
+        return bool(self.at_most_one or any(self.tier_caps.values()) or self.max_unowned)
+
+    def filter_candidates(self, candidates, units_costs):
+        """Candidates that some team may still hold: not excluded, not in a tier capped at 0, owned when no unowned unit fits"""
+        kept = []
+        for unit in candidates:
+            if unit in self.excluded or self.tier_caps.get(int(units_costs.get(unit, 0))) == 0:
+                continue
+            if self.max_unowned == 0 and unit not in self.owned:
+                continue
+            kept.append(unit)
+        return kept
+
+    def check_required(self, required_units, units_costs):
+        """Raise a ValueError when the required units alone break a constraint"""
+        required = list(dict.fromkeys(required_units or []))
+        broken = [u for u in required if u in self.excluded]
+        if broken:
+            raise ValueError(f"Required units are excluded: {broken}")
+        for group in self.at_most_one:
+            held = [u for u in required if u in group]
+            if len(held) > 1:
+                raise ValueError(f"Required units {held} are in the same at-most-one group")
+        for cost, cap in self.tier_caps.items():
+            held = [u for u in required if int(units_costs.get(u, 0)) == cost]
+            if len(held) > cap:
+                raise ValueError(f"Required units {held} exceed the cap of {cap} units costing {cost}")
+        if self.max_unowned is not None:
+            held = [u for u in required if u not in self.owned]
+            if len(held) > self.max_unowned:
+                raise ValueError(f"Required units {held} exceed the cap of {self.max_unowned} unowned units")
+
+    def allows_team(self, units, units_costs):
+        """Whether a finished team keeps every constraint"""
+        if any(u in self.excluded for u in units):
+            return False
+        if any(sum(1 for u in units if u in group) > 1 for group in self.at_most_one):
+            return False
+        for cost, cap in self.tier_caps.items():
+            if sum(1 for u in units if int(units_costs.get(u, 0)) == cost) > cap:
+                return False
+        if self.max_unowned is not None and sum(1 for u in units if u not in self.owned) > self.max_unowned:
+            return False
+        return True
+
+    def compile(self, candidates, units_costs):
+        return CompiledConstraints(self, candidates, units_costs)
+
+    @classmethod
+    def from_description(cls, description):
+        return cls(description['excluded'], description['at_most_one'], description['tier_caps'], description['owned'],
+                   description['max_unowned'])
+
+    def describe(self):
+        """JSON-friendly form for checkpoint fingerprints and the output's search parameters"""
+        return {
+            'excluded': sorted(self.excluded),
+            'at_most_one': [sorted(group) for group in self.at_most_one],
+            'tier_caps': {str(cost): cap for cost, cap in sorted(self.tier_caps.items())},
+            'owned': sorted(self.owned) if self.owned is not None else None,
+            'max_unowned': self.max_unowned,
+        }
+
+class CompiledConstraints:
+    """The constraints of a SearchConstraints as bitmasks over a candidate list.
+
+    Bit i of a team mask stands for candidates[i]. Per candidate, `conflicts`
+    holds the other members of its at-most-one groups and `tier_mask` the
+    candidates of its cost when that cost is capped; `unowned_mask` holds
+    every candidate off the bench. `allows(mask, i)` then decides in a few
+    integer operations whether candidates[i] may join the team.
+    """
+    def __init__(self, constraints, candidates, units_costs):
+        bit = {u: 1 << i for i, u in enumerate(candidates)}
+        n = len(candidates)
+        self.group_masks = []
+        self.conflicts = [0] * n
+        for group in constraints.at_most_one:
+            mask = 0
+            for unit in group:
+                mask |= bit.get(unit, 0)
+            if mask & (mask - 1):
+                self.group_masks.append(mask)
+                for i in range(n):
+                    if mask & (1 << i):
+                        self.conflicts[i] |= mask & ~(1 << i)
+        tier_masks = {}
+        for i, unit in enumerate(candidates):
+            cost = int(units_costs.get(unit, 0))
+            if cost in constraints.tier_caps:
+                tier_masks[cost] = tier_masks.get(cost, 0) | (1 << i)
+        self.tier_list = sorted(tier_masks.items())
+        self.tier_mask = [0] * n
+        self.tier_cap = [None] * n
+        for cost, mask in self.tier_list:
+            for i in range(n):
+                if mask & (1 << i):
+                    self.tier_mask[i] = mask
+                    self.tier_cap[i] = constraints.tier_caps[cost]
+        self.max_unowned = constraints.max_unowned
+        self.unowned_mask = 0
+        if self.max_unowned is not None:
+            for unit in candidates:
+                if unit not in constraints.owned:
+                    self.unowned_mask |= bit[unit]
+
+    def team_mask(self, units, candidates):
+        index = {u: i for i, u in enumerate(candidates)}
+        mask = 0
+        for unit in units:
+            if unit in index:
+                mask |= 1 << index[unit]
+        return mask
+
+    def allows(self, mask, i):
+        """Whether candidates[i] may join the team with this mask"""
+        if mask & self.conflicts[i]:
+            return False
+        cap = self.tier_cap[i]
+        if cap is not None and (mask & self.tier_mask[i]).bit_count() >= cap:
+            return False
+        if self.unowned_mask >> i & 1 and (mask & self.unowned_mask).bit_count() >= self.max_unowned:
+            return False
+        return True
+
+    def signature(self, mask):
+        """What the constraints remember of a team: used groups, units per capped tier, unowned units"""
+        return (tuple(bool(mask & group) for group in self.group_masks),
+                tuple((mask & tier).bit_count() for _cost, tier in self.tier_list),
+                (mask & self.unowned_mask).bit_count())
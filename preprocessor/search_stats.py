@@ -0,0 +1,186 @@
+import sys
+import time
+
+from collections import Counter
+from datetime import datetime
+from math import comb
+
+# Progress callbacks are invoked at most this often (seconds)
+PROGRESS_INTERVAL = 1.0
+# Nodes expanded between two clock checks
+PROGRESS_CHECK_NODES = 4096
+
+class SearchInstrumentation:
+    """Counters and progress reporting for a combination search.
+
+    Engines report every node expanded, prune (by reason), leaf evaluated
+    and result emitted, with the depth of the node. Progress is measured
+    over the combinatorial search space: a node that may still pick
+    `slots` units out of `remaining` candidates stands for
+    C(remaining, slots) leaves, and the engine calls `advance` with that
+    weight whenever such a subtree is pruned or skipped, so `done / total`
+    is the exact fraction of the space already decided. The ETA
+    extrapolates the elapsed time over the remaining fraction.
+
+    `callback(instrumentation)` is called at most every `interval` seconds
+    during the search and once more from `finish`.
+    """
+    def __init__(self, callback=None, interval=PROGRESS_INTERVAL):
+        self.callback = callback
+        self.interval = interval
+        self.reset()
+
+    def reset(self):
+        self.nodes = 0
+        self.leaves = 0
+        self.results = 0
+        self.pruned = Counter()
+        self.depth_nodes = Counter()
+        self.depth_pruned = Counter()
+        self.done = 0
+        self.total = 0
+        self.phase = ''
+        self.started = time.perf_counter()
+        self.finished = False
+        self._next_check = PROGRESS_CHECK_NODES
+        self._next_report = self.started + self.interval
+
+    @staticmethod
+    def subtree_size(remaining, slots):
+        """Leaves below a node choosing `slots` of `remaining` candidates"""
+        if slots < 0 or remaining < slots:
+            return 0
+        return comb(remaining, slots)
+
+    def add_space(self, weight):
+        """Grow the search space, e.g. once per team size searched"""
+        self.total += weight
+
+    def set_phase(self, phase):
+        self.phase = phase
+
+    def node(self, depth):
+        self.nodes += 1
+        self.depth_nodes[depth] += 1
+        if self.nodes >= self._next_check:
+            self._next_check = self.nodes + PROGRESS_CHECK_NODES
+            if self.callback is not None and time.perf_counter() >= self._next_report:
+                self.report()
+
+    def leaf(self):
+        self.leaves += 1
+        self.done += 1
+
+    def result(self):
+        self.results += 1
+
+    def prune(self, reason, depth, weight=0, count=1):
+        self.pruned[reason] += count
+        self.depth_pruned[depth] += count
+        self.done += weight
+
+    def advance(self, weight):
+        self.done += weight
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def fraction(self):
+        if self.finished:
+            return 1.0
+        return self.done / self.total if self.total else 0.0
+
+    def eta(self):
+        """Estimated seconds until the search completes, or None before any progress"""
+        fraction = self.fraction
+        if fraction <= 0:
+            return None
+        return self.elapsed * (1 - fraction) / fraction
+
+    def report(self):
+        self._next_report = time.perf_counter() + self.interval
+        if self.callback is not None:
+            self.callback(self)
+
+    def finish(self):
+        self.finished = True
+        self.report()
+
+    def state(self):
+        """Counters and progress as plain data, restorable with `restore`"""
+        return {
+            'nodes': self.nodes,
+            'leaves': self.leaves,
+            'results': self.results,
+            'pruned': dict(self.pruned),
+            'depth_nodes': list(self.depth_nodes.items()),
+            'depth_pruned': list(self.depth_pruned.items()),
+            'done': self.done,
+            'elapsed': self.elapsed,
+        }
+
+    def restore(self, state):
+        """Continue counting from a saved state, e.g. when a search is resumed"""
+        self.nodes = state['nodes']
+        self.leaves = state['leaves']
+        self.results = state['results']
+        self.pruned = Counter(state['pruned'])
+        self.depth_nodes = Counter(dict(state['depth_nodes']))
+        self.depth_pruned = Counter(dict(state['depth_pruned']))
+        self.done = state['done']
+        self.started = time.perf_counter() - state['elapsed']
+        self._next_check = self.nodes + PROGRESS_CHECK_NODES
+
+    def summary(self):
+        """Plain dict of every counter, for logs and benchmark records"""
+        return {
+            'nodes': self.nodes,
+            'pruned': sum(self.pruned.values()),
+            'pruned_by_reason': dict(sorted(self.pruned.items())),
+            'leaves': self.leaves,
+            'results': self.results,
+            'depth_nodes': {str(d): n for d, n in sorted(self.depth_nodes.items())},
+            'depth_pruned': {str(d): n for d, n in sorted(self.depth_pruned.items())},
+            'elapsed': round(self.elapsed, 3),
+        }
+
+def format_duration(seconds):
+    if seconds is None:
+        return '--:--:--'
+    seconds = int(seconds)
+    return f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+def format_count(value):
+    for limit, suffix in [(1e9, 'G'), (1e6, 'M'), (1e3, 'k')]:
+        if value >= limit:
+            return f"{value / limit:.1f}{suffix}"
+    return str(value)
+
+def progress_line(instr):
+    pruned = sum(instr.pruned.values())
+    return (f"{instr.fraction * 100:5.1f}%  nodes {format_count(instr.nodes)}  "
+            f"pruned {format_count(pruned)}  leaves {format_count(instr.leaves)}  "
+            f"results {format_count(instr.results)}  elapsed {format_duration(instr.elapsed)}  "
+            f"ETA {format_duration(0 if instr.finished else instr.eta())}")
+
+def progress_bar(stream=None, width=30):
+    """Callback redrawing a single-line progress bar (on stderr by default)"""
+    def callback(instr):
+        out = stream or sys.stderr
+        filled = int(instr.fraction * width)
+        phase = f"{instr.phase} " if instr.phase else ''
+        out.write(f"\r{phase}[{'#' * filled}{'.' * (width - filled)}] {progress_line(instr)}")
+        if instr.finished:
+            out.write('\n')
+        out.flush()
+    return callback
+
+def progress_log(path):
+    """Callback appending one timestamped progress line per report to a log file"""
+    def callback(instr):
+        phase = f" [{instr.phase}]" if instr.phase else ''
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(f"{datetime.now().isoformat(timespec='seconds')}{phase} {progress_line(instr)}\n")
+    return callback
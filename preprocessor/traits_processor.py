@@ -3,9 +3,13 @@ import re
 
 from bs4 import BeautifulSoup
 from collections import defaultdict, Counter
-from itertools import combinations
+from itertools import combinations, product
+from math import comb
 
 from preprocessor import units_processor
+from preprocessor.combo_beam import BEAM_TIME_LIMIT, anytime_search
+from preprocessor.combo_symmetry import trait_signature_classes
+from preprocessor.search_stats import SearchInstrumentation
 from utils import file_processor
 
 def parse_tft_origins(html_file) -> (dict, dict, dict):
@@ -81,7 +85,34 @@ def parse_tft_origins(html_file) -> (dict, dict, dict):
 
     return traits_dict, units_traits_dict, cost_units_dict
 
-def traits_tracker(traits_data, cost_data, max_combinations=10, combo_size=8):
+def greedy_start(all_units, unit_to_traits, combo_size):
+    """Team of combo_size units, each adding the most traits not covered yet (earliest unit on ties);
+    None when no unit adds a new trait before the team is full"""
+    selected = []
+    covered_traits = set()
+    available_units = all_units.copy()
+    
+    while len(selected) < combo_size and available_units:
+        best_unit = max(available_units, 
+                      key=lambda u: len(unit_to_traits[u] - covered_traits), 
+                      default=None)
+        if not best_unit or len(unit_to_traits[best_unit] - covered_traits) == 0:
+            break
+        selected.append(best_unit)
+        covered_traits.update(unit_to_traits[best_unit])
+        available_units.remove(best_unit)
+    
+    return selected[:combo_size] if len(selected) >= combo_size else None
+
+def traits_tracker(traits_data, cost_data, max_combinations=10, combo_size=8, instrumentation=None, symmetry=False,
+                   approximate=False, time_limit=BEAM_TIME_LIMIT):
+    # instrumentation: optional SearchInstrumentation receiving the search counters and progress
+    # symmetry: search over classes of units with identical traits and expand them into teams on output;
+    #           finds the same kind of teams faster, but the first max_combinations found can differ
+    # approximate: instead of the exhaustive search, look for the teams with the most active traits (then the
+    #              cheapest) for time_limit seconds with a beam search and local search, and report the gap to
+    #              an upper bound on the active traits
+    instr = instrumentation if instrumentation is not None else SearchInstrumentation()
     valid_traits = {trait: info for trait, info in traits_data.items() if len(info["units"]) > 1}
     unit_costs = {unit: int(cost) for cost, units in cost_data.items() for unit in units}
     
@@ -102,34 +133,20 @@ def traits_tracker(traits_data, cost_data, max_combinations=10, combo_size=8):
         activated = {trait for trait, count in trait_counts.items() if count >= min_activations[trait]}
         return len(activated), activated
 
-    def greedy_start():
-        selected = []
-        covered_traits = set()
-        available_units = all_units.copy()
-        
-        while len(selected) < combo_size and available_units:
-            best_unit = max(available_units, 
-                          key=lambda u: len(unit_to_traits[u] - covered_traits), 
-                          default=None)
-            if not best_unit or len(unit_to_traits[best_unit] - covered_traits) == 0:
-                break
-            selected.append(best_unit)
-            covered_traits.update(unit_to_traits[best_unit])
-            available_units.remove(best_unit)
-        
-        return selected[:combo_size] if len(selected) >= combo_size else None
-
     def build_combinations():
         results = []
-        initial_combo = greedy_start()
+        initial_combo = greedy_start(all_units, unit_to_traits, combo_size)
         if not initial_combo:
             return results
 
         # Use generator to produce combinations one by one
         def generate_combinations(index, current_combo, current_traits):
+            instr.node(len(current_combo))
             if len(current_combo) == combo_size:
+                instr.leaf()
                 trait_count, activated_traits = count_traits(current_combo)
                 if trait_count >= 8:
+                    instr.result()
                     total_cost = sum(unit_costs[u] for u in current_combo)
                     yield {
                         "units": current_combo[:],
@@ -143,6 +160,7 @@ def traits_tracker(traits_data, cost_data, max_combinations=10, combo_size=8):
             remaining_slots = combo_size - len(current_combo)
             potential_traits = len(set().union(*(unit_to_traits[all_units[i]] for i in range(index, len(all_units)))) - current_traits)
             if len(current_traits) + potential_traits < 8:
+                instr.prune('trait_bound', len(current_combo), instr.subtree_size(len(all_units) - index, remaining_slots))
                 return
 
             for i in range(index, len(all_units)):
@@ -154,15 +172,120 @@ def traits_tracker(traits_data, cost_data, max_combinations=10, combo_size=8):
                 if len(results) >= max_combinations:
                     break
 
+        # Units with identical traits are interchangeable apart from cost: pick (class, count) pairs
+        if symmetry:
+            classes = trait_signature_classes(all_units, lambda u: unit_to_traits[u])
+            position = {unit: i for i, unit in enumerate(all_units)}
+            suffix_members = [0] * (len(classes) + 1)
+            suffix_traits = [set() for _ in range(len(classes) + 1)]
+            for j in range(len(classes) - 1, -1, -1):
+                suffix_members[j] = suffix_members[j + 1] + len(classes[j])
+                suffix_traits[j] = suffix_traits[j + 1] | unit_to_traits[classes[j][0]]
+            picks = []
+
+        def generate_class_combinations(j_start, depth, current_traits, trait_counts, multiplicity):
+            instr.node(depth)
+            if depth == combo_size:
+                instr.leaf()
+                instr.advance(multiplicity - 1)
+                activated_traits = {trait for trait, count in trait_counts.items() if count >= min_activations[trait]}
+                if len(activated_traits) >= 8:
+                    for choice in product(*(combinations(classes[j], c) for j, c in picks)):
+                        units = sorted((u for group in choice for u in group), key=position.get)
+                        instr.result()
+                        yield {
+                            "units": units,
+                            "trait_count": len(activated_traits),
+                            "activated_traits": sorted(activated_traits),
+                            "total_cost": sum(unit_costs[u] for u in units)
+                        }
+                return
+
+            remaining_slots = combo_size - depth
+            potential_traits = len(suffix_traits[j_start] - current_traits)
+            if len(current_traits) + potential_traits < 8:
+                instr.prune('trait_bound', depth, multiplicity * instr.subtree_size(suffix_members[j_start], remaining_slots))
+                return
+
+            for j in range(j_start, len(classes)):
+                class_traits = unit_to_traits[classes[j][0]]
+                for c in range(1, min(len(classes[j]), remaining_slots) + 1):
+                    counts = dict(trait_counts)
+                    for trait in class_traits:
+                        counts[trait] = counts.get(trait, 0) + c
+                    picks.append((j, c))
+                    yield from generate_class_combinations(j + 1, depth + c, current_traits | class_traits, counts,
+                                                           multiplicity * comb(len(classes[j]), c))
+                    picks.pop()
+                    if len(results) >= max_combinations:
+                        return
+
         # Collect results
-        for combo in generate_combinations(0, [], set()):
+        instr.add_space(instr.subtree_size(len(all_units), combo_size))
+        if symmetry:
+            generator = generate_class_combinations(0, 0, set(), {}, 1)
+        else:
+            generator = generate_combinations(0, [], set())
+        for combo in generator:
             results.append(combo)
             if len(results) >= max_combinations:
                 break
         
         return sorted(results, key=lambda x: (x["total_cost"], -x["trait_count"]))
 
-    results = build_combinations()
+    def trait_upper_bound():
+        # active traits reachable with combo_size units: activate the cheapest traits first, within the
+        # trait slots combo_size units hold at most
+        needs = sorted(need for trait, need in min_activations.items()
+                       if need <= combo_size and need <= len(valid_traits[trait]["units"]))
+        budget = combo_size * max((len(unit_to_traits[u]) for u in all_units), default=0)
+        activated = 0
+        for need in needs:
+            if need > budget:
+                break
+            budget -= need
+            activated += 1
+        return activated
+
+    def approximate_combinations():
+        position = {unit: i for i, unit in enumerate(all_units)}
+        max_total = sum(unit_costs.values()) + 1
+
+        def score(team):
+            trait_count, _activated = count_traits([all_units[i] for i in team])
+            return -trait_count + sum(unit_costs[all_units[i]] for i in team) / max_total
+
+        def evaluate(team):
+            units = [all_units[i] for i in team]
+            trait_count, _activated = count_traits(units)
+            if trait_count < 8:
+                return None
+            return (-trait_count, sum(unit_costs[u] for u in units), team)
+
+        initial_combo = greedy_start(all_units, unit_to_traits, combo_size)
+        seeds = [[position[u] for u in initial_combo]] if initial_combo else []
+        instr.add_space(instr.subtree_size(len(all_units), combo_size))
+        found = anytime_search(len(all_units), combo_size, combo_size, evaluate, score, max_combinations, seeds,
+                               time_limit, instr=instr)
+        results = []
+        for _rank, team in found:
+            units = [all_units[i] for i in team]
+            trait_count, activated_traits = count_traits(units)
+            instr.result()
+            results.append({
+                "units": units,
+                "trait_count": trait_count,
+                "activated_traits": sorted(activated_traits),
+                "total_cost": sum(unit_costs[u] for u in units)
+            })
+        upper_bound = trait_upper_bound()
+        best_traits = max((combo["trait_count"] for combo in results), default=0)
+        print(f"Approximate search: best {best_traits} active traits, upper bound {upper_bound} "
+              f"(gap {upper_bound - best_traits})")
+        return sorted(results, key=lambda x: (x["total_cost"], -x["trait_count"]))
+
+    results = approximate_combinations() if approximate else build_combinations()
+    instr.finish()
 
     print(f"Found {len(results)} combinations with {combo_size} units activating 8 or more traits")
     if results:
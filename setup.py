@@ -10,6 +10,7 @@ setup(name="fantastic-carnival",
 		packages=find_packages(),
 		install_requires=[
 			"beautifulsoup4>=4.13.3,<4.14.0",
+            "numpy >= 2.0, < 3.0",
             "PyYaml >= 6.0, < 7.0",
 		],
 		entry_points={
@@ -0,0 +1,200 @@
+import contextlib
+import io
+import json
+
+from collections import Counter
+from itertools import combinations, combinations_with_replacement
+
+import pytest
+
+from bench import fixtures
+from preprocessor.combo_calculator import TraitComboCalculatorOptimized
+from preprocessor.result_cache import ResultCache, search_params
+from preprocessor.search_cache import SubproblemCache
+from preprocessor.search_checkpoint import SearchCheckpoint
+from preprocessor.search_constraints import SearchConstraints
+from utils.combo_index import read_combo_header
+
+def make_calculator(tmp_path, traits, costs, target_regions):
+    traits_path = tmp_path / 'traits.json'
+    costs_path = tmp_path / 'costs.json'
+    traits_path.write_text(json.dumps(traits), encoding='utf-8')
+    costs_path.write_text(json.dumps(costs), encoding='utf-8')
+    with contextlib.redirect_stdout(io.StringIO()):
+        return TraitComboCalculatorOptimized(traits_path, costs_path, target_regions)
+
+def s14_calculator():
+    with contextlib.redirect_stdout(io.StringIO()):
+        return TraitComboCalculatorOptimized(fixtures.S14_TRAITS, fixtures.S14_COSTS, fixtures.S14_ORIGINS)
+
+def best_team(calc, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        combos = calc.find_all_valid_combos(**kwargs)
+    best = min(combos, key=lambda combo: combo['total_cost'])
+    return sorted(best['units']), best['total_cost']
+
+@pytest.mark.parametrize('required_units', [None, ['A']])
+def test_drop_keeps_the_cheapest_team(tmp_path, required_units):
+    # every unit dominates the ones after it, but a full team can hold all of a unit's cheaper dominators
+    traits = {'Region': {'units': ['A', 'B', 'C', 'D'], 'activations': {'3': ''}}}
+    costs = {'A': 1, 'B': 1, 'C': 1, 'D': 5}
+    calc = make_calculator(tmp_path, traits, costs, ['Region'])
+    params = dict(max_units=3, max_cost=20, start_units=3, required_units=required_units, min_regions=1)
+    expected = best_team(calc, dominance='off', **params)
+    assert expected == (['A', 'B', 'C'], 3)
+    assert best_team(calc, dominance='prune', **params) == expected
+    assert best_team(calc, dominance='drop', **params) == expected
+
+def test_constrained_drop_is_recorded_as_exhaustive(tmp_path):
+    # tier caps are checked per node, so dominance is off and the run keeps every valid team
+    calc = s14_calculator()
+    constraints = SearchConstraints(tier_caps={1: 3})
+    cache = ResultCache(tmp_path / 'cache')
+    params = dict(start_units=4, max_units=5, max_cost=12, required_units=['Poppy', 'Jax'], min_regions=2,
+                  constraints=constraints, result_cache=cache)
+    with contextlib.redirect_stdout(io.StringIO()):
+        dropped = calc.run_and_save_all(outpath=str(tmp_path / 'drop.json'), dominance='drop', **params)
+        exhaustive = calc.run_and_save_all(outpath=str(tmp_path / 'prune.json'), dominance='prune', **params)
+    assert 'dominance' not in read_combo_header(str(tmp_path / 'drop.json'))['search_parameters']
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert exhaustive == dropped
+
+def test_resumed_run_matches_an_uninterrupted_one(tmp_path, monkeypatch):
+    calc = s14_calculator()
+    params = dict(start_units=4, max_units=5, max_cost=12, required_units=['Poppy', 'Jax'], min_regions=2)
+    with contextlib.redirect_stdout(io.StringIO()):
+        calc.run_and_save_all(outpath=str(tmp_path / 'full.json'), **params)
+
+    save = SearchCheckpoint.save
+    saves = []
+    def interrupting_save(checkpoint, path, results, instrumentation=None):
+        save(checkpoint, path, results, instrumentation)
+        saves.append(len(results))
+        if len(saves) == 20:
+            raise KeyboardInterrupt
+    monkeypatch.setattr(SearchCheckpoint, 'save', interrupting_save)
+    outpath = str(tmp_path / 'resumed.json')
+    with contextlib.redirect_stdout(io.StringIO()):
+        with pytest.raises(KeyboardInterrupt):
+            calc.run_and_save_all(outpath=outpath, checkpoint_interval=0, **params)
+    assert 0 < saves[-1] < read_combo_header(str(tmp_path / 'full.json'))['total_combinations_found']
+    monkeypatch.setattr(SearchCheckpoint, 'save', save)
+
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        calc.run_and_save_all(outpath=outpath, checkpoint_interval=0, resume=True, **params)
+    assert f"{saves[-1]} results so far" in out.getvalue()
+    assert (tmp_path / 'resumed.json').read_bytes() == (tmp_path / 'full.json').read_bytes()
+    assert not (tmp_path / 'resumed.json.ckpt').exists()
+
+@pytest.mark.parametrize('max_mb', [16, 0.001])
+def test_cached_enumeration_matches_the_uncached_one(max_mb):
+    # the tiny table evicts all the time; the second search with the same table reuses its entries
+    calc = s14_calculator()
+    params = dict(start_units=3, max_units=4, max_cost=8, required_units=['Poppy'], min_regions=0)
+    cache = SubproblemCache(max_mb=max_mb)
+    with contextlib.redirect_stdout(io.StringIO()):
+        expected = calc.find_all_valid_combos(dominance='off', **params)
+        assert calc.find_all_valid_combos(dominance='off', cache=cache, **params) == expected
+        assert calc.find_all_valid_combos(dominance='off', cache=cache, **params) == expected
+        assert calc.find_all_valid_combos(dominance='prune', cache=cache, **params) == expected
+    if max_mb < 1:
+        assert cache.evictions > 0
+    else:
+        assert cache.hits > 0
+
+@pytest.mark.parametrize('dominance', ['off', 'prune'])
+def test_count_and_histogram_match_the_enumeration(dominance):
+    calc = s14_calculator()
+    params = dict(start_units=3, max_units=4, max_cost=8, required_units=['Poppy'], min_regions=1)
+    with contextlib.redirect_stdout(io.StringIO()):
+        combos = calc.find_all_valid_combos(dominance=dominance, **params)
+        counts = calc.count_valid_combos(dominance=dominance, **params)
+        histogram = calc.histogram_valid_combos(dominance=dominance, **params)
+    assert combos
+    assert counts == {size: sum(len(c['units']) == size for c in combos) for size in range(3, 5)}
+    assert sum(counts.values()) == len(combos)
+    expected = Counter((len(c['units']), c['total_cost'], c['trait_count'],
+                        calc.count_activated_target_regions(c['activated_details'])) for c in combos)
+    assert {bucket: int(histogram[bucket]) for bucket in zip(*histogram.nonzero())} == expected
+
+def brute_force_emblem_teams(calc, emblems, start_units, max_units, max_cost, required_units, min_regions):
+    # every team within the budget where some placement of at most `emblems` emblems on target regions,
+    # each on a unit without the region, activates min_regions of them
+    regions = [region for region in calc.target_regions if region in calc.trait_thresholds]
+    pool = [u for u in calc.candidates if u not in required_units and int(calc.units_costs[u]) <= max_cost]
+    teams = set()
+    for size in range(start_units, max_units + 1):
+        for others in combinations(pool, size - len(required_units)):
+            team = required_units + list(others)
+            if sum(int(calc.units_costs[u]) for u in team) > max_cost:
+                continue
+            counts = Counter(trait for u in team for trait in calc.unit_traits.get(u, []))
+            for used in range(emblems + 1):
+                for placed in combinations_with_replacement(regions, used):
+                    extra = Counter(placed)
+                    if any(counts[region] + extra[region] > size for region in extra):
+                        continue
+                    active = sum(counts[region] + extra[region] >= calc.trait_thresholds[region][0] for region in regions)
+                    if active >= min_regions:
+                        teams.add(tuple(sorted(team)))
+                        break
+                else:
+                    continue
+                break
+    return teams
+
+@pytest.mark.parametrize('emblems', [1, 2])
+def test_emblem_search_matches_brute_force(emblems):
+    calc = s14_calculator()
+    params = dict(start_units=3, max_units=4, max_cost=12, required_units=['Poppy', 'Jax'], min_regions=3)
+    with contextlib.redirect_stdout(io.StringIO()):
+        combos = calc.find_all_valid_combos(dominance='off', emblems=emblems, **params)
+        without = calc.find_all_valid_combos(dominance='off', **params)
+    expected = brute_force_emblem_teams(calc, emblems, **params)
+    assert len(expected) > len(without)
+    assert {tuple(sorted(combo['units'])) for combo in combos} == expected
+    for combo in combos:
+        assert sum(combo['emblems'].values()) <= emblems
+        assert calc.count_activated_target_regions(combo['activated_details']) >= params['min_regions']
+
+def test_result_cache_narrows_a_covering_run(tmp_path):
+    calc = s14_calculator()
+    cache = ResultCache(tmp_path / 'cache')
+    broad = dict(start_units=3, max_units=4, max_cost=8, required_units=['Poppy'], min_regions=0)
+    narrow = dict(start_units=4, max_units=4, max_cost=7, required_units=['Jax', 'Poppy'], min_regions=1)
+    with contextlib.redirect_stdout(io.StringIO()):
+        cache.store(calc, search_params(**broad), calc.find_all_valid_combos(**broad))
+        expected = calc.find_all_valid_combos(**narrow)
+        answered = cache.answer(calc, search_params(**narrow))
+    assert expected
+    assert answered == expected
+
+    # the smallest covering run answers the query
+    with contextlib.redirect_stdout(io.StringIO()):
+        cache.store(calc, search_params(**narrow), expected)
+    assert cache.plan(calc, search_params(**narrow)) == cache.key(calc.dataset_hash(), search_params(**narrow))
+    assert cache.plan(calc, search_params(**dict(narrow, max_cost=6))) == cache.key(calc.dataset_hash(), search_params(**narrow))
+
+    for looser in [dict(max_cost=9), dict(max_units=5), dict(start_units=2), dict(required_units=None)]:
+        assert cache.plan(calc, search_params(**dict(broad, **looser))) is None
+    assert cache.plan(calc, search_params(**dict(narrow, min_regions=0))) == cache.key(calc.dataset_hash(), search_params(**broad))
+    for other in [dict(pareto=True), dict(emblems=1)]:
+        assert cache.plan(calc, search_params(**dict(narrow, **other))) is None
+
+    # constraints are checked on the cached teams
+    constrained = dict(broad, start_units=4, constraints=SearchConstraints(tier_caps={1: 2}))
+    with contextlib.redirect_stdout(io.StringIO()):
+        expected = calc.find_all_valid_combos(**constrained)
+        answered = cache.answer(calc, search_params(**constrained))
+    assert expected
+    assert answered == expected
+    assert (cache.hits, cache.misses) == (2, 0)
+
+    # a run without its dominated units only answers the identical query
+    dropped = ResultCache(tmp_path / 'dropped')
+    with contextlib.redirect_stdout(io.StringIO()):
+        dropped.store(calc, search_params(dominance='drop', **broad), calc.find_all_valid_combos(dominance='drop', **broad))
+    assert dropped.plan(calc, search_params(**narrow)) is None
+    assert dropped.plan(calc, search_params(dominance='drop', **narrow)) is None
+    assert dropped.plan(calc, search_params(dominance='drop', **broad)) is not None
@@ -0,0 +1,260 @@
+import contextlib
+import io
+import random
+import shutil
+import sys
+from collections import Counter
+
+import pytest
+
+from bench import fixtures
+from checker import combo_checker
+from checker.combo_checker import ComboChecker
+from preprocessor.combo_calculator import TraitComboCalculatorOptimized
+from utils.combo_index import load_combo_index
+from utils.combo_stream import ComboFileReader, write_combo_json, write_combo_jsonl
+
+SEARCH = dict(start_units=4, max_units=5, max_cost=12, required_units=['Poppy', 'Jax'], min_regions=2)
+
+@pytest.fixture(scope='module')
+def saved_combos(tmp_path_factory):
+    """Path of a JSON combo file written by the search on the s14 fixtures"""
+    path = tmp_path_factory.mktemp('combos') / 'combos.json'
+    with contextlib.redirect_stdout(io.StringIO()):
+        calc = TraitComboCalculatorOptimized(fixtures.S14_TRAITS, fixtures.S14_COSTS, fixtures.S14_ORIGINS)
+        calc.run_and_save_all(outpath=str(path), **SEARCH)
+    return path
+
+@pytest.fixture
+def checker(tmp_path, monkeypatch):
+    """Checker reading the s14 fixtures from var/ under a temporary working directory"""
+    (tmp_path / 'var').mkdir()
+    shutil.copy(fixtures.S14_TRAITS, tmp_path / 'var' / 'traits_units_activations.json')
+    shutil.copy(fixtures.S14_COSTS, tmp_path / 'var' / 'units_cost.json')
+    monkeypatch.chdir(tmp_path)
+    with contextlib.redirect_stdout(io.StringIO()):
+        return ComboChecker()
+
+def read_combos(path):
+    reader = ComboFileReader(path)
+    combos = list(reader)
+    return dict(reader.header), combos
+
+def scan(checker, path, **options):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return checker.scan_combo_file(path, **options)
+
+def test_malformed_records_are_reported_and_skipped(checker, saved_combos, tmp_path):
+    header, combos = read_combos(saved_combos)
+    malformed = [3, 10, 11]
+    del combos[3]['units']
+    del combos[10]['total_cost']
+    combos[11] = ['not', 'a', 'combination']
+    path = str(tmp_path / 'malformed.jsonl')
+    write_combo_jsonl(path, header, combos)
+    clean_path = str(tmp_path / 'clean.jsonl')
+    write_combo_jsonl(clean_path, header, [combo for i, combo in enumerate(combos) if i not in malformed])
+
+    result = scan(checker, path)
+    clean = scan(checker, clean_path)
+    assert result['count'] == len(combos)
+    assert result['skipped'] == len(malformed)
+    assert (result['valid_count'], result['invalid_count']) == (len(combos) - len(malformed), len(malformed))
+    assert result['errors'] == [(3, "Missing field 'units'"), (10, "Missing field 'total_cost'"),
+                                (11, "Combination is a list, not an object")]
+    assert vars(result['statistics']) == vars(clean['statistics'])
+    for name in ['cost', 'traits', 'regions']:
+        assert result['best'].ranked(name) == clean['best'].ranked(name)
+    with contextlib.redirect_stdout(io.StringIO()) as out:
+        assert not checker.report_validation(result)
+        checker.report_statistics(result)
+    assert "Combo 4: Missing field 'units'" in out.getvalue()
+    assert "Skipped 3 malformed combinations" in out.getvalue()
+
+def test_checks_the_regions_the_search_targeted(checker, saved_combos, tmp_path):
+    header, combos = read_combos(saved_combos)
+    assert header['search_parameters']['target_regions'] == fixtures.S14_ORIGINS
+    result = scan(checker, saved_combos)
+    assert (result['valid_count'], result['invalid_count']) == (len(combos), 0)
+    assert set(result['statistics'].region_counts) <= set(fixtures.S14_ORIGINS)
+    assert sum(result['statistics'].region_counts.values()) >= 2 * len(combos)
+
+    # files without target_regions are checked against the default regions, none of them s14 origins
+    del header['search_parameters']['target_regions']
+    legacy_path = str(tmp_path / 'legacy.jsonl')
+    write_combo_jsonl(legacy_path, header, combos)
+    result = scan(checker, legacy_path)
+    assert (result['valid_count'], result['invalid_count']) == (0, len(combos))
+
+def corruptions(checker):
+    """Functions breaking one combo in place, each in a way one of the checks catches"""
+    def set_field(field, value):
+        return lambda combo: combo.__setitem__(field, value)
+
+    def shift_threshold(combo):
+        trait = next(iter(combo['activated_details']))
+        combo['activated_details'][trait] += 1
+
+    def drop_trait(combo):
+        trait = combo['activated_traits'].pop()
+        del combo['activated_details'][trait]
+        combo['trait_count'] -= 1
+
+    def extra_trait(combo):
+        trait = next(t for t in checker.trait_thresholds if t not in combo['activated_details'])
+        combo['activated_details'][trait] = checker.trait_thresholds[trait][0]
+        combo['activated_traits'].append(trait)
+        combo['trait_count'] += 1
+
+    def swap_unit(combo):
+        unit = next(u for u in checker.units_costs if u not in combo['units'])
+        combo['units'][-1] = unit
+
+    return [
+        set_field('total_cost', 999),
+        lambda combo: combo.__setitem__('total_cost', combo['total_cost'] + 1),
+        lambda combo: combo.__setitem__('trait_count', combo['trait_count'] + 1),
+        lambda combo: combo['units'].append(combo['units'][-1]),
+        lambda combo: combo['units'].append('Nobody'),
+        lambda combo: combo['units'].remove('Jax'),
+        lambda combo: combo['activated_traits'].reverse(),
+        lambda combo: combo['activated_traits'].append('Nothing'),
+        lambda combo: combo.__setitem__('activated_details', {t: True for t in combo['activated_details']}),
+        lambda combo: combo.__setitem__('activated_details', dict(combo['activated_details'], Nothing=1)),
+        lambda combo: combo.__setitem__('units', combo['units'][:2]),
+        lambda combo: combo.__setitem__('emblems', {'Bastion': 1}),
+        lambda combo: combo.__setitem__('emblems', {}),
+        lambda combo: combo.pop('activated_details'),
+        set_field('units', 'Poppy'),
+        set_field('total_cost', '7'),
+        shift_threshold,
+        drop_trait,
+        extra_trait,
+        swap_unit,
+    ]
+
+def test_batch_mask_agrees_with_single_validation(checker, saved_combos):
+    header, combos = read_combos(saved_combos)
+    search_params = header['search_parameters']
+    rng = random.Random(0)
+    breaks = corruptions(checker)
+    for i, combo in enumerate(combos[:400]):
+        breaks[i % len(breaks)](combo)
+    rng.shuffle(combos)
+    mask = checker._batch_valid_mask(combos, search_params)
+    expected = [checker.validate_single_combo(combo, search_params)[0] for combo in combos]
+    assert mask.tolist() == expected
+    assert sum(expected) < len(combos) - 300
+    # a tighter budget and another region goal invalidate combos the search found
+    for params in [dict(search_params, max_cost=8), dict(search_params, min_regions=3),
+                   dict(search_params, required_units=['Poppy', 'Jax', 'Zyra'])]:
+        mask = checker._batch_valid_mask(combos, params)
+        assert mask.tolist() == [checker.validate_single_combo(combo, params)[0] for combo in combos]
+
+def test_statistics_and_best_match_a_direct_computation(checker, saved_combos, monkeypatch):
+    monkeypatch.setattr('checker.combo_checker.BATCH_CHUNK_SIZE', 500)
+    _header, combos = read_combos(saved_combos)
+    result = scan(checker, saved_combos)
+    stats = result['statistics']
+    costs = [combo['total_cost'] for combo in combos]
+    trait_counts = [combo['trait_count'] for combo in combos]
+    assert (stats.count, stats.cost_min, stats.cost_max, stats.cost_sum) == (len(combos), min(costs), max(costs), sum(costs))
+    assert (stats.trait_count_min, stats.trait_count_max, stats.trait_count_sum) == (min(trait_counts), max(trait_counts),
+                                                                                    sum(trait_counts))
+    assert stats.size_distribution == Counter(len(combo['units']) for combo in combos)
+    assert stats.trait_frequency == Counter(trait for combo in combos for trait in combo['activated_traits'])
+    assert stats.region_counts == Counter(trait for combo in combos for trait in combo['activated_traits']
+                                          if trait in fixtures.S14_ORIGINS)
+
+    def regions(combo):
+        return sum(1 for trait in combo['activated_traits'] if trait in fixtures.S14_ORIGINS)
+
+    best = result['best']
+    assert best.ranked('cost') == sorted(combos, key=lambda c: (c['total_cost'], -c['trait_count']))[:5]
+    assert best.ranked('traits') == sorted(combos, key=lambda c: (-c['trait_count'], c['total_cost']))[:5]
+    assert best.ranked('regions') == sorted(combos, key=lambda c: (-regions(c), c['total_cost']))[:5]
+
+def test_inspect_seeks_through_the_index(checker, saved_combos, tmp_path):
+    _header, combos = read_combos(saved_combos)
+    path = tmp_path / 'inspect.json'
+    shutil.copy(saved_combos, path)
+    assert load_combo_index(path) is None
+    for ordinal in [len(combos) - 1, 0, len(combos) // 2]:
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            checker.inspect_combo(ordinal, path)
+        assert f"Units: {combos[ordinal]['units']}" in out.getvalue()
+        assert "This combination is VALID" in out.getvalue()
+    assert len(load_combo_index(path)) == len(combos)
+
+def broken_copy(saved_combos):
+    """Header and combos of the saved search, with a few invalid and malformed records"""
+    header, combos = read_combos(saved_combos)
+    for i in [5, 700, 1500, 1501]:
+        combos[i]['total_cost'] += 1
+    del combos[900]['units']
+    return header, combos
+
+def same_scan(result, expected):
+    for key in ['count', 'valid_count', 'invalid_count', 'error_count', 'skipped', 'errors', 'validated', 'missing_keys']:
+        assert result[key] == expected[key], key
+    assert result['header']['total_combinations_found'] == expected['header']['total_combinations_found']
+    assert vars(result['statistics']) == vars(expected['statistics'])
+    for name in ['cost', 'traits', 'regions']:
+        assert result['best'].ranked(name) == expected['best'].ranked(name)
+
+@pytest.mark.parametrize('workers', [1, 3])
+def test_split_file_matches_a_single_pass(checker, saved_combos, tmp_path, monkeypatch, workers):
+    monkeypatch.setattr('checker.combo_checker.BATCH_CHUNK_SIZE', 256)
+    header, combos = broken_copy(saved_combos)
+    path = str(tmp_path / 'broken.json')
+    write_combo_json(path, header, combos)
+    expected = scan(checker, path)
+    assert expected['invalid_count'] == 5
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = checker.scan_combo_files([path], workers=workers)
+    same_scan(result, expected)
+
+def test_shards_match_a_single_pass(checker, saved_combos, tmp_path):
+    header, combos = broken_copy(saved_combos)
+    path = str(tmp_path / 'whole.json')
+    write_combo_json(path, header, combos)
+    shards = []
+    for i, (start, end) in enumerate([(0, 800), (800, 801), (801, len(combos))]):
+        # JSON and JSON Lines shards mixed
+        shard = str(tmp_path / (f'shard{i}.jsonl' if i % 2 else f'shard{i}.json'))
+        writer = write_combo_jsonl if i % 2 else write_combo_json
+        writer(shard, dict(header, total_combinations_found=end - start), combos[start:end])
+        shards.append(shard)
+    expected = scan(checker, path)
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = checker.scan_combo_files(shards, workers=2)
+    same_scan(result, expected)
+
+def test_workers_print_the_same_report(checker, saved_combos, tmp_path, monkeypatch):
+    header, combos = broken_copy(saved_combos)
+    path = str(tmp_path / 'broken.json')
+    write_combo_json(path, header, combos)
+
+    def report(*args):
+        monkeypatch.setattr(sys, 'argv', ['combo_checker.py', *args])
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            combo_checker.main()
+        return [line for line in out.getvalue().splitlines() if not line.startswith(('Peak memory', 'Building'))]
+
+    single = report(path)
+    assert "  Invalid combinations: 5" in single
+    assert report('--workers', '2', path) == single
+    assert report('stats', '--workers', '3', path) == report('stats', path)
+    assert report('best', '--workers', '3', path) == report('best', path)
+
+def test_diff_reports_the_changed_teams(checker, saved_combos, tmp_path):
+    header, combos = broken_copy(saved_combos)
+    path = str(tmp_path / 'broken.jsonl')
+    write_combo_jsonl(path, header, combos[100:])
+    with contextlib.redirect_stdout(io.StringIO()) as out:
+        assert checker.diff_combo_files(saved_combos, saved_combos)
+        assert not checker.diff_combo_files(saved_combos, path)
+    report = out.getvalue()
+    # combo 5 is among the first 100 left out of B, and combo 900 lost its units
+    assert "  Changed: 3" in report and "  Missing from B (only in A): 101" in report
+    assert "  Extra in B (only in B): 1" in report
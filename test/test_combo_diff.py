@@ -0,0 +1,49 @@
+import pytest
+
+from checker.combo_diff import diff_combo_files
+from utils.combo_stream import write_combo_json, write_combo_jsonl
+
+UNITS = ['Alistar', 'Jax', 'Poppy', 'Sylas', 'Vi', 'Zyra', "Kai'Sa", 'Nüñu']
+
+def team(i):
+    return {'units': [UNITS[j] for j in range(len(UNITS)) if i >> j & 1], 'total_cost': bin(i).count('1'),
+            'trait_count': i % 4, 'activated_traits': ['Bastion', 'Vanguard'][:i % 3]}
+
+@pytest.fixture
+def pair(tmp_path):
+    combos_a = [team(i) for i in range(1, 120)]
+    # B: drops 10 teams, changes 7, adds 5, lists units and traits in another order, and repeats one team
+    combos_b = [dict(combo, units=combo['units'][::-1], activated_traits=combo['activated_traits'][::-1])
+                for combo in combos_a[10:]]
+    for combo in combos_b[:7]:
+        combo['total_cost'] += 1
+    combos_b += [team(i) for i in range(200, 205)]
+    combos_b.append(dict(combos_b[50]))
+    path_a, path_b = str(tmp_path / 'a.json'), str(tmp_path / 'b.jsonl')
+    write_combo_json(path_a, {'search_parameters': {'max_cost': 20}}, combos_a)
+    write_combo_jsonl(path_b, {'search_parameters': {'max_cost': 30}}, combos_b[::-1])
+    return path_a, path_b, combos_a, combos_b
+
+@pytest.mark.parametrize('run_size', [1, 16, 1 << 20])
+def test_diff_counts(pair, run_size):
+    path_a, path_b, combos_a, combos_b = pair
+    result = diff_combo_files(path_a, path_b, max_examples=3, run_size=run_size)
+    assert (result['count_a'], result['count_b']) == (len(combos_a), len(combos_b))
+    assert (result['common'], result['unchanged'], result['changed']) == (109, 102, 7)
+    assert (result['missing'], result['extra']) == (10, 6)
+    assert (result['duplicates_a'], result['duplicates_b']) == (0, 1)
+    assert result['header_b'] == {'search_parameters': {'max_cost': 30}}
+    assert len(result['missing_examples']) == 3
+    for ordinal_a, combo_a, ordinal_b, combo_b in result['missing_examples']:
+        assert ordinal_b is None and combo_b is None and combo_a == combos_a[ordinal_a] and ordinal_a < 10
+    for ordinal_a, combo_a, ordinal_b, combo_b in result['changed_examples']:
+        assert sorted(combo_a['units']) == sorted(combo_b['units'])
+        assert combo_b['total_cost'] == combo_a['total_cost'] + 1
+
+def test_identical_files(pair, tmp_path):
+    path_a, _path_b, combos_a, _combos_b = pair
+    copy = str(tmp_path / 'copy.jsonl')
+    write_combo_jsonl(copy, {}, combos_a[::-1])
+    result = diff_combo_files(path_a, copy, run_size=8)
+    assert (result['common'], result['unchanged'], result['changed'], result['missing'], result['extra']) == \
+        (len(combos_a), len(combos_a), 0, 0, 0)
@@ -0,0 +1,44 @@
+import pytest
+
+from utils import file_processor
+from utils.combo_index import build_combo_index, load_combo_index, read_combo_at, read_combo_header, write_combo_index
+from utils.combo_stream import write_combo_json, write_combo_jsonl
+
+HEADER = {'search_parameters': {'max_cost': 20, 'required_units': ["Kai'Sa"], 'constraints': None}, 'total_combinations_found': 2}
+COMBOS = [{'units': ["Kai'Sa", 'Nüñu'], 'total_cost': 7, 'activated_details': {'Ionia': {'count': 2}}}, {'units': []}]
+
+@pytest.mark.parametrize('combos', [COMBOS, []])
+@pytest.mark.parametrize('filename', ['combos.json', 'combos.jsonl'])
+def test_recorded_offsets_match_a_scan(tmp_path, filename, combos):
+    path = str(tmp_path / filename)
+    writer = write_combo_jsonl if filename.endswith('.jsonl') else write_combo_json
+    offsets, lengths = writer(path, HEADER, combos)
+    if not filename.endswith('.jsonl'):
+        # same bytes as the plain JSON writer
+        reference = str(tmp_path / 'reference.json')
+        file_processor.write_json(reference, dict(HEADER, combinations=combos))
+        assert (tmp_path / filename).read_bytes() == (tmp_path / 'reference.json').read_bytes()
+    build_combo_index(path)
+    assert load_combo_index(path).tolist() == [[offset, length] for offset, length in zip(offsets, lengths)]
+
+@pytest.mark.parametrize('filename', ['combos.json', 'combos.jsonl'])
+def test_index_seeks_to_every_record(tmp_path, filename):
+    path = str(tmp_path / filename)
+    combos = [dict(COMBOS[0], total_cost=cost, units=["Kai'Sa"] * (cost % 3)) for cost in range(50)]
+    writer = write_combo_jsonl if filename.endswith('.jsonl') else write_combo_json
+    offsets, lengths = writer(path, HEADER, combos)
+    write_combo_index(path, offsets, lengths)
+    index = load_combo_index(path)
+    assert len(index) == len(combos)
+    assert [read_combo_at(path, index, ordinal) for ordinal in reversed(range(len(combos)))] == combos[::-1]
+    assert read_combo_header(path) == HEADER
+
+def test_stale_index_is_not_loaded(tmp_path):
+    path = tmp_path / 'combos.json'
+    offsets, lengths = write_combo_json(str(path), HEADER, COMBOS)
+    write_combo_index(str(path), offsets, lengths)
+    assert load_combo_index(str(path)) is not None
+    write_combo_json(str(path), HEADER, COMBOS[::-1] + COMBOS)
+    assert load_combo_index(str(path)) is None
+    (tmp_path / 'other.json').write_bytes(b'')
+    assert load_combo_index(str(tmp_path / 'other.json')) is None
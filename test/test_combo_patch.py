@@ -0,0 +1,34 @@
+import contextlib
+import io
+import json
+
+import pytest
+
+from bench import fixtures
+from preprocessor.combo_calculator import TraitComboCalculatorOptimized
+from preprocessor.search_constraints import SearchConstraints
+
+SEARCH = dict(start_units=5, max_units=6, max_cost=20, required_units=['Jax', 'Poppy'], min_regions=3)
+
+def make_calculator(tmp_path, name, costs):
+    traits_path = fixtures.S14_TRAITS
+    costs_path = tmp_path / f'{name}_costs.json'
+    costs_path.write_text(json.dumps(costs), encoding='utf-8')
+    with contextlib.redirect_stdout(io.StringIO()):
+        return TraitComboCalculatorOptimized(traits_path, costs_path, fixtures.S14_ORIGINS)
+
+@pytest.mark.parametrize('unit, cost', [('Zyra', 2), ('Darius', 1)])
+@pytest.mark.parametrize('tier_caps', [None, {1: 3}])
+def test_patch_matches_a_fresh_search(tmp_path, unit, cost, tier_caps):
+    costs = json.loads(fixtures.S14_COSTS.read_text(encoding='utf-8'))
+    assert int(costs[unit]) != cost
+    patched_costs = dict(costs, **{unit: cost})
+    old_calc = make_calculator(tmp_path, 'old', costs)
+    new_calc = make_calculator(tmp_path, 'new', patched_costs)
+    constraints = SearchConstraints(tier_caps=tier_caps) if tier_caps else None
+    saved = str(tmp_path / 'patched.json')
+    with contextlib.redirect_stdout(io.StringIO()):
+        old_calc.run_and_save_all(outpath=saved, constraints=constraints, **SEARCH)
+        patched = new_calc.run_and_save_all(outpath=saved, constraints=constraints, patch_from=old_calc, **SEARCH)
+        fresh = new_calc.run_and_save_all(outpath=str(tmp_path / 'fresh.json'), constraints=constraints, **SEARCH)
+    assert patched == fresh
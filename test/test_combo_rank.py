@@ -0,0 +1,84 @@
+import random
+from itertools import combinations
+
+import numpy as np
+import pytest
+
+from checker.combo_diff import diff_combo_files
+from utils.combo_rank import ComboRankCodec, contains, difference, intersection, union
+from utils.combo_stream import write_combo_jsonl
+
+UNITS = [f'Unit {i:02d}' for i in range(12)]
+
+def random_boards(rng, count, max_size=6):
+    return [rng.sample(UNITS, rng.randint(0, max_size)) for _ in range(count)]
+
+def test_ranks_are_dense_and_round_trip():
+    codec = ComboRankCodec(UNITS, max_size=4)
+    boards = [list(board) for k in range(5) for board in combinations(UNITS, k)]
+    ranks = [codec.encode(board) for board in boards]
+    assert sorted(ranks) == list(range(len(boards)))
+    assert codec.decode_many(np.array(ranks, dtype=np.uint64)) == boards
+    assert codec.encode_many(reversed(boards)).tolist() == list(range(len(boards)))
+
+def test_encode_rejects_boards_outside_the_codec():
+    codec = ComboRankCodec(UNITS, max_size=3)
+    with pytest.raises(ValueError):
+        codec.encode(UNITS[:4])
+    with pytest.raises(ValueError):
+        codec.encode([UNITS[0], UNITS[0]])
+    with pytest.raises(ValueError):
+        codec.encode_many([[UNITS[1], UNITS[1]]])
+
+def test_set_operations_match_python_sets():
+    rng = random.Random(7)
+    codec = ComboRankCodec(UNITS)
+    boards_a = random_boards(rng, 300)
+    boards_b = random_boards(rng, 300)
+    set_a = {frozenset(board) for board in boards_a}
+    set_b = {frozenset(board) for board in boards_b}
+    ranks_a = codec.encode_many(boards_a)
+    ranks_b = codec.encode_many(boards_b)
+    assert len(ranks_a) == len(set_a)
+
+    def as_sets(ranks):
+        return {frozenset(board) for board in codec.decode_many(ranks)}
+
+    assert as_sets(union(ranks_a, ranks_b)) == set_a | set_b
+    assert as_sets(intersection(ranks_a, ranks_b)) == set_a & set_b
+    assert as_sets(difference(ranks_a, ranks_b)) == set_a - set_b
+    assert contains(ranks_a, ranks_b).tolist() == [frozenset(board) in set_a for board in codec.decode_many(ranks_b)]
+
+@pytest.mark.parametrize('n', [63, 64])
+def test_every_board_of_a_full_pool_fits(n):
+    units = {f'Unit {i:02d}': 1 + i % 5 for i in range(n)}
+    codec = ComboRankCodec.from_costs(units)
+    everyone = sorted(units)
+    assert codec.encode(everyone) == 2 ** n - 1
+    assert codec.decode(2 ** n - 1) == everyone
+    assert codec.encode([]) == 0
+    boards = [everyone, everyone[:1], everyone[-1:], everyone[::2], everyone[1::3]]
+    assert codec.decode_many(codec.encode_many(boards)) == sorted(boards, key=codec.encode)
+
+def test_too_many_units_raise_value_error():
+    units = {f'Unit {i:02d}': 1 for i in range(65)}
+    with pytest.raises(ValueError):
+        ComboRankCodec.from_costs(units)
+    assert ComboRankCodec.from_costs(units, max_size=10).max_size == 10
+
+def test_ranked_diff_matches_hashed_diff(tmp_path):
+    rng = random.Random(3)
+    codec = ComboRankCodec(UNITS, max_size=4)
+    boards = {tuple(sorted(board)) for board in random_boards(rng, 200)}
+    combos_a = [{'units': list(board), 'total_cost': len(board)} for board in sorted(boards)]
+    combos_b = [dict(combo) for combo in combos_a[20:]] + [{'units': [UNITS[0], UNITS[0]], 'total_cost': 2}]
+    for combo in combos_b[:10]:
+        combo['total_cost'] += 1
+    path_a, path_b = str(tmp_path / 'a.jsonl'), str(tmp_path / 'b.jsonl')
+    write_combo_jsonl(path_a, {}, combos_a)
+    write_combo_jsonl(path_b, {}, combos_b[::-1])
+    ranked = diff_combo_files(path_a, path_b, codec=codec)
+    hashed = diff_combo_files(path_a, path_b)
+    counts = ['common', 'unchanged', 'changed', 'missing', 'extra', 'duplicates_a', 'duplicates_b']
+    assert [ranked[key] for key in counts] == [hashed[key] for key in counts]
+    assert (ranked['changed'], ranked['missing'], ranked['extra']) == (10, 20, 1)
@@ -0,0 +1,44 @@
+import json
+
+import pytest
+
+from utils import combo_stream
+from utils.combo_stream import ComboFileReader, write_combo_json, write_combo_jsonl
+
+HEADER = {'search_parameters': {'max_cost': 20, 'required_units': ['Poppy']}, 'total_combinations_found': 3}
+COMBOS = [
+    {'units': ['Poppy', 'Jax'], 'total_cost': 2, 'activated_traits': ['Bastion'], 'activated_details': {'Bastion': 2}},
+    {'units': ['Poppy', "Kai'Sa", 'Nüñu'], 'total_cost': 8.5, 'note': 'ünïcode "quoted" \\ text'},
+    {'units': [], 'total_cost': 0, 'nested': {'empty': [], 'list': [1, [2, {}]]}},
+]
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 1 << 20])
+@pytest.mark.parametrize('filename', ['combos.json', 'combos.jsonl'])
+def test_reader_matches_a_full_parse(tmp_path, monkeypatch, filename, chunk_size):
+    monkeypatch.setattr(combo_stream, 'READ_CHUNK_SIZE', chunk_size)
+    path = tmp_path / filename
+    writer = write_combo_jsonl if filename.endswith('.jsonl') else write_combo_json
+    writer(str(path), HEADER, COMBOS)
+    reader = ComboFileReader(path)
+    records = list(reader.iter_records())
+    assert [combo for _offset, _length, combo in records] == COMBOS
+    assert reader.header == HEADER
+    assert reader.has_combinations and reader.count == len(COMBOS)
+    data = path.read_bytes()
+    for offset, length, combo in records:
+        assert json.loads(data[offset:offset + length]) == combo
+
+def test_header_after_the_combinations(tmp_path):
+    path = tmp_path / 'late.json'
+    path.write_text(json.dumps({'combinations': COMBOS, 'search_parameters': {'max_cost': 20}}, indent=4,
+                               ensure_ascii=False), encoding='utf-8')
+    reader = ComboFileReader(path)
+    assert list(reader) == COMBOS
+    assert reader.header == {'search_parameters': {'max_cost': 20}}
+
+def test_truncated_file_raises(tmp_path):
+    path = tmp_path / 'truncated.json'
+    write_combo_json(str(path), HEADER, COMBOS)
+    path.write_bytes(path.read_bytes()[:-40])
+    with pytest.raises(json.JSONDecodeError):
+        list(ComboFileReader(path))
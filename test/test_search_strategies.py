@@ -0,0 +1,98 @@
+import contextlib
+import io
+
+import pytest
+
+from bench import fixtures
+from preprocessor.combo_calculator import STRATEGIES, TraitComboCalculatorOptimized
+from preprocessor.combo_score import BoardScore
+
+CASES = [
+    dict(max_units=6, max_cost=25, start_units=5, required_units=['Poppy', 'Jax'], min_regions=4),
+    dict(max_units=5, max_cost=20, start_units=2, required_units=['Xin Zhao', 'Poppy'], min_regions=2),
+    dict(max_units=3, max_cost=8, start_units=1, required_units=None, min_regions=1),
+]
+
+@pytest.fixture(scope='module')
+def calc():
+    with contextlib.redirect_stdout(io.StringIO()):
+        return TraitComboCalculatorOptimized(fixtures.S14_TRAITS, fixtures.S14_COSTS, fixtures.S14_ORIGINS)
+
+@pytest.fixture(scope='module')
+def dfs_results(calc):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return [calc.find_all_valid_combos(dominance='off', **case) for case in CASES]
+
+def quiet(method, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return method(**kwargs)
+
+def output_order(combos):
+    # run_and_save_all's order: stable sort of the search output by total cost, then most traits
+    return sorted(combos, key=lambda combo: (combo['total_cost'], -combo['trait_count']))
+
+def region_count(calc, combo):
+    return calc.count_activated_target_regions(combo['activated_details'])
+
+@pytest.mark.parametrize('case', range(len(CASES)))
+@pytest.mark.parametrize('strategy', [s for s in STRATEGIES if s != 'dfs'])
+def test_strategy_matches_dfs(calc, dfs_results, strategy, case):
+    assert dfs_results[case]
+    combos = quiet(calc.find_all_valid_combos, strategy=strategy, jit=False, **CASES[case])
+    assert combos == dfs_results[case]
+
+@pytest.mark.parametrize('case', range(len(CASES)))
+@pytest.mark.parametrize('dominance', ['prune', 'drop'])
+def test_dominance_keeps_the_best_team(calc, dfs_results, dominance, case):
+    combos = quiet(calc.find_all_valid_combos, dominance=dominance, **CASES[case])
+    if dominance == 'prune':
+        assert combos == dfs_results[case]
+    for team_size in range(CASES[case]['start_units'], CASES[case]['max_units'] + 1):
+        expected = [c['total_cost'] for c in dfs_results[case] if len(c['units']) == team_size]
+        got = [c['total_cost'] for c in combos if len(c['units']) == team_size]
+        assert min(got, default=None) == min(expected, default=None)
+
+@pytest.mark.parametrize('case', range(len(CASES)))
+def test_pareto_frontier(calc, dfs_results, case):
+    # first board in output order of every non-dominated (cost, traits, regions) point
+    points = {}
+    for combo in dfs_results[case]:
+        points.setdefault((combo['total_cost'], combo['trait_count'], region_count(calc, combo)), combo)
+    frontier = [combo for point, combo in points.items()
+                if not any(other != point and other[0] <= point[0] and other[1] >= point[1] and other[2] >= point[2]
+                           for other in points)]
+    boards = quiet(calc.find_all_valid_combos, pareto=True, **CASES[case])
+    assert sorted(map(str, boards)) == sorted(map(str, frontier))
+
+@pytest.mark.parametrize('case', range(len(CASES)))
+def test_branch_and_bound_best_boards(calc, dfs_results, case):
+    boards = quiet(calc.find_best_combos, k=5, backend='bnb', **CASES[case])
+    assert boards == output_order(dfs_results[case])[:5]
+
+@pytest.mark.parametrize('case', range(len(CASES)))
+def test_approximate_boards_are_valid(calc, dfs_results, case):
+    boards = quiet(calc.find_approximate_combos, k=3, time_limit=0.5, **CASES[case])
+    assert boards
+    valid = {tuple(sorted(combo['units'])) for combo in dfs_results[case]}
+    assert all(tuple(sorted(board['units'])) in valid for board in boards)
+    best_cost = output_order(dfs_results[case])[0]['total_cost']
+    assert boards[0]['total_cost'] >= best_cost
+    assert calc.approximation['gap'] >= 0
+
+@pytest.mark.parametrize('case', range(len(CASES)))
+@pytest.mark.parametrize('weights', [None, dict(tier_weights={'default': [1, 3, 6]}, cost_penalty=0.3),
+                                     dict(cost_penalty=-0.5)])
+def test_top_scored_boards(calc, dfs_results, case, weights):
+    scoring = BoardScore(calc.trait_thresholds, max_count=CASES[case]['max_units'], **(weights or {}))
+    boards = quiet(calc.find_top_scored_combos, k=5, scoring=scoring, **CASES[case])
+
+    def score(combo):
+        counts = {}
+        for unit in combo['units']:
+            for trait in calc.unit_traits.get(unit, []):
+                counts[trait] = counts.get(trait, 0) + 1
+        return scoring.score(counts, combo['total_cost'])
+
+    expected = sorted(output_order(dfs_results[case]), key=lambda combo: -score(combo))[:5]
+    assert [board['units'] for board in boards] == [combo['units'] for combo in expected]
+    assert [board['score'] for board in boards] == pytest.approx([score(combo) for combo in expected])
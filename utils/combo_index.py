@@ -0,0 +1,67 @@
+import json
+import os
+import struct
+
+from array import array
+
+import numpy as np
+
+from utils.combo_stream import ComboFileReader
+
+# Sidecar layout: magic, source size, source mtime (ns), record count, then
+# one (byte offset, byte length) uint64 pair per combination
+INDEX_MAGIC = b'FCIDX001'
+INDEX_HEADER = struct.Struct('<8sQQQ')
+
+def index_path(combo_file) -> str:
+    return f"{combo_file}.idx"
+
+def write_combo_index(combo_file, offsets, lengths):
+    """Write the offset index sidecar for combo_file"""
+    stat = os.stat(combo_file)
+    entries = np.empty((len(offsets), 2), dtype='<u8')
+    entries[:, 0] = offsets
+    entries[:, 1] = lengths
+    with open(index_path(combo_file), 'wb') as fw:
+        fw.write(INDEX_HEADER.pack(INDEX_MAGIC, stat.st_size, stat.st_mtime_ns, len(offsets)))
+        entries.tofile(fw)
+
+def build_combo_index(combo_file):
+    """Scan combo_file once and write its offset index sidecar"""
+    offsets = array('Q')
+    lengths = array('Q')
+    for offset, length, _combo in ComboFileReader(combo_file).iter_records():
+        offsets.append(offset)
+        lengths.append(length)
+    write_combo_index(combo_file, offsets, lengths)
+
+def load_combo_index(combo_file):
+    """Memory-map the offset index of combo_file, or None if missing or stale"""
+    path = index_path(combo_file)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        header = f.read(INDEX_HEADER.size)
+    if len(header) != INDEX_HEADER.size:
+        return None
+    magic, size, mtime_ns, count = INDEX_HEADER.unpack(header)
+    stat = os.stat(combo_file)
+    if magic != INDEX_MAGIC or size != stat.st_size or mtime_ns != stat.st_mtime_ns:
+        return None
+    if count == 0:
+        return np.empty((0, 2), dtype='<u8')
+    return np.memmap(path, dtype='<u8', mode='r', offset=INDEX_HEADER.size, shape=(count, 2))
+
+def read_combo_at(combo_file, index, ordinal):
+    """Seek to one combination using a loaded index and parse only that record"""
+    offset, length = (int(v) for v in index[ordinal])
+    with open(combo_file, 'rb') as f:
+        f.seek(offset)
+        return json.loads(f.read(length))
+
+def read_combo_header(combo_file):
+    """Header fields preceding the combinations, without reading past the first record"""
+    reader = ComboFileReader(combo_file)
+    for _combo in reader:
+        break
+    return dict(reader.header)
@@ -0,0 +1,113 @@
+from math import comb
+
+import numpy as np
+
+from utils.combo_stream import ComboFileReader
+
+RANK_DTYPE = np.dtype('<u8')
+
+class ComboRankCodec:
+    """Combinatorial number system codec for unit sets of one season.
+
+    Every unit gets an id (its position in sorted `units`) and a board, as
+    a set of ids c_1 < ... < c_k, gets the rank
+
+        offset[k] + C(c_1, 1) + C(c_2, 2) + ... + C(c_k, k)
+
+    where offset[k] counts the boards with fewer than k units. Ranks are
+    dense, unique per unit set and fit one uint64 whenever every board of
+    up to `max_size` units does, so a result set is a sorted uint64 array:
+    8 bytes per board instead of a list of name strings.
+    """
+    def __init__(self, units, max_size=None):
+        self.units = sorted(set(units))
+        self.ids = {unit: i for i, unit in enumerate(self.units)}
+        n = len(self.units)
+        self.max_size = n if max_size is None else min(max_size, n)
+        # offsets[k] for k <= max_size; the total number of boards (offsets[max_size + 1]) is not stored,
+        # since it is 2^64 itself when 64 units fill every rank
+        offsets = [0]
+        for k in range(self.max_size + 1):
+            offsets.append(offsets[-1] + comb(n, k))
+        if offsets[-1] > np.iinfo(RANK_DTYPE).max + 1:
+            raise ValueError(f"Boards of up to {self.max_size} out of {n} units do not fit 64-bit ranks")
+        self.offsets = np.array(offsets[:-1], dtype=RANK_DTYPE)
+        # binomials[c, i] = C(c, i); column i is non-decreasing in c, which decoding searches
+        self.binomials = np.array([[comb(c, i) for i in range(self.max_size + 1)] for c in range(n + 1)],
+                                  dtype=RANK_DTYPE)
+
+    @classmethod
+    def from_costs(cls, units_costs, max_size=None):
+        """Codec over every unit of a unit -> cost mapping (units_costs.json)"""
+        return cls(units_costs.keys(), max_size)
+
+    def encode(self, units) -> int:
+        ids = sorted(self.ids[unit] for unit in units)
+        if len(ids) > self.max_size:
+            raise ValueError(f"Board of {len(ids)} units exceeds the codec size {self.max_size}")
+        if len(set(ids)) != len(ids):
+            raise ValueError(f"Board holds a unit twice: {sorted(units)}")
+        return int(self.offsets[len(ids)]) + sum(comb(c, i) for i, c in enumerate(ids, 1))
+
+    def decode(self, rank):
+        return self.decode_many(np.array([rank], dtype=RANK_DTYPE))[0]
+
+    def encode_many(self, boards):
+        """Sorted, duplicate-free rank array of an iterable of unit lists or combo dicts"""
+        by_size = {}
+        for board in boards:
+            units = board['units'] if isinstance(board, dict) else board
+            by_size.setdefault(len(units), []).append([self.ids[unit] for unit in units])
+        parts = [np.empty(0, dtype=RANK_DTYPE)]
+        for size, rows in by_size.items():
+            if size > self.max_size:
+                raise ValueError(f"Board of {size} units exceeds the codec size {self.max_size}")
+            ids = np.sort(np.array(rows, dtype=np.intp).reshape(len(rows), size), axis=1)
+            if (ids[:, 1:] == ids[:, :-1]).any():
+                raise ValueError("Board holds a unit twice")
+            ranks = np.full(len(rows), self.offsets[size], dtype=RANK_DTYPE)
+            for i in range(size):
+                ranks += self.binomials[ids[:, i], i + 1]
+            parts.append(ranks)
+        return np.unique(np.concatenate(parts))
+
+    def encode_file(self, combo_file):
+        """Rank array of every combination in a saved combo file (JSON or JSON Lines), streamed"""
+        return self.encode_many(ComboFileReader(combo_file))
+
+    def decode_many(self, ranks):
+        """Unit lists (sorted by unit id) of a rank array, in array order"""
+        ranks = np.asarray(ranks, dtype=RANK_DTYPE)
+        sizes = np.searchsorted(self.offsets, ranks, side='right') - 1
+        boards = [None] * len(ranks)
+        for size in np.unique(sizes).tolist():
+            where = np.flatnonzero(sizes == size)
+            rest = ranks[where] - self.offsets[size]
+            ids = np.empty((len(where), size), dtype=np.intp)
+            # greedy from the largest id down: c_i is the largest c with C(c, i) <= rest
+            for i in range(size, 0, -1):
+                c = np.searchsorted(self.binomials[:, i], rest, side='right') - 1
+                ids[:, i - 1] = c
+                rest = rest - self.binomials[c, i]
+            for j, row in zip(where.tolist(), ids.tolist()):
+                boards[j] = [self.units[c] for c in row]
+        return boards
+
+def union(a, b):
+    return np.union1d(a, b)
+
+def intersection(a, b):
+    return np.intersect1d(a, b, assume_unique=True)
+
+def difference(a, b):
+    """Ranks of a that are not in b"""
+    return np.setdiff1d(a, b, assume_unique=True)
+
+def contains(ranks, queries):
+    """Boolean mask of which queries occur in the sorted rank array, by binary search"""
+    queries = np.asarray(queries, dtype=RANK_DTYPE)
+    positions = np.searchsorted(ranks, queries)
+    found = np.zeros(len(queries), dtype=bool)
+    inside = positions < len(ranks)
+    found[inside] = ranks[positions[inside]] == queries[inside]
+    return found
@@ -0,0 +1,214 @@
+import json
+import re
+
+from typing import Iterator, Mapping
+
+# Characters read from disk per refill of the parse buffer
+READ_CHUNK_SIZE = 1 << 20
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+class ComboFileReader:
+    """Incremental reader for combo result files.
+
+    Supports the JSON layout written by run_and_save_all (an object whose
+    'combinations' array is streamed one entry at a time) and JSON Lines
+    files (*.jsonl) whose first line holds the header fields and every
+    following line one combination. Header values appearing before the
+    'combinations' array are available in `header` while iterating.
+    """
+    def __init__(self, filename):
+        self.filename = str(filename)
+        self.is_jsonl = self.filename.endswith('.jsonl')
+        self.header = {}
+        self.has_combinations = False
+        self.count = 0
+
+    def __iter__(self) -> Iterator[Mapping]:
+        for _offset, _length, combo in self.iter_records():
+            yield combo
+
+    def iter_records(self):
+        """Yield (byte_offset, byte_length, combo) for every combination in file order"""
+        self.header.clear()
+        self.has_combinations = False
+        self.count = 0
+        if self.is_jsonl:
+            records = self._iter_jsonl()
+        else:
+            records = self._iter_json()
+        for record in records:
+            self.count += 1
+            yield record
+
+    def _iter_jsonl(self):
+        with open(self.filename, 'rb') as f:
+            offset = 0
+            first = True
+            for line in f:
+                length = len(line.rstrip(b'\r\n'))
+                if length:
+                    value = json.loads(line)
+                    if first:
+                        self.header.update(value)
+                        self.has_combinations = True
+                    else:
+                        yield offset, length, value
+                    first = False
+                offset += len(line)
+
+    def _iter_json(self):
+        with open(self.filename, 'r', encoding='utf-8', newline='') as f:
+            parser = _StreamParser(f)
+            parser.expect('{')
+            while not parser.consume('}'):
+                key = parser.decode_value()
+                parser.expect(':')
+                if key == 'combinations':
+                    self.has_combinations = True
+                    yield from parser.iter_array()
+                else:
+                    self.header[key] = parser.decode_value()
+                if not parser.consume(','):
+                    parser.expect('}')
+                    break
+
+class _StreamParser:
+    """Minimal pull parser over a text file, tracking UTF-8 byte offsets"""
+    def __init__(self, f):
+        self.f = f
+        self.decoder = json.JSONDecoder()
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+        # byte offset of buf[self.mark_pos] is self.mark_byte
+        self.buf_byte = 0
+        self.mark_pos = 0
+        self.mark_byte = 0
+        # while buf is ASCII, character positions are byte offsets from buf_byte
+        self.ascii = True
+
+    def _refill(self):
+        if self.eof:
+            return False
+        # drop the consumed prefix so the buffer stays bounded
+        if self.pos > READ_CHUNK_SIZE:
+            self.buf_byte = self.byte_offset(self.pos)
+            self.buf = self.buf[self.pos:]
+            self.mark_pos = 0
+            self.mark_byte = self.buf_byte
+            self.pos = 0
+            self.ascii = self.buf.isascii()
+        chunk = self.f.read(READ_CHUNK_SIZE)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf += chunk
+        self.ascii = self.ascii and chunk.isascii()
+        return True
+
+    def byte_offset(self, pos):
+        if self.ascii:
+            return self.buf_byte + pos
+        if pos < self.mark_pos:
+            self.mark_pos = 0
+            self.mark_byte = self.buf_byte
+        self.mark_byte += len(self.buf[self.mark_pos:pos].encode('utf-8'))
+        self.mark_pos = pos
+        return self.mark_byte
+
+    def skip_whitespace(self):
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf) or not self._refill():
+                return
+
+    def consume(self, char):
+        self.skip_whitespace()
+        if self.pos < len(self.buf) and self.buf[self.pos] == char:
+            self.pos += 1
+            return True
+        return False
+
+    def expect(self, char):
+        if not self.consume(char):
+            found = self.buf[self.pos:self.pos + 20] if self.pos < len(self.buf) else 'end of file'
+            raise json.JSONDecodeError(f"Expected '{char}', found {found!r}", self.buf, self.pos)
+
+    def decode_value(self):
+        self.skip_whitespace()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self._refill():
+                    continue
+                raise
+            # a value touching the end of the buffer (e.g. a number) may continue
+            if end == len(self.buf) and self._refill():
+                continue
+            self.pos = end
+            return value
+
+    def iter_array(self):
+        self.expect('[')
+        if self.consume(']'):
+            return
+        while True:
+            self.skip_whitespace()
+            start = self.byte_offset(self.pos)
+            value = self.decode_value()
+            length = self.byte_offset(self.pos) - start
+            yield start, length, value
+            if not self.consume(','):
+                self.expect(']')
+                return
+
+def write_combo_json(filename: str, header: Mapping, combinations: list):
+    """Write header fields then a 'combinations' array, laid out like write_json.
+
+    Returns the byte offset and length of every combination, in the layout
+    ComboFileReader.iter_records reports them.
+    """
+    offsets = []
+    lengths = []
+    with open(filename, "wb") as fw:
+        position = 0
+
+        def emit(text):
+            nonlocal position
+            data = text.encode('utf-8')
+            fw.write(data)
+            position += len(data)
+            return len(data)
+
+        emit('{')
+        for key, value in header.items():
+            value_text = json.dumps(value, ensure_ascii=False, indent=4).replace('\n', '\n    ')
+            emit(f'\n    {json.dumps(key, ensure_ascii=False)}: {value_text},')
+        if not combinations:
+            emit('\n    "combinations": []\n}')
+            return offsets, lengths
+        emit('\n    "combinations": [')
+        for i, combo in enumerate(combinations):
+            emit(',\n        ' if i else '\n        ')
+            offsets.append(position)
+            lengths.append(emit(json.dumps(combo, ensure_ascii=False, indent=4).replace('\n', '\n        ')))
+        emit('\n    ]\n}')
+    return offsets, lengths
+
+def write_combo_jsonl(filename: str, header: Mapping, combinations: list):
+    """Write combinations as JSON Lines: a header line then one combination per line.
+
+    Returns the byte offset and length of every combination line.
+    """
+    offsets = []
+    lengths = []
+    with open(filename, "wb") as fw:
+        position = fw.write((json.dumps(header, ensure_ascii=False) + '\n').encode('utf-8'))
+        for combo in combinations:
+            data = json.dumps(combo, ensure_ascii=False).encode('utf-8')
+            offsets.append(position)
+            lengths.append(len(data))
+            position += fw.write(data + b'\n')
+    return offsets, lengths
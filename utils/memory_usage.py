@@ -0,0 +1,22 @@
+import sys
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+def peak_memory_mb(include_children: bool = False) -> float:
+    """Peak resident set size of the current process in MB (0.0 when unknown).
+
+    With include_children, the largest of this process and its finished
+    child processes (e.g. pool workers) is reported.
+    """
+    if resource is None:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if include_children:
+        peak = max(peak, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+    if sys.platform == 'darwin':
+        return peak / (1024 * 1024)
+    return peak / 1024